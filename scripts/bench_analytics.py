@@ -0,0 +1,313 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from scripts.synthetic_library import generate_library
+from web.routes.analytics import (
+    compute_avg_length,
+    compute_popularity,
+    compute_artist_frequency,
+    compute_release_years,
+    compute_genres,
+    compute_album_frequency,
+    compute_relationships
+)
+from web.routes.recommendations import compute_recommendation_breakdown
+from web.services.genre_stats import GENRE_INDEX_CACHE
+
+
+# ----------------------------------------
+# Analytics benchmarks
+# ----------------------------------------
+
+# Runs the compute cores behind the analytics endpoints directly on
+# synthetic libraries of increasing size and records, per benchmark and
+# size:
+#
+#   wall_ms          median (and min) over --repeats cold runs, with the
+#                    per-playlist caches cleared before each
+#   wall_ms_warm     median (and min) over --repeats runs on warm caches,
+#                    for benchmarks that read one
+#   peak_kb          tracemalloc peak during one extra traced cold run
+#   alloc_blocks     tracemalloc blocks (and alloc_kb) allocated by that
+#                    run and still live when it returns, result included
+#   retained_blocks  blocks (and retained_kb) still held once the result
+#                    is dropped, e.g. cache entries
+#
+# Two checks fail the run (exit code 1):
+#
+#   - scaling: time growth between consecutive sizes, as an exponent of
+#     the entry count, above the benchmark's expected complexity + slack
+#     (catches e.g. something going quadratic in playlists)
+#   - baseline: time or peak memory beyond the tolerance of a stored run
+#
+#   python scripts/bench_analytics.py --sizes 1000 10000 100000 --save-baseline
+#   python scripts/bench_analytics.py --baseline data/bench/baseline.json
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_OUT = os.path.join("data", "bench", "analytics.json")
+DEFAULT_BASELINE = os.path.join("data", "bench", "baseline.json")
+
+SCALING_SLACK = 0.4
+
+# Sizes below this are timer noise for the scaling check
+SCALING_MIN_MS = 5
+
+
+def _breakdown_source(dataset):
+    # A typical playlist, not Liked Songs, is what people break down
+    sizes = sorted(
+        (len(p["tracks"]), pid) for pid, p in dataset.items() if pid != "__liked__"
+    )
+    return sizes[len(sizes) // 2][1]
+
+# Per-playlist caches each benchmark reads; cleared for cold runs
+CACHES = {
+    "genres": (GENRE_INDEX_CACHE,),
+}
+
+# name -> (runner, expected growth exponent in playlist entries)
+BENCHMARKS = {
+    "avg_length": (compute_avg_length, 1.0),
+    "popularity": (compute_popularity, 1.0),
+    "artist_frequency": (compute_artist_frequency, 1.0),
+    "release_years": (compute_release_years, 1.0),
+    "genres": (compute_genres, 1.0),
+    "album_frequency": (compute_album_frequency, 1.0),
+    # Pairwise by design: playlists grow with the library
+    "relationships": (compute_relationships, 2.0),
+    "recommendation_breakdown": (
+        lambda dataset: compute_recommendation_breakdown(dataset, _breakdown_source(dataset)),
+        1.0
+    ),
+}
+
+
+def clear_caches(caches):
+    for cache in caches:
+        cache.clear()
+
+def timed_runs(fn, dataset, repeats, caches=()):
+
+    timings = []
+
+    for _ in range(repeats):
+        clear_caches(caches)
+        gc.collect()
+        start = time.perf_counter()
+        fn(dataset)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+def traced_blocks(snapshot):
+
+    # Ignore tracemalloc's own bookkeeping
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    stats = snapshot.statistics("filename")
+
+    return sum(s.count for s in stats), sum(s.size for s in stats)
+
+def measure(fn, dataset, repeats, caches=()):
+
+    cold = timed_runs(fn, dataset, repeats, caches)
+
+    stats = {
+        "wall_ms": round(statistics.median(cold), 3),
+        "wall_ms_min": round(min(cold), 3),
+    }
+
+    if caches:
+        fn(dataset)
+        warm = timed_runs(fn, dataset, repeats)
+
+        stats["wall_ms_warm"] = round(statistics.median(warm), 3)
+        stats["wall_ms_warm_min"] = round(min(warm), 3)
+
+    # Memory from a separate cold run, since tracing slows it down
+    clear_caches(caches)
+    gc.collect()
+
+    tracemalloc.start()
+
+    result = fn(dataset)
+    _current, peak = tracemalloc.get_traced_memory()
+    alloc_blocks, alloc_bytes = traced_blocks(tracemalloc.take_snapshot())
+
+    del result
+    gc.collect()
+    retained_blocks, retained_bytes = traced_blocks(tracemalloc.take_snapshot())
+
+    tracemalloc.stop()
+
+    return {
+        **stats,
+        "peak_kb": round(peak / 1024, 1),
+        "alloc_blocks": alloc_blocks,
+        "alloc_kb": round(alloc_bytes / 1024, 1),
+        "retained_blocks": retained_blocks,
+        "retained_kb": round(retained_bytes / 1024, 1),
+    }
+
+def dataset_shape(dataset):
+    return {
+        "playlists": len(dataset),
+        "entries": sum(len(p["tracks"]) for p in dataset.values()),
+    }
+
+def run(sizes, seed, repeats, only=None):
+
+    results = {name: {} for name in BENCHMARKS if not only or name in only}
+
+    for size in sizes:
+        dataset = generate_library(tracks=size, seed=seed)
+        shape = dataset_shape(dataset)
+
+        print(f"\n{size} tracks ({shape['playlists']} playlists, {shape['entries']} entries)")
+
+        for name in results:
+            fn, _expected = BENCHMARKS[name]
+            stats = {"tracks": size, **shape, **measure(fn, dataset, repeats, CACHES.get(name, ()))}
+            results[name][str(size)] = stats
+
+            warm = f" ({stats['wall_ms_warm']:.1f} ms warm)" if "wall_ms_warm" in stats else ""
+            print(
+                f"  {name:<26} {stats['wall_ms']:>10.1f} ms {stats['peak_kb']:>12.0f} KB peak"
+                f" {stats['alloc_blocks']:>10} blocks{warm}"
+            )
+
+        del dataset
+        gc.collect()
+
+    return results
+
+
+# ----------------------------------------
+# Checks
+# ----------------------------------------
+
+def scaling(results):
+
+    exponents = {}
+    failures = []
+
+    for name, by_size in results.items():
+        _fn, expected = BENCHMARKS[name]
+        points = sorted(by_size.values(), key=lambda s: s["entries"])
+        exponents[name] = []
+
+        for a, b in zip(points, points[1:]):
+            if a["wall_ms_min"] < SCALING_MIN_MS:
+                continue
+
+            k = math.log(b["wall_ms_min"] / a["wall_ms_min"]) / math.log(b["entries"] / a["entries"])
+            exponents[name].append({"from": a["tracks"], "to": b["tracks"], "exponent": round(k, 2)})
+
+            if k > expected + SCALING_SLACK:
+                failures.append(
+                    f"{name}: time grows as entries^{k:.2f} from {a['tracks']} to {b['tracks']} tracks"
+                    f" (expected ~{expected:g})"
+                )
+
+    return exponents, failures
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+
+    failures = []
+
+    for name, by_size in results.items():
+        for size, stats in by_size.items():
+            old = baseline.get("results", {}).get(name, {}).get(size)
+            if not old:
+                continue
+
+            time_ratio = stats["wall_ms"] / old["wall_ms"] if old["wall_ms"] else 1
+            memory_ratio = stats["peak_kb"] / old["peak_kb"] if old["peak_kb"] else 1
+
+            if time_ratio > time_tolerance:
+                failures.append(f"{name} @ {size}: {stats['wall_ms']:.1f} ms vs {old['wall_ms']:.1f} ms ({time_ratio:.2f}x)")
+
+            if memory_ratio > memory_tolerance:
+                failures.append(f"{name} @ {size}: {stats['peak_kb']:.0f} KB vs {old['peak_kb']:.0f} KB peak ({memory_ratio:.2f}x)")
+
+    return failures
+
+
+# ----------------------------------------
+# RUN
+# ----------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the analytics compute cores")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--baseline", help=f"compare against a stored run (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="also store this run as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=1.3)
+    parser.add_argument("--memory-tolerance", type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed, args.repeats, args.only)
+    exponents, failures = scaling(results)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "seed": args.seed,
+            "repeats": args.repeats,
+        },
+        "results": results,
+        "scaling": exponents,
+    }
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        failures += compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        report["baseline"] = {"path": args.baseline, "commit": baseline.get("meta", {}).get("commit")}
+
+    report["failures"] = failures
+
+    write_json(args.out, report)
+    print(f"\n✅ Saved {args.out}")
+
+    if args.save_baseline:
+        write_json(args.save_baseline, report)
+        print(f"✅ Saved baseline {args.save_baseline}")
+
+    if failures:
+        print("\n❌ Regressions:")
+        for failure in failures:
+            print(f" - {failure}")
+        sys.exit(1)
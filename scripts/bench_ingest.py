@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+# Keep runs from reloading earlier builds off disk (read when web.config loads)
+os.environ.setdefault("SNAPSHOT_DIR", "")
+
+from scripts.fake_spotify import FakeLibrary, FakeSpotifyServer, add_config_args, config_from_args
+from scripts.synthetic_library import generate_library
+from scripts.bench_analytics import git_commit, write_json
+
+
+# ----------------------------------------
+# Ingest benchmark
+# ----------------------------------------
+
+# Drives the real build path end to end against scripts/fake_spotify.py:
+#
+#   /callback -> /api/playlists -> /api/selection (update_selection)
+#     -> start_incremental_build -> fetch_single_playlist
+#     -> build_playlist_profiles -> PLAYLIST_DATA_CACHE
+#
+# and reports, per library size:
+#
+#   requests            calls the fake API served, by endpoint
+#   rate_limited        429s returned (retries included)
+#   artist_batch_fill   artist ids per /artists call / 50
+#   first_playlist_ms   selection posted -> first playlist cached
+#   build_ms            selection posted -> build complete
+#   ms_per_1k_tracks    build_ms per 1000 playlist entries
+#
+#   python scripts/bench_ingest.py --sizes 1000 10000 --latency-ms 40 --rate-limit 50
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_OUT = os.path.join("data", "bench", "ingest.json")
+
+BUILD_TIMEOUT = 30 * 60
+
+
+def point_app_at(server):
+
+    # spotify_auth reads these per call, so each run can use its own server
+    from web import config
+
+    os.environ.update(server.env())
+    config.SPOTIFY_API_PREFIX = f"{server.base_url}/v1/"
+    config.SPOTIFY_ACCOUNTS_URL = server.base_url
+
+def run_one(size, seed, fake_config, port, verbose=False):
+
+    from fastapi.testclient import TestClient
+    from web.app import app
+    from web.state import PLAYLIST_DATA_CACHE, USER_BUILD_STATE
+    from web import config
+
+    config.DEBUG_BUILD = verbose
+
+    user_id = f"bench-{size}-{seed}"
+    fake_config.user_id = user_id
+
+    dataset = generate_library(tracks=size, seed=seed)
+    library = FakeLibrary(dataset, user_id=user_id)
+    entries = sum(len(p["tracks"]) for p in dataset.values())
+    del dataset
+
+    with FakeSpotifyServer(library, fake_config, port=port) as server:
+
+        point_app_at(server)
+
+        # First cached playlist for this user, recorded as the build stores it
+        cached_at = []
+        put = PLAYLIST_DATA_CACHE.put
+
+        def recording_put(uid, pid, entry):
+            if uid == user_id:
+                cached_at.append(time.perf_counter())
+            return put(uid, pid, entry)
+
+        PLAYLIST_DATA_CACHE.put = recording_put
+
+        try:
+            client = TestClient(app, base_url="https://testserver")
+
+            r = client.get("/callback", params={"code": user_id}, follow_redirects=False)
+            if r.status_code != 307 and r.status_code != 302:
+                raise RuntimeError(f"Login failed: {r.status_code} {r.text[:200]}")
+
+            server.stats.reset()
+
+            start = time.perf_counter()
+            listing = client.get("/api/playlists").json()["playlists"]
+            listing_ms = (time.perf_counter() - start) * 1000
+
+            selected = [p["id"] for p in listing]
+
+            start = time.perf_counter()
+            client.post("/api/selection", json={"selected_ids": selected})
+            selection_ms = (time.perf_counter() - start) * 1000
+
+            while True:
+                state = USER_BUILD_STATE.get(user_id) or {}
+                if state.get("status") in ("complete", "error"):
+                    break
+                if time.perf_counter() - start > BUILD_TIMEOUT:
+                    raise RuntimeError(f"Build did not finish within {BUILD_TIMEOUT}s")
+                time.sleep(0.01)
+
+            build_ms = (time.perf_counter() - start) * 1000
+
+        finally:
+            PLAYLIST_DATA_CACHE.put = put
+
+        fake = server.stats.as_dict()
+
+    artist_calls = fake["batches"].get("artists", 0)
+
+    return {
+        "tracks": size,
+        "playlists": len(selected),
+        "entries": entries,
+        "status": state.get("status"),
+        "requests": fake["total_requests"],
+        "requests_by_endpoint": fake["requests"],
+        "rate_limited": fake["rate_limited"],
+        "server_errors": sum(c for k, c in fake["statuses"].items() if k.endswith(" 500")),
+        "artist_batch_fill": round(fake["ids_requested"].get("artists", 0) / (artist_calls * 50), 3) if artist_calls else None,
+        "listing_ms": round(listing_ms, 1),
+        "selection_ms": round(selection_ms, 1),
+        "first_playlist_ms": round((cached_at[0] - start) * 1000, 1) if cached_at else None,
+        "build_ms": round(build_ms, 1),
+        "ms_per_1k_tracks": round(build_ms / entries * 1000, 1) if entries else None,
+        "requests_per_1k_tracks": round(fake["total_requests"] / entries * 1000, 1) if entries else None,
+    }
+
+def compare(results, baseline, tolerance):
+
+    failures = []
+
+    for size, stats in results.items():
+        old = baseline.get("results", {}).get(size)
+        if not old:
+            continue
+
+        for key in ("ms_per_1k_tracks", "requests_per_1k_tracks", "first_playlist_ms"):
+            if stats.get(key) and old.get(key) and stats[key] / old[key] > tolerance:
+                failures.append(f"{key} @ {size}: {stats[key]} vs {old[key]} ({stats[key] / old[key]:.2f}x)")
+
+    return failures
+
+
+# ----------------------------------------
+# RUN
+# ----------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the playlist build path against a fake Spotify API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--port", type=int, default=8901, help="first port; each size uses the next one")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--baseline", help="compare against a stored run")
+    parser.add_argument("--save-baseline", help="also store this run as a baseline")
+    parser.add_argument("--tolerance", type=float, default=1.3)
+    parser.add_argument("--verbose", action="store_true", help="keep build debug output")
+    add_config_args(parser)
+    parser.set_defaults(latency_ms=30, jitter_ms=20)
+    args = parser.parse_args()
+
+    results = {}
+
+    for i, size in enumerate(args.sizes):
+        stats = run_one(size, args.seed, config_from_args(args), args.port + i, args.verbose)
+        results[str(size)] = stats
+
+        print(
+            f"{size:>8} tracks  {stats['build_ms'] / 1000:>8.2f}s build"
+            f"  {stats['first_playlist_ms']:>8.0f} ms first"
+            f"  {stats['ms_per_1k_tracks']:>8.0f} ms/1k"
+            f"  {stats['requests']:>6} requests"
+            f"  {stats['rate_limited']:>4} x 429"
+            f"  {stats['artist_batch_fill']} artist fill"
+        )
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "sizes": args.sizes,
+            "seed": args.seed,
+            "fake": config_from_args(args).as_dict(),
+        },
+        "results": results,
+    }
+
+    failures = []
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            failures = compare(results, json.load(f), args.tolerance)
+
+    report["failures"] = failures
+
+    write_json(args.out, report)
+    print(f"\n✅ Saved {args.out}")
+
+    if args.save_baseline:
+        write_json(args.save_baseline, report)
+        print(f"✅ Saved baseline {args.save_baseline}")
+
+    if failures:
+        print("\n❌ Regressions:")
+        for failure in failures:
+            print(f" - {failure}")
+        sys.exit(1)
@@ -0,0 +1,652 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+
+# ----------------------------------------
+# Fake Spotify Web API
+# ----------------------------------------
+
+# Local stand-in for the parts of the Web API the app calls, serving a
+# dataset in fetch_single_playlist output shape (static/demoData.json or
+# scripts/synthetic_library.py output). Point the app at it with
+#
+#   SPOTIFY_API_PREFIX=http://127.0.0.1:8900/v1/
+#   SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8900
+#   SPOTIFY_CLIENT_ID=fake SPOTIFY_CLIENT_SECRET=fake
+#
+# /authorize redirects straight back with code=<user id>, and access
+# tokens map back to that user, so several fake users can log in.
+#
+#   python scripts/fake_spotify.py --dataset static/demoData.json --latency-ms 80 --rate-429 0.02
+
+DEFAULT_DATASET = "static/demoData.json"
+
+PLAYLISTS_MAX_LIMIT = 50
+ITEMS_MAX_LIMIT = 100
+SAVED_MAX_LIMIT = 50
+ARTISTS_MAX_IDS = 50
+ALBUMS_MAX_IDS = 20
+
+
+class FakeConfig:
+
+    def __init__(
+        self,
+        latency_ms=0,
+        jitter_ms=0,
+        page_size=None,
+        rate_429=0.0,
+        rate_limit=None,
+        retry_after=1,
+        error_rate=0.0,
+        user_id="fake-user",
+        seed=0,
+        distinct_users=False,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.page_size = page_size
+        self.rate_429 = rate_429
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.user_id = user_id
+        self.seed = seed
+        # Give each user their own copy of every playlist (per-user ids and
+        # snapshot_ids), so builds for different users can't share fetches
+        # the way a common playlist would
+        self.distinct_users = distinct_users
+
+    def update(self, values):
+        for key, value in values.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+# ----------------------------------------
+# Library
+# ----------------------------------------
+
+def _fake_id(*parts):
+    return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:22]
+
+def _image(kind, key):
+    return [{"url": f"https://i.scdn.co/image/fake-{kind}-{key}", "height": 640, "width": 640}]
+
+
+class FakeLibrary:
+    """Spotify-shaped objects rebuilt from a fetch_single_playlist dataset."""
+
+    def __init__(self, dataset, user_id="fake-user"):
+        self.user_id = user_id
+        self.playlists = []
+        self.playlist_index = {}
+        self.artists = {}
+        self.albums = {}
+        self.liked = []
+
+        for pid, playlist in dataset.items():
+
+            tracks = [self._track(t) for t in playlist.get("tracks", [])]
+
+            if pid == "__liked__":
+                now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+                self.liked = [
+                    {
+                        "added_at": (now - timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        "track": track
+                    }
+                    for i, track in enumerate(tracks)
+                ]
+                continue
+
+            entry = {
+                "id": pid,
+                "name": playlist.get("playlist_name"),
+                "images": [{"url": playlist["image"]}] if playlist.get("image") else [],
+                "owner": {"id": user_id, "display_name": user_id},
+                "snapshot_id": playlist.get("snapshot_id") or _fake_id(pid, *(t["id"] for t in tracks)),
+                "public": False,
+                "collaborative": False,
+                "items": [
+                    {"added_at": "2024-01-01T00:00:00Z", "track": track}
+                    for track in tracks
+                ]
+            }
+
+            self.playlist_index[pid] = entry
+            self.playlists.append(entry)
+
+    def _track(self, t):
+
+        album = t.get("album") or {}
+        album_id = album.get("album_id") or _fake_id("album", album.get("album_name"))
+
+        if album_id not in self.albums:
+            self.albums[album_id] = {
+                "id": album_id,
+                "name": album.get("album_name"),
+                "release_date": album.get("release_date"),
+                "total_tracks": album.get("total_tracks"),
+                "images": _image("album", album_id),
+                "album_type": "album"
+            }
+
+        artists = []
+
+        for a in t.get("artists", []):
+            aid = a.get("artist_id")
+            if not aid:
+                continue
+
+            if aid not in self.artists:
+                self.artists[aid] = {
+                    "id": aid,
+                    "name": a.get("artist_name"),
+                    # The API returns lower-case genres; the app formats them
+                    "genres": [g.lower() for g in a.get("genres", [])],
+                    "images": [{"url": a["image_url"]}] if a.get("image_url") else [],
+                    "popularity": 50
+                }
+
+            artists.append({"id": aid, "name": a.get("artist_name")})
+
+        return {
+            "id": t.get("track_id"),
+            "name": t.get("track_name"),
+            "popularity": t.get("popularity"),
+            "duration_ms": t.get("duration_ms"),
+            "explicit": t.get("explicit"),
+            "track_number": t.get("track_number"),
+            "disc_number": t.get("disc_number"),
+            "preview_url": t.get("preview_url"),
+            "external_urls": {"spotify": t.get("spotify_url")},
+            "album": self.albums[album_id],
+            "artists": artists
+        }
+
+    @classmethod
+    def load(cls, path, user_id="fake-user"):
+        with open(path, "r") as f:
+            return cls(json.load(f), user_id=user_id)
+
+
+# ----------------------------------------
+# Fields filter
+# ----------------------------------------
+
+# Supports the subset of the `fields` syntax we use:
+# "items(track(id,name,album(id))),next" and dotted "tracks.total"
+
+def parse_fields(spec):
+
+    pos = 0
+
+    def parse_list():
+        nonlocal pos
+        tree = {}
+
+        while pos < len(spec):
+            start = pos
+            while pos < len(spec) and spec[pos] not in ",()":
+                pos += 1
+
+            path = spec[start:pos].strip().split(".")
+            sub = None
+
+            if pos < len(spec) and spec[pos] == "(":
+                pos += 1
+                sub = parse_list()
+                pos += 1
+
+            node = tree
+            for name in path[:-1]:
+                if node.get(name) is None:
+                    node[name] = {}
+                node = node[name]
+            if path[-1]:
+                node[path[-1]] = sub
+
+            if pos < len(spec) and spec[pos] == ",":
+                pos += 1
+            elif pos < len(spec) and spec[pos] == ")":
+                break
+
+        return tree
+
+    return parse_list()
+
+def apply_fields(obj, tree):
+
+    if tree is None:
+        return obj
+
+    if isinstance(obj, list):
+        return [apply_fields(x, tree) for x in obj]
+
+    if isinstance(obj, dict):
+        return {k: apply_fields(obj[k], sub) for k, sub in tree.items() if k in obj}
+
+    return obj
+
+
+# ----------------------------------------
+# App
+# ----------------------------------------
+
+class FakeStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.statuses = Counter()
+            self.ids_requested = Counter()
+            self.batches = Counter()
+            self.started_at = time.time()
+
+    def record(self, endpoint, status):
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.statuses[f"{endpoint} {status}"] += 1
+
+    def record_batch(self, endpoint, size):
+        with self.lock:
+            self.ids_requested[endpoint] += size
+            self.batches[endpoint] += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "statuses": dict(self.statuses),
+                "ids_requested": dict(self.ids_requested),
+                "batches": dict(self.batches),
+                "total_requests": sum(self.requests.values()),
+                "rate_limited": sum(c for k, c in self.statuses.items() if k.endswith(" 429")),
+                "elapsed_seconds": round(time.time() - self.started_at, 3)
+            }
+
+
+def build_app(library, config=None):
+
+    config = config or FakeConfig(user_id=library.user_id)
+    stats = FakeStats()
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+    bucket = {"tokens": 0.0, "at": time.monotonic()}
+
+    app = FastAPI()
+    app.state.config = config
+    app.state.stats = stats
+    app.state.library = library
+
+    def roll():
+        with rng_lock:
+            return rng.random()
+
+    def rate_limited():
+
+        # Token bucket when rate_limit (req/s) is set, plus random 429s
+        if config.rate_limit:
+            with rng_lock:
+                now = time.monotonic()
+                bucket["tokens"] = min(
+                    config.rate_limit,
+                    bucket["tokens"] + (now - bucket["at"]) * config.rate_limit
+                )
+                bucket["at"] = now
+
+                if bucket["tokens"] < 1:
+                    return True
+                bucket["tokens"] -= 1
+
+        return config.rate_429 and roll() < config.rate_429
+
+    def error(status, message, headers=None):
+        return JSONResponse({"error": {"status": status, "message": message}}, status_code=status, headers=headers)
+
+    async def gate(request, endpoint):
+
+        # Latency first, so throttled and failed calls cost time too
+        delay = config.latency_ms
+        if config.jitter_ms:
+            delay += roll() * config.jitter_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            stats.record(endpoint, 401)
+            return error(401, "No token provided")
+
+        if rate_limited():
+            stats.record(endpoint, 429)
+            return error(429, "API rate limit exceeded", {"Retry-After": str(config.retry_after)})
+
+        if config.error_rate and roll() < config.error_rate:
+            stats.record(endpoint, 500)
+            return error(500, "Server error")
+
+        stats.record(endpoint, 200)
+        return None
+
+    def user_for(request):
+        token = request.headers.get("authorization", "")[len("Bearer "):]
+        if token.startswith("fake."):
+            return token.split(".")[1] or config.user_id
+        return config.user_id
+
+    # per-user playlist id -> library playlist id (distinct_users)
+    aliases = {}
+
+    def user_playlist(pid):
+        return library.playlist_index.get(aliases.get(pid, pid))
+
+    def as_user(body, pid, request):
+        if config.distinct_users:
+            user = user_for(request)
+            body["id"] = _fake_id(pid, user)
+            body["snapshot_id"] = _fake_id(body.get("snapshot_id"), user)
+            aliases[body["id"]] = pid
+        return body
+
+    def limit_for(request, default, maximum):
+        limit = min(int(request.query_params.get("limit", default)), maximum)
+        if config.page_size:
+            limit = min(limit, config.page_size)
+        return max(limit, 1)
+
+    def page(request, items, default_limit, maximum, wrap=None):
+
+        offset = int(request.query_params.get("offset", 0))
+        limit = limit_for(request, default_limit, maximum)
+        chunk = items[offset:offset + limit]
+
+        def link(o):
+            params = dict(request.query_params)
+            params.update(offset=o, limit=limit)
+            return f"{str(request.base_url).rstrip('/')}{request.url.path}?{urlencode(params)}"
+
+        body = {
+            "href": link(offset),
+            "items": [wrap(x) for x in chunk] if wrap else chunk,
+            "limit": limit,
+            "offset": offset,
+            "total": len(items),
+            "next": link(offset + limit) if offset + limit < len(items) else None,
+            "previous": link(max(offset - limit, 0)) if offset > 0 else None
+        }
+
+        fields = request.query_params.get("fields")
+        return apply_fields(body, parse_fields(fields)) if fields else body
+
+    # ---------------------------------
+    # Accounts
+    # ---------------------------------
+
+    @app.get("/authorize")
+    def authorize(request: Request):
+        params = request.query_params
+        code = params.get("login_hint") or config.user_id
+        query = urlencode({"code": code, "state": params.get("state", "")})
+        return RedirectResponse(f"{params.get('redirect_uri')}?{query}")
+
+    @app.post("/api/token")
+    async def token(request: Request):
+        # Parsed by hand so the fake doesn't need python-multipart
+        form = dict(parse_qsl((await request.body()).decode()))
+
+        if form.get("grant_type") == "refresh_token":
+            user = (form.get("refresh_token") or "").split(".")[1:2] or [config.user_id]
+            user = user[0]
+        else:
+            user = form.get("code") or config.user_id
+
+        stats.record("token", 200)
+
+        return {
+            "access_token": f"fake.{user}.{int(time.time() * 1000)}",
+            "refresh_token": f"refresh.{user}",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "scope": form.get("scope", "")
+        }
+
+    # ---------------------------------
+    # Web API
+    # ---------------------------------
+
+    @app.get("/v1/me")
+    @app.get("/v1/me/")
+    async def me(request: Request):
+        denied = await gate(request, "me")
+        if denied:
+            return denied
+
+        user = user_for(request)
+        return {"id": user, "display_name": user, "type": "user", "product": "premium"}
+
+    @app.get("/v1/me/playlists")
+    async def my_playlists(request: Request):
+        denied = await gate(request, "me/playlists")
+        if denied:
+            return denied
+
+        user = user_for(request)
+
+        def listing(p):
+            out = {k: v for k, v in p.items() if k != "items"}
+            out["owner"] = {"id": user, "display_name": user}
+            out["tracks"] = {"total": len(p["items"])}
+            return as_user(out, p["id"], request)
+
+        return page(request, library.playlists, 20, PLAYLISTS_MAX_LIMIT, wrap=listing)
+
+    @app.get("/v1/me/tracks")
+    async def saved_tracks(request: Request):
+        denied = await gate(request, "me/tracks")
+        if denied:
+            return denied
+
+        return page(request, library.liked, 20, SAVED_MAX_LIMIT)
+
+    @app.get("/v1/playlists/{pid}")
+    async def playlist(pid: str, request: Request):
+        denied = await gate(request, "playlists")
+        if denied:
+            return denied
+
+        p = user_playlist(pid)
+        if p is None:
+            return error(404, "Not found.")
+
+        body = as_user({k: v for k, v in p.items() if k != "items"}, p["id"], request)
+        body["tracks"] = {"total": len(p["items"]), "items": p["items"][:ITEMS_MAX_LIMIT]}
+
+        fields = request.query_params.get("fields")
+        return apply_fields(body, parse_fields(fields)) if fields else body
+
+    @app.get("/v1/playlists/{pid}/tracks")
+    @app.get("/v1/playlists/{pid}/items")
+    async def playlist_items(pid: str, request: Request):
+        denied = await gate(request, "playlists/items")
+        if denied:
+            return denied
+
+        p = user_playlist(pid)
+        if p is None:
+            return error(404, "Not found.")
+
+        return page(request, p["items"], 100, ITEMS_MAX_LIMIT)
+
+    def lookup(request, endpoint, table, maximum, key):
+        ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+
+        if len(ids) > maximum:
+            stats.record(endpoint, 400)
+            return error(400, "Too many ids requested")
+
+        stats.record_batch(endpoint, len(ids))
+        return {key: [table.get(i) for i in ids]}
+
+    @app.get("/v1/artists")
+    @app.get("/v1/artists/")
+    async def artists(request: Request):
+        denied = await gate(request, "artists")
+        if denied:
+            return denied
+
+        return lookup(request, "artists", library.artists, ARTISTS_MAX_IDS, "artists")
+
+    @app.get("/v1/albums")
+    @app.get("/v1/albums/")
+    async def albums(request: Request):
+        denied = await gate(request, "albums")
+        if denied:
+            return denied
+
+        return lookup(request, "albums", library.albums, ALBUMS_MAX_IDS, "albums")
+
+    # ---------------------------------
+    # Control
+    # ---------------------------------
+
+    @app.get("/_fake/stats")
+    def fake_stats():
+        return {"config": config.as_dict(), **stats.as_dict()}
+
+    @app.post("/_fake/reset")
+    def fake_reset():
+        stats.reset()
+        return {"status": "ok"}
+
+    @app.post("/_fake/config")
+    async def fake_config(request: Request):
+        config.update(await request.json())
+        return config.as_dict()
+
+    return app
+
+
+# ----------------------------------------
+# Running
+# ----------------------------------------
+
+class FakeSpotifyServer:
+    """Runs the fake API on a background thread, for benchmarks and tests."""
+
+    def __init__(self, library, config=None, host="127.0.0.1", port=8900):
+        import uvicorn
+
+        self.app = build_app(library, config)
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def config(self):
+        return self.app.state.config
+
+    @property
+    def stats(self):
+        return self.app.state.stats
+
+    def env(self):
+        return {
+            "SPOTIFY_API_PREFIX": f"{self.base_url}/v1/",
+            "SPOTIFY_ACCOUNTS_URL": self.base_url,
+            "SPOTIFY_CLIENT_ID": os.getenv("SPOTIFY_CLIENT_ID") or "fake",
+            "SPOTIFY_CLIENT_SECRET": os.getenv("SPOTIFY_CLIENT_SECRET") or "fake",
+        }
+
+    def start(self):
+        self.thread.start()
+
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"Fake Spotify failed to start on {self.base_url}")
+            time.sleep(0.02)
+
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_config_args(parser):
+    parser.add_argument("--latency-ms", type=float, default=0, help="Base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra uniform random latency")
+    parser.add_argument("--page-size", type=int, default=None, help="Cap items per page below the API maximums")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429 per request")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/second before 429s (token bucket)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distinct-users", action="store_true", help="Give each user their own copy of every playlist")
+
+def config_from_args(args, user_id="fake-user"):
+    return FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        page_size=args.page_size,
+        rate_429=args.rate_429,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        user_id=user_id,
+        seed=args.seed,
+        distinct_users=getattr(args, "distinct_users", False),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a dataset through a fake Spotify Web API")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="fetch_single_playlist-shaped JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--user-id", default="fake-user")
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    library = FakeLibrary.load(args.dataset, user_id=args.user_id)
+
+    print(f"Serving {len(library.playlists)} playlists, {len(library.liked)} liked tracks on http://{args.host}:{args.port}")
+
+    import uvicorn
+    uvicorn.run(build_app(library, config_from_args(args, args.user_id)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
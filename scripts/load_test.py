@@ -0,0 +1,378 @@
+import argparse
+import gc
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+# Keep runs from reloading earlier builds or sessions off disk (read when
+# web.config loads)
+os.environ.setdefault("SNAPSHOT_DIR", "")
+os.environ.setdefault("SESSION_SQLITE_PATH", "")
+
+import requests
+
+from scripts.fake_spotify import FakeLibrary, FakeSpotifyServer, add_config_args, config_from_args
+from scripts.synthetic_library import generate_library
+from scripts.bench_ingest import point_app_at
+from scripts.bench_analytics import git_commit, write_json
+
+
+# ----------------------------------------
+# Multi-user load test
+# ----------------------------------------
+
+# Serves the real app with uvicorn (one worker, as deployed) against
+# scripts/fake_spotify.py, and for each concurrency level runs N users
+# through the browser's flow at once:
+#
+#   /callback -> /api/playlists -> POST /api/selection
+#     -> poll /api/build-progress until complete
+#     -> every workspace metric + recommendation breakdown
+#        (WORKSPACE_PARALLEL at a time, like a browser)
+#
+# Per level it reports throughput, latency percentiles per endpoint,
+# build time per user, peak RSS and RSS per user, cached bytes, CPU used
+# (in cores) and what the fake API saw, plus a hint at what saturated:
+#
+#   cpu        the process used ~1 core: the GIL / Python compute is the limit
+#   spotify    the fake API throttled (set --rate-limit to model Spotify's)
+#   memory     RSS per user times the user count nears --memory-limit-mb
+#
+#   python scripts/load_test.py --users 1 5 10 25 --tracks 5000 --latency-ms 40
+
+DEFAULT_USERS = [1, 5, 10, 25]
+DEFAULT_OUT = os.path.join("data", "bench", "load.json")
+
+WORKSPACE_METRICS = [
+    "avg-length",
+    "popularity",
+    "artist-frequency",
+    "release-years",
+    "playlist-profile",
+    "genres",
+    "album-frequency",
+    "relationships",
+    "recommendation-breakdown",
+]
+
+# Browsers open about six connections per host
+WORKSPACE_PARALLEL = 6
+
+BUILD_TIMEOUT = 30 * 60
+POLL_INTERVAL = 0.25
+
+
+class AppServer:
+    """The app under uvicorn on a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=8950):
+        import uvicorn
+        from web.app import app
+
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"App failed to start on {self.base_url}")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+# ----------------------------------------
+# Measurement
+# ----------------------------------------
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler:
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+class Recorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.build_seconds = []
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.latency[name].append(seconds * 1000)
+            if not ok:
+                self.errors[name] += 1
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+# ----------------------------------------
+# One user
+# ----------------------------------------
+
+class User:
+
+    def __init__(self, base_url, user_id, recorder):
+        self.base_url = base_url
+        self.user_id = user_id
+        self.recorder = recorder
+        self.http = requests.Session()
+
+    def call(self, name, method, path, **kwargs):
+
+        start = time.perf_counter()
+        r = self.http.request(method, self.base_url + path, allow_redirects=False, **kwargs)
+        self.recorder.record(name, time.perf_counter() - start, r.status_code < 400)
+
+        # The session cookie is Secure, which requests won't send over
+        # http, so carry it by hand
+        if "set-cookie" in r.headers:
+            cookie = SimpleCookie(r.headers["set-cookie"]).get("session")
+            if cookie:
+                self.http.headers["Cookie"] = f"session={cookie.value}"
+
+        return r
+
+    def run(self):
+
+        self.call("callback", "GET", "/callback", params={"code": self.user_id})
+
+        playlists = self.call("playlists", "GET", "/api/playlists").json().get("playlists", [])
+        selected = [p["id"] for p in playlists]
+
+        start = time.perf_counter()
+
+        self.call("selection", "POST", "/api/selection", json={
+            "selected_ids": selected,
+            "breakdown_source": next((pid for pid in selected if pid != "__liked__"), None)
+        })
+
+        while True:
+            status = self.call("build-progress", "GET", "/api/build-progress").json().get("status")
+            if status in ("complete", "error", "idle"):
+                break
+            if time.perf_counter() - start > BUILD_TIMEOUT:
+                raise RuntimeError(f"{self.user_id}: build did not finish within {BUILD_TIMEOUT}s")
+            time.sleep(POLL_INTERVAL)
+
+        with self.recorder.lock:
+            self.recorder.build_seconds.append(time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=WORKSPACE_PARALLEL) as pool:
+            list(pool.map(
+                lambda metric: self.call(metric, "GET", f"/api/{metric}"),
+                WORKSPACE_METRICS
+            ))
+
+
+# ----------------------------------------
+# One concurrency level
+# ----------------------------------------
+
+def forget_users(user_ids):
+    from web.state import PLAYLIST_DATA_CACHE, expire_user
+
+    for user_id in user_ids:
+        PLAYLIST_DATA_CACHE.drop_user(user_id)
+        expire_user(user_id)
+
+    gc.collect()
+
+def bottleneck(stats, memory_limit_mb):
+
+    hints = []
+
+    if stats["cpu_cores"] >= 0.85:
+        hints.append("cpu")
+    if stats["spotify"]["rate_limited"]:
+        hints.append("spotify")
+    if memory_limit_mb and stats["rss_peak_mb"] >= 0.8 * memory_limit_mb:
+        hints.append("memory")
+
+    return hints
+
+def run_level(users, app_url, server, ramp, memory_limit_mb):
+
+    from web.state import PLAYLIST_DATA_CACHE, user_footprints
+
+    recorder = Recorder()
+    user_ids = [f"load-{users}-{i}" for i in range(users)]
+
+    server.stats.reset()
+    rss_start = rss_bytes()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+
+    failures = []
+
+    def run(i, user_id):
+        time.sleep(ramp * i / max(users, 1))
+        try:
+            User(app_url, user_id, recorder).run()
+        except Exception as e:
+            failures.append(f"{user_id}: {e}")
+
+    with RSSSampler() as rss:
+        threads = [threading.Thread(target=run, args=(i, u)) for i, u in enumerate(user_ids)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    footprints = [u for u in user_footprints() if u["user_id"] in set(user_ids)]
+    fake = server.stats.as_dict()
+
+    all_latency = [ms for values in recorder.latency.values() for ms in values]
+    metric_latency = [ms for m in WORKSPACE_METRICS for ms in recorder.latency.get(m, [])]
+
+    stats = {
+        "users": users,
+        "wall_s": round(wall, 2),
+        "requests": len(all_latency),
+        "throughput_rps": round(len(all_latency) / wall, 1),
+        "users_per_min": round(users / wall * 60, 1),
+        "errors": dict(recorder.errors),
+        "failures": failures,
+        "latency": percentiles(all_latency),
+        "metrics_latency": percentiles(metric_latency),
+        "by_endpoint": {name: percentiles(values) for name, values in sorted(recorder.latency.items())},
+        "build_s": {k.replace("_ms", "_s"): round(v / 1000, 2) for k, v in percentiles([s * 1000 for s in recorder.build_seconds]).items() if k != "count"},
+        "cpu_cores": round(cpu / wall, 2),
+        "rss_start_mb": round(rss_start / 2**20, 1),
+        "rss_peak_mb": round(rss.peak / 2**20, 1),
+        "rss_per_user_mb": round((rss.peak - rss_start) / 2**20 / users, 2),
+        "cached_mb_per_user": round(sum(u["total_bytes"] for u in footprints) / 2**20 / users, 2),
+        "playlist_data_mb": round(PLAYLIST_DATA_CACHE.total_bytes / 2**20, 1),
+        "spotify": {
+            "requests": fake["total_requests"],
+            "rate_limited": fake["rate_limited"],
+            "requests_per_s": round(fake["total_requests"] / wall, 1),
+        },
+    }
+
+    stats["saturated"] = bottleneck(stats, memory_limit_mb)
+
+    forget_users(user_ids)
+
+    return stats
+
+
+# ----------------------------------------
+# RUN
+# ----------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Drive N concurrent users through the app against a fake Spotify API")
+    parser.add_argument("--users", type=int, nargs="+", default=DEFAULT_USERS, help="concurrency levels")
+    parser.add_argument("--tracks", type=int, default=5000, help="library size per user")
+    parser.add_argument("--shared-library", action="store_true", help="let users share playlists (and fetches) instead of each getting their own")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which a level's users start")
+    parser.add_argument("--memory-limit-mb", type=float, default=None, help="host memory available to the app, for the saturation hint")
+    parser.add_argument("--port", type=int, default=8950, help="app port; the fake API uses the next one")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    add_config_args(parser)
+    parser.set_defaults(latency_ms=30, jitter_ms=20)
+    args = parser.parse_args()
+
+    args.distinct_users = not args.shared_library
+    fake_config = config_from_args(args)
+
+    library = FakeLibrary(generate_library(tracks=args.tracks, seed=args.seed))
+
+    results = []
+
+    with FakeSpotifyServer(library, fake_config, port=args.port + 1) as server:
+        point_app_at(server)
+
+        with AppServer(port=args.port) as app_server:
+
+            print(f"{'users':>6} {'wall s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+                  f" {'build p95 s':>12} {'cpu':>6} {'peak MB':>9} {'MB/user':>8} {'429s':>6}  saturated")
+
+            for users in args.users:
+                stats = run_level(users, app_server.base_url, server, args.ramp, args.memory_limit_mb)
+                results.append(stats)
+
+                print(
+                    f"{users:>6} {stats['wall_s']:>8.1f} {stats['throughput_rps']:>8.1f}"
+                    f" {stats['latency']['p50_ms']:>8.0f} {stats['latency']['p95_ms']:>8.0f} {stats['latency']['p99_ms']:>8.0f}"
+                    f" {stats['build_s'].get('p95_s', 0):>12.2f} {stats['cpu_cores']:>6.2f}"
+                    f" {stats['rss_peak_mb']:>9.0f} {stats['rss_per_user_mb']:>8.2f}"
+                    f" {stats['spotify']['rate_limited']:>6}  {', '.join(stats['saturated']) or '-'}"
+                )
+
+                for failure in stats["failures"]:
+                    print(f"   ❌ {failure}")
+
+    write_json(args.out, {
+        "meta": {
+            "commit": git_commit(),
+            "users": args.users,
+            "tracks": args.tracks,
+            "shared_library": args.shared_library,
+            "ramp": args.ramp,
+            "fake": fake_config.as_dict(),
+        },
+        "results": results,
+    })
+    print(f"\n✅ Saved {args.out}")
@@ -1,3 +1,4 @@
+import argparse
 import json
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
@@ -8,6 +9,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from web.services.fetch_data import fetch_single_playlist
+from web.services.columnar import write_library
 
 
 # ----------------------------------------
@@ -127,11 +129,39 @@ def save_json(data):
     print("\n✅ Saved static/demoData.json")
 
 
+def save_columnar(data):
+
+    size = write_library("static/demoData.smlib", data)
+
+    print(f"\n✅ Saved static/demoData.smlib ({size} bytes)")
+
+
 # ----------------------------------------
 # RUN
 # ----------------------------------------
 
 if __name__ == "__main__":
 
-    data = build_dataset()
-    save_json(data)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--format",
+        choices=["json", "columnar", "both"],
+        default="json"
+    )
+    parser.add_argument(
+        "--from-json",
+        help="convert an existing dataset JSON instead of fetching from Spotify"
+    )
+    args = parser.parse_args()
+
+    if args.from_json:
+        with open(args.from_json, "r") as f:
+            data = json.load(f)
+    else:
+        data = build_dataset()
+
+    if args.format in ("json", "both") and not args.from_json:
+        save_json(data)
+
+    if args.format in ("columnar", "both"):
+        save_columnar(data)
\ No newline at end of file
@@ -0,0 +1,409 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+from bisect import bisect_left
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from web.services.columnar import write_library
+
+
+# ----------------------------------------
+# Synthetic libraries
+# ----------------------------------------
+
+# Generates {pid: fetch_single_playlist(...)} datasets (plus "__liked__")
+# at sizes the demo data can't reach, with the shapes that matter for our
+# hot paths:
+#
+#   - artist frequency is Zipf-distributed, with featured artists on ~20%
+#     of tracks
+#   - artists carry 0-8 genres drawn from a family (Rock, Jazz, ...)
+#   - release years skew heavily recent
+#   - playlists are themed by family and mostly drawn from Liked Songs,
+#     so the same track shows up in several places
+#
+# The same (tracks, seed) always produces the same library.
+#
+#   python scripts/synthetic_library.py --tracks 100000 --seed 1 --format both
+
+ID_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+GENRE_FAMILIES = [
+    "Rock", "Pop", "Hip Hop", "Indie", "Electronic", "Jazz", "Country",
+    "R&B", "Metal", "Folk", "Soul", "Punk", "House", "Blues", "Latin",
+    "Classical", "Reggae", "Ambient", "Funk", "Swing", "Bluegrass", "Opera",
+    "Disco", "Techno", "Soundtrack",
+]
+
+GENRE_PREFIXES = [
+    "Indie", "Alternative", "Modern", "Classic", "Dark", "Neo", "Progressive",
+    "Melodic", "Deep", "Acoustic", "Chamber", "Dream", "Lo-Fi", "Vintage",
+    "Experimental", "Nordic", "UK", "Contemporary", "Underground", "Psychedelic",
+]
+
+# P(artist has n genres), n = 0..8
+GENRE_COUNT_WEIGHTS = [0.18, 0.20, 0.20, 0.15, 0.11, 0.07, 0.05, 0.03, 0.01]
+
+# (tracks on the album, weight): singles, EPs, albums, long albums
+ALBUM_SIZES = [(1, 0.22), (4, 0.08), (6, 0.08), (10, 0.25), (12, 0.22), (16, 0.10), (22, 0.05)]
+
+PLAYLIST_SUFFIXES = [
+    "Essentials", "Deep Cuts", "Mix", "Favourites", "Radio", "Vibes",
+    "Archive", "Late Night", "Roadtrip", "Rotation",
+]
+
+LIKED_IMAGE = "https://misc.scdn.co/liked-songs/liked-songs-300.png"
+
+
+class Zipf:
+
+    def __init__(self, n, s):
+        total = 0.0
+        self.cum = []
+        for rank in range(1, n + 1):
+            total += 1.0 / rank ** s
+            self.cum.append(total)
+        self.total = total
+
+    def sample(self, rng):
+        return bisect_left(self.cum, rng.random() * self.total)
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+def _new_id(rng):
+    return "".join(rng.choices(ID_ALPHABET, k=22))
+
+def _release_date(rng, year):
+    shape = rng.random()
+    if shape < 0.10:
+        return str(year)
+    if shape < 0.15:
+        return f"{year}-{rng.randint(1, 12):02d}"
+    return f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+def _clamp(value, lo, hi):
+    return max(lo, min(hi, int(round(value))))
+
+
+# ----------------------------------------
+# Catalog
+# ----------------------------------------
+
+def _genre_names():
+    # family -> genres in that family, most common first
+    return {
+        family: [family] + [f"{prefix} {family}" for prefix in GENRE_PREFIXES if prefix != family]
+        for family in GENRE_FAMILIES
+    }
+
+def _make_artists(rng, count, genres_by_family):
+
+    family_zipf = Zipf(len(GENRE_FAMILIES), 0.8)
+    genre_zipf = Zipf(len(GENRE_PREFIXES), 1.1)
+    all_families = len(GENRE_FAMILIES)
+
+    artists = []
+
+    for rank in range(count):
+        family = family_zipf.sample(rng)
+        pool = genres_by_family[GENRE_FAMILIES[family]]
+
+        n = rng.choices(range(len(GENRE_COUNT_WEIGHTS)), weights=GENRE_COUNT_WEIGHTS)[0]
+        genres = []
+        while len(genres) < n:
+            # Mostly within the family, sometimes a neighbour's
+            if rng.random() < 0.15:
+                other = genres_by_family[GENRE_FAMILIES[rng.randrange(all_families)]]
+                genre = other[genre_zipf.sample(rng) % len(other)]
+            else:
+                genre = pool[genre_zipf.sample(rng) % len(pool)]
+            if genre not in genres:
+                genres.append(genre)
+
+        aid = _new_id(rng)
+
+        artists.append({
+            "id": aid,
+            "name": f"Artist {rank + 1}",
+            "family": family,
+            "genres": genres,
+            "image_url": f"https://i.scdn.co/image/synthetic-{aid}" if rng.random() < 0.95 else None,
+            # Head artists are the popular ones
+            "popularity": 78 - 11 * math.log10(rank + 1),
+            "album": None,
+        })
+
+    return artists
+
+def _album_for(rng, artist, current_year):
+
+    album = artist["album"]
+    if album and album["used"] < album["size"]:
+        album["used"] += 1
+        return album, album["used"]
+
+    # Exponential skew towards recent releases, floored at 1940
+    year = max(1940, current_year - int(rng.expovariate(1 / 11)))
+    album_id = _new_id(rng)
+    size = _weighted(rng, ALBUM_SIZES)
+
+    album = {
+        "meta": {
+            "album_id": album_id,
+            "album_name": f"Album {album_id[:6]}",
+            "release_date": _release_date(rng, year),
+            "total_tracks": size,
+        },
+        "year": year,
+        "size": size,
+        "used": 1,
+    }
+    artist["album"] = album
+    return album, 1
+
+def _make_tracks(rng, count, artists, current_year):
+
+    artist_zipf = Zipf(len(artists), 1.05)
+    tracks = []
+
+    for _ in range(count):
+        primary = artists[artist_zipf.sample(rng)]
+
+        credited = [primary]
+        extra = _weighted(rng, [(0, 0.80), (1, 0.16), (2, 0.03), (3, 0.01)])
+        while len(credited) < 1 + extra:
+            featured = artists[artist_zipf.sample(rng)]
+            if featured not in credited:
+                credited.append(featured)
+
+        album, track_number = _album_for(rng, primary, current_year)
+        age = current_year - album["year"]
+        tid = _new_id(rng)
+
+        tracks.append({
+            "track_id": tid,
+            "track_name": f"Track {tid[:8]}",
+            "popularity": _clamp(primary["popularity"] + rng.gauss(0, 10) - age * 0.25, 0, 100),
+            "duration_ms": _clamp(rng.lognormvariate(math.log(215000), 0.28), 30000, 1800000),
+            "explicit": rng.random() < 0.12,
+            "track_number": track_number,
+            "disc_number": 1,
+            "preview_url": None,
+            "spotify_url": f"https://open.spotify.com/track/{tid}",
+            "album": dict(album["meta"]),
+            "artists": [
+                {
+                    "artist_id": a["id"],
+                    "artist_name": a["name"],
+                    # Shared per artist, as with artist_cache in a real fetch
+                    "genres": a["genres"],
+                    "image_url": a["image_url"],
+                }
+                for a in credited
+            ],
+            "_family": primary["family"],
+        })
+
+    return tracks
+
+
+# ----------------------------------------
+# Library
+# ----------------------------------------
+
+def _playlist(pid, name, image, tracks, snapshot_id=None):
+    return {
+        "playlist_id": pid,
+        "playlist_name": name,
+        "image": image,
+        "playlist_track_total": len(tracks),
+        "snapshot_id": snapshot_id or hashlib.sha1(f"{pid}:{len(tracks)}".encode()).hexdigest()[:22],
+        "tracks": tracks,
+    }
+
+def default_playlist_count(tracks):
+    return max(5, min(500, tracks // 250))
+
+def generate_library(
+    tracks=10000,
+    seed=0,
+    playlists=None,
+    liked_fraction=0.45,
+    overlap=0.6,
+    artists_per_track=0.12,
+    current_year=2025,
+):
+    """Build a synthetic {pid: playlist dataset} library with `tracks` unique tracks.
+
+    Track dicts are shared between the playlists they appear in (the JSON
+    output is identical to a real fetch); copy before mutating.
+    """
+
+    rng = random.Random(seed)
+    playlists = playlists or default_playlist_count(tracks)
+
+    artists = _make_artists(rng, max(10, int(tracks * artists_per_track)), _genre_names())
+    catalog = _make_tracks(rng, tracks, artists, current_year)
+
+    # Liked Songs: a random slice of the catalog, newest first
+    order = list(range(tracks))
+    rng.shuffle(order)
+    liked_count = int(tracks * liked_fraction)
+    liked = [catalog[i] for i in order[:liked_count]]
+    unliked = [catalog[i] for i in order[liked_count:]]
+
+    liked_by_family = {}
+    for t in liked:
+        liked_by_family.setdefault(t["_family"], []).append(t)
+
+    # Playlists are themed, with more playlists for bigger families
+    family_sizes = {}
+    for t in catalog:
+        family_sizes[t["_family"]] = family_sizes.get(t["_family"], 0) + 1
+
+    families = list(family_sizes)
+    weights = [family_sizes[f] for f in families]
+    themes = [rng.choices(families, weights=weights)[0] for _ in range(playlists)]
+
+    by_theme = {}
+    for i, family in enumerate(themes):
+        by_theme.setdefault(family, []).append(i)
+
+    contents = [[] for _ in range(playlists)]
+
+    # Every track not in Liked Songs lives in some playlist
+    for t in unliked:
+        candidates = by_theme.get(t["_family"])
+        target = rng.choice(candidates) if candidates else rng.randrange(playlists)
+        contents[target].append(t)
+
+    # Then each playlist pulls from Liked Songs until `overlap` of it is liked
+    for i, family in enumerate(themes):
+        own = len(contents[i])
+        want = max(10, int(own * overlap / (1 - overlap))) if overlap < 1 else max(10, own)
+
+        themed = liked_by_family.get(family, [])
+        from_theme = min(len(themed), int(want * 0.85))
+        picks = rng.sample(themed, from_theme)
+        if liked:
+            picks += rng.choices(liked, k=want - from_theme)
+
+        seen = set()
+        contents[i].extend(t for t in picks if not (t["track_id"] in seen or seen.add(t["track_id"])))
+        rng.shuffle(contents[i])
+
+    for t in catalog:
+        del t["_family"]
+
+    library = {
+        "__liked__": _playlist(
+            "__liked__",
+            "Liked Songs",
+            LIKED_IMAGE,
+            liked,
+            snapshot_id=f"{len(liked)}:synthetic-{seed}"
+        )
+    }
+
+    name_counts = {}
+
+    for i, family in enumerate(themes):
+        suffix = PLAYLIST_SUFFIXES[rng.randrange(len(PLAYLIST_SUFFIXES))]
+        name = f"{GENRE_FAMILIES[family]} {suffix}"
+        name_counts[name] = name_counts.get(name, 0) + 1
+        if name_counts[name] > 1:
+            name = f"{name} {name_counts[name]}"
+
+        pid = _new_id(rng)
+        library[pid] = _playlist(
+            pid,
+            name,
+            f"https://image-cdn-fa.spotifycdn.com/image/synthetic-{pid}",
+            contents[i]
+        )
+
+    return library
+
+def describe(library):
+
+    unique = {}
+    artists = set()
+    albums = set()
+    genres = set()
+    entries = 0
+    in_playlists = set()
+
+    for pid, playlist in library.items():
+        for t in playlist["tracks"]:
+            entries += 1
+            unique[t["track_id"]] = t
+            albums.add(t["album"]["album_id"])
+            if pid != "__liked__":
+                in_playlists.add(t["track_id"])
+            for a in t["artists"]:
+                artists.add(a["artist_id"])
+                genres.update(a["genres"])
+
+    liked = {t["track_id"] for t in library.get("__liked__", {}).get("tracks", [])}
+
+    return {
+        "playlists": len(library) - ("__liked__" in library),
+        "unique_tracks": len(unique),
+        "entries": entries,
+        "liked": len(liked),
+        "liked_in_playlists": round(len(liked & in_playlists) / len(liked), 3) if liked else 0,
+        "artists": len(artists),
+        "albums": len(albums),
+        "genres": len(genres),
+    }
+
+
+# ----------------------------------------
+# RUN
+# ----------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic library dataset")
+    parser.add_argument("--tracks", type=int, default=10000, help="unique tracks in the library")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--playlists", type=int, default=None)
+    parser.add_argument("--liked-fraction", type=float, default=0.45)
+    parser.add_argument("--overlap", type=float, default=0.6, help="share of each playlist drawn from Liked Songs")
+    parser.add_argument("--out", help="output path without extension (default data/synthetic/<tracks>-s<seed>)")
+    parser.add_argument(
+        "--format",
+        choices=["json", "columnar", "both"],
+        default="json"
+    )
+    args = parser.parse_args()
+
+    library = generate_library(
+        tracks=args.tracks,
+        seed=args.seed,
+        playlists=args.playlists,
+        liked_fraction=args.liked_fraction,
+        overlap=args.overlap
+    )
+
+    print(json.dumps(describe(library), indent=2))
+
+    out = args.out or os.path.join("data", "synthetic", f"{args.tracks}-s{args.seed}")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+
+    if args.format in ("json", "both"):
+        with open(out + ".json", "w") as f:
+            json.dump(library, f)
+        print(f"\n✅ Saved {out}.json")
+
+    if args.format in ("columnar", "both"):
+        size = write_library(out + ".smlib", library)
+        print(f"\n✅ Saved {out}.smlib ({size} bytes)")
@@ -71,27 +71,22 @@ export function buildHistogram(ctx, labels, values) {
     });
 }
 
-export function renderHistogram(durations) {
+export function renderHistogram(histogram) {
 
-    const bucketSize = 30;
-    const buckets = {};
+    // Server-side bins: { start, bin_width, counts }; empty buckets are skipped
+    const { start, bin_width: bucketSize, counts } = histogram;
 
-    durations.forEach(sec => {
-        const bucket = Math.floor(sec / bucketSize) * bucketSize;
-        buckets[bucket] = (buckets[bucket] || 0) + 1;
-    });
+    const labels = [];
+    const values = [];
 
-    const sortedBuckets = Object.keys(buckets)
-        .map(Number)
-        .sort((a,b)=>a-b);
+    counts.forEach((count, i) => {
+        if (!count) return;
 
-    const labels = sortedBuckets.map(start => {
-        const end = start + bucketSize;
-        return `${formatTime(start)}-${formatTime(end)}`;
+        const bucketStart = start + i * bucketSize;
+        labels.push(`${formatTime(bucketStart)}-${formatTime(bucketStart + bucketSize)}`);
+        values.push(count);
     });
 
-    const values = sortedBuckets.map(k => buckets[k]);
-
     const ctx = document.getElementById("wsChart").getContext("2d");
     const inner = document.getElementById("wsAnalyticsOutput");
 
@@ -167,28 +162,24 @@ export function renderScatter(durations) {
     }));
 }
 
-export function renderPopularityHistogram(values) {
+export function renderPopularityHistogram(histogram) {
 
-    const bins = Array(10).fill(0);
+    // Server-side bins over 0-100; the last bin also holds 100
+    const { start, bin_width: width, counts: bins } = histogram;
+    const last = Math.max(bins.length - 1, 1);
 
-    values.forEach(v => {
-        const n = Number(v);
-        if (!Number.isFinite(n)) return;
-        const idx = Math.min(Math.floor(n / 10), 9);
-        bins[idx]++;
+    const labels = bins.map((_, i) => {
+        const lo = start + i * width;
+        const hi = i === bins.length - 1 ? 100 : lo + width - 1;
+        return `${Math.round(lo)}-${Math.round(hi)}`;
     });
 
-    const labels = [
-        "0-9","10-19","20-29","30-39","40-49",
-        "50-59","60-69","70-79","80-89","90-100"
-    ];
-
     const ctx = document.getElementById("wsChart").getContext("2d");
 
     const buildChart = () => {
         const barColors = bins.map((_, index) => {
 
-            const progress = index / 9;
+            const progress = index / last;
 
             const start = { r: 255, g: 255, b: 255, a: 0.25 };
             const end   = { r: 29,  g: 185, b: 84,  a: 1.0 };
@@ -142,7 +142,7 @@ export async function renderAvgLength(data, currentSelection) {
         </div>
     `;
 
-    renderHistogram(data.durations);
+    renderHistogram(data.histogram);
 
     makeOverlayDraggable(true);
 }
\ No newline at end of file
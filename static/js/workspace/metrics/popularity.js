@@ -40,7 +40,7 @@ export function renderPopularity(data, currentSelection) {
 
     const out = document.getElementById("wsAnalyticsOutput");
 
-    if (!data || !data.distribution || data.distribution.length === 0) {
+    if (!data || !data.track_count) {
         out.innerHTML = `<p style="opacity:0.7;">No popularity data.</p>`;
         return;
     }
@@ -71,7 +71,8 @@ export function renderPopularity(data, currentSelection) {
             ? "Contains a breakout hit"
             : "No extreme outliers";
 
-    const radioCount = data.distribution.filter(p => p >= 60).length;
+    const tierCounts = data.tier_counts || {};
+    const radioCount = (tierCounts.popular || 0) + (tierCounts.hit || 0);
 
     const radioDensity = (
         radioCount / data.track_count * 100
@@ -195,7 +196,7 @@ export function renderPopularity(data, currentSelection) {
         });
     }
 
-    renderPopularityHistogram(data.distribution);
+    renderPopularityHistogram(data.histogram);
 }
 
 function getPopularityToneClass(avg) {
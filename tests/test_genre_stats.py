@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+from web.routes.analytics import compute_genres
+
+DEMO_DATA = Path(__file__).resolve().parent.parent / "static" / "demoData.json"
+
+
+def baseline_ranking(tracks):
+
+    # The pre-numpy /api/genres ranking: counts in first-appearance order,
+    # stable-sorted by count. It deduped each track's genres through a set,
+    # so ties first seen on the same track followed hash order; dedupe in
+    # artist order instead, which is what the index does.
+    genre_counts = {}
+
+    for track in tracks:
+        genres = dict.fromkeys(
+            g
+            for artist in track.get("artists", [])
+            for g in artist.get("genres", [])
+            if g
+        )
+
+        for g in genres:
+            genre_counts[g] = genre_counts.get(g, 0) + 1
+
+    return sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)
+
+
+def track(track_id, *genres):
+    return {
+        "track_id": track_id,
+        "track_name": track_id,
+        "artists": [{"genres": [g]} for g in genres],
+    }
+
+
+def ranking(stats):
+    return [(g["genre"], g["count"]) for g in stats["all_genres"]]
+
+
+def test_playlist_ties_rank_by_first_appearance_in_that_playlist():
+
+    # "rock" comes first across the selection, "jazz" first in b
+    dataset = {
+        "a": {"playlist_name": "A", "tracks": [track("t1", "rock"), track("t2", "jazz")]},
+        "b": {"playlist_name": "B", "tracks": [track("t3", "jazz"), track("t4", "rock")]},
+    }
+
+    data = compute_genres(dataset)["data"]
+
+    assert data["playlists"]["a"]["top_genre"] == "rock"
+    assert data["playlists"]["b"]["top_genre"] == "jazz"
+    assert ranking(data["playlists"]["b"]) == [("jazz", 1), ("rock", 1)]
+    assert ranking(data["combined"]) == [("rock", 2), ("jazz", 2)]
+
+
+def test_demo_rankings_match_baseline():
+
+    dataset = json.loads(DEMO_DATA.read_text(encoding="utf-8"))
+    data = compute_genres(dataset)["data"]
+
+    combined_tracks = []
+
+    for pid, playlist in dataset.items():
+        expected = baseline_ranking(playlist["tracks"])
+        if not expected:
+            continue
+
+        stats = data["playlists"][pid]
+
+        assert ranking(stats) == expected, pid
+        assert stats["top_genre"] == expected[0][0], pid
+        assert [(g["genre"], g["count"]) for g in stats["top_10"]] == expected[:10], pid
+
+        combined_tracks.extend(playlist["tracks"])
+
+    assert ranking(data["combined"]) == baseline_ranking(combined_tracks)
+
+    # Tied with "Indie" on 25 tracks, and first seen on an earlier track
+    assert data["playlists"]["0QZR6OU92p4fYC3Z28GVFY"]["top_genre"] == "Bedroom Pop"
@@ -2,14 +2,20 @@ from dotenv import load_dotenv
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.sessions import SessionMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from .routes import router
-import os
+from .sessions import ServerSessionMiddleware, SessionStore
+from .state import SESSION_BACKEND
+from .utils.responses import FastJSONResponse, COMPRESS_MIN_BYTES
+from .utils.timing import ServerTimingMiddleware
+from .utils.metrics import MetricsMiddleware
+from .utils.profiling import ProfilingMiddleware
+from . import config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 
-app = FastAPI(debug=True)
+app = FastAPI(debug=True, default_response_class=FastJSONResponse)
 
 app.mount(
     "/static",
@@ -18,10 +24,25 @@ app.mount(
 )
 
 app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.getenv("SESSION_SECRET_KEY", "dev_secret"),
+    ServerSessionMiddleware,
+    store=SessionStore(SESSION_BACKEND, max_age=config.SESSION_MAX_AGE),
     same_site="lax",
     https_only=True
 )
 
+# Pre-encoded results set Content-Encoding themselves and are skipped here
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+# Only does anything for admin requests that ask for a profile
+if config.ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware, interval_ms=config.PROFILE_INTERVAL_MS)
+
+# Wraps session loading and compression, so timings include them
+if config.SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Outermost (added last), so request latency includes Server-Timing's cost
+if config.METRICS:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,871 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from web import config
+from web.utils.sizing import deep_sizeof
+
+# ------------------------------------------------------------
+# Serialization
+# ------------------------------------------------------------
+
+# Datasets are plain dicts/lists of str/int/None, so pickle + a fast zlib
+# level gives a compact blob that is much cheaper to decode than JSON.
+# The store is only ever written by this app, never by clients.
+
+def encode_value(value):
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+def decode_value(blob):
+    return pickle.loads(zlib.decompress(blob))
+
+# ------------------------------------------------------------
+# Backends
+# ------------------------------------------------------------
+
+# Every backend exposes the same small hash API: a named hash holds
+# field -> value pairs. Shared backends store encoded bytes, the memory
+# backend stores the objects themselves.
+
+class MemoryBackend:
+
+    shared = False
+
+    def __init__(self):
+        self._data = {}
+
+    def hget(self, name, field):
+        return self._data.get(name, {}).get(field)
+
+    def hmget(self, name, fields):
+        bucket = self._data.get(name, {})
+        return [bucket.get(f) for f in fields]
+
+    def hset(self, name, field, value):
+        self._data.setdefault(name, {})[field] = value
+
+    def hdel(self, name, field):
+        bucket = self._data.get(name)
+        if bucket is not None:
+            bucket.pop(field, None)
+            if not bucket:
+                self._data.pop(name, None)
+
+    def hkeys(self, name):
+        return list(self._data.get(name, {}).keys())
+
+    def delete(self, name):
+        self._data.pop(name, None)
+
+
+class SQLiteBackend:
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "name TEXT NOT NULL, field TEXT NOT NULL, value BLOB NOT NULL, "
+            "PRIMARY KEY (name, field))"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hget(self, name, field):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE name = ? AND field = ?",
+            (name, field)
+        ).fetchone()
+        return row[0] if row else None
+
+    def hmget(self, name, fields):
+        if not fields:
+            return []
+
+        placeholders = ",".join("?" for _ in fields)
+        rows = self._conn().execute(
+            f"SELECT field, value FROM cache WHERE name = ? AND field IN ({placeholders})",
+            (name, *fields)
+        ).fetchall()
+
+        found = dict(rows)
+        return [found.get(f) for f in fields]
+
+    def hset(self, name, field, value):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (name, field, value) VALUES (?, ?, ?)",
+            (name, field, value)
+        )
+
+    def hdel(self, name, field):
+        self._conn().execute(
+            "DELETE FROM cache WHERE name = ? AND field = ?",
+            (name, field)
+        )
+
+    def hkeys(self, name):
+        rows = self._conn().execute(
+            "SELECT field FROM cache WHERE name = ?",
+            (name,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def delete(self, name):
+        self._conn().execute("DELETE FROM cache WHERE name = ?", (name,))
+
+
+class RedisBackend:
+
+    shared = True
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def hget(self, name, field):
+        return self._redis.hget(name, field)
+
+    def hmget(self, name, fields):
+        if not fields:
+            return []
+        return self._redis.hmget(name, fields)
+
+    def hset(self, name, field, value):
+        self._redis.hset(name, field, value)
+
+    def hdel(self, name, field):
+        self._redis.hdel(name, field)
+
+    def hkeys(self, name):
+        return [k.decode() for k in self._redis.hkeys(name)]
+
+    def delete(self, name):
+        self._redis.delete(name)
+
+
+class SnapshotBackend:
+    """One file per field under root/<name>/, written atomically.
+
+    Not shared: it is the persistent copy behind the memory backend.
+    """
+
+    shared = False
+
+    MAGIC = b"SMSNAP1\n"
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, name):
+        return self.root / quote(name, safe="")
+
+    def _path(self, name, field):
+        return self._dir(name) / (quote(field, safe="") + ".snap")
+
+    def hget(self, name, field):
+        try:
+            with open(self._path(name, field), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        if not data.startswith(self.MAGIC):
+            return None
+
+        return data[len(self.MAGIC):]
+
+    def hmget(self, name, fields):
+        return [self.hget(name, f) for f in fields]
+
+    def hset(self, name, field, value):
+        directory = self._dir(name)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.MAGIC)
+                f.write(value)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self._path(name, field))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def hdel(self, name, field):
+        try:
+            os.unlink(self._path(name, field))
+        except FileNotFoundError:
+            pass
+
+    def hkeys(self, name):
+        directory = self._dir(name)
+
+        if not directory.is_dir():
+            return []
+
+        return [
+            unquote(p.name[:-len(".snap")])
+            for p in directory.iterdir()
+            if p.name.endswith(".snap")
+        ]
+
+    def delete(self, name):
+        shutil.rmtree(self._dir(name), ignore_errors=True)
+
+    def expire(self, older_than, keep=()):
+        """Delete snapshots last written before older_than, except under
+        the hashes named in keep. Returns the number of files removed."""
+
+        removed = 0
+
+        for directory in self.root.iterdir():
+            if not directory.is_dir() or unquote(directory.name) in keep:
+                continue
+
+            for path in directory.iterdir():
+                try:
+                    if path.stat().st_mtime < older_than:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+
+            try:
+                directory.rmdir()  # only succeeds once empty
+            except OSError:
+                pass
+
+        return removed
+
+
+def get_backend(kind=None):
+    kind = kind or config.CACHE_BACKEND
+
+    if kind == "memory":
+        return MemoryBackend()
+
+    if kind == "sqlite":
+        return SQLiteBackend(config.CACHE_SQLITE_PATH)
+
+    if kind == "redis":
+        return RedisBackend(config.REDIS_URL)
+
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+# ------------------------------------------------------------
+# Namespaces
+# ------------------------------------------------------------
+
+class CacheNamespace:
+    """Dict-like mapping stored as one hash, e.g. user_id -> playlist listing."""
+
+    def __init__(self, backend, name, sized=False):
+        self.backend = backend
+        self.name = name
+
+        # key -> size of the value, recorded as it is written: the deep size
+        # for the memory backend, the encoded size for shared ones. Only
+        # covers writes made by this worker.
+        self.sizes = {} if sized else None
+
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    def get(self, key, default=None):
+        value = self.backend.hget(self.name, key)
+
+        if value is None:
+            return default
+
+        return decode_value(value) if self.shared else value
+
+    def get_many(self, keys):
+        keys = list(keys)
+        values = self.backend.hmget(self.name, keys)
+
+        return {
+            key: decode_value(value) if self.shared else value
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        stored = encode_value(value) if self.shared else value
+        self.backend.hset(self.name, key, stored)
+
+        if self.sizes is not None:
+            self.sizes[key] = len(stored) if self.shared else deep_sizeof(value)
+
+    def __contains__(self, key):
+        return self.backend.hget(self.name, key) is not None
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self.backend.hdel(self.name, key)
+
+        if self.sizes is not None:
+            self.sizes.pop(key, None)
+
+        return value
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.spills = 0
+        self.restores = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class LRUCache:
+    """Process-local key -> value map, LRU-evicted past budget_bytes.
+
+    Values are size-accounted once, when they are inserted.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.total_bytes = 0
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def get_many(self, keys):
+        out = {}
+
+        with self._lock:
+            for key in keys:
+                item = self._entries.get(key)
+
+                if item is None:
+                    self.stats.misses += 1
+                    continue
+
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                out[key] = item[0]
+
+        return out
+
+    def __setitem__(self, key, value):
+        size = deep_sizeof(key) + deep_sizeof(value)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+
+            while self.total_bytes > self.budget_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted[1]
+                self.stats.evictions += 1
+
+    def snapshot_stats(self):
+        with self._lock:
+            return {
+                **self.stats.as_dict(),
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "budget_bytes": self.budget_bytes
+            }
+
+
+class PlaylistDataCache:
+    """Completed playlist builds, keyed by (user_id, pid).
+
+    Decoded entries live in a process-local LRU that is size-accounted at
+    insert time and held under a global memory budget. Users idle for
+    longer than idle_ttl are dropped entirely. With the memory backend the
+    LRU is the only copy, so entries can be persisted either as write-through
+    snapshots (survive restarts) or by spilling on eviction, and are restored
+    on the next access. Without either, an evicted entry is gone and the
+    on_discarded hooks are told so it can be fetched again. With a shared
+    backend the LRU is just a decoded view; an entry is re-read when its
+    fetched_at stamp changes, and idle users are expired from the shared
+    hashes once no worker has seen them for idle_ttl.
+
+    Each entry's Spotify snapshot_id is kept outside the dataset (in the
+    shared stamps, or in process-local metadata) so snapshot_ids() can
+    compare against a listing without decoding anything. Entries restored
+    from snapshots without that metadata, e.g. written by an earlier
+    process, are reported by unverified() until the caller checks them
+    against Spotify.
+    Snapshots are kept past idle expiry so returning users skip the
+    refetch, and deleted once not rewritten for snapshot_ttl.
+    """
+
+    SWEEP_INTERVAL = 60
+    SNAPSHOT_SWEEP_INTERVAL = 60 * 60
+
+    def __init__(self, backend, name="playlist_data", budget_bytes=None, user_budget_bytes=None, idle_ttl=None, spill=None, snapshots=None, snapshot_ttl=None):
+        self.backend = backend
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self.user_budget_bytes = user_budget_bytes
+        self.idle_ttl = idle_ttl
+        self.persist = snapshots if snapshots is not None else spill
+        self.write_through = snapshots is not None
+        self.snapshot_ttl = snapshot_ttl
+        self.stats = CacheStats()
+        self.on_user_expired = []
+        self.on_discarded = []
+
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._user_bytes = {}
+        self._last_seen = {}
+        self._published_seen = {}
+        self._last_sweep = time.time()
+        self._last_snapshot_sweep = 0
+        self._started_at = time.time()
+        self._unverified = set()
+        self._snapshot_ids = {}
+        self._lock = threading.RLock()
+
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    def _data_key(self, user_id):
+        return f"{self.name}:{user_id}"
+
+    def _stamp_key(self, user_id):
+        return f"{self.name}:{user_id}:stamps"
+
+    def _seen_key(self):
+        return f"{self.name}:seen"
+
+    # Shared stamps are "<fetched_at>:<snapshot_id>": a new fetch changes the
+    # stamp, and the snapshot_id can be read without the dataset. fetched_at
+    # never contains ':', snapshot ids may.
+
+    @staticmethod
+    def _make_stamp(entry):
+        snapshot_id = entry["dataset"].get("snapshot_id") or ""
+        return f"{entry.get('fetched_at', '')}:{snapshot_id}".encode()
+
+    @staticmethod
+    def _stamp_snapshot_id(stamp):
+        return stamp.decode().partition(":")[2] or None
+
+    # ---------------------------------
+    # Local LRU
+    # ---------------------------------
+
+    def _store_local(self, user_id, pid, stamp, entry):
+        size = deep_sizeof(entry)
+
+        with self._lock:
+            self._remove_local(user_id, pid)
+            self._entries[(user_id, pid)] = (stamp, entry, size)
+            self._by_user.setdefault(user_id, set()).add(pid)
+            self._user_bytes[user_id] = self._user_bytes.get(user_id, 0) + size
+            self.total_bytes += size
+
+        self._enforce_budget(user_id)
+
+    def _remove_local(self, user_id, pid):
+        with self._lock:
+            item = self._entries.pop((user_id, pid), None)
+            if item is None:
+                return None
+
+            self.total_bytes -= item[2]
+            self._user_bytes[user_id] = self._user_bytes.get(user_id, 0) - item[2]
+
+            pids = self._by_user.get(user_id)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    self._by_user.pop(user_id, None)
+                    self._user_bytes.pop(user_id, None)
+
+            return item
+
+    def _evict(self, user_id, pid):
+        item = self._remove_local(user_id, pid)
+        if item is None:
+            return False
+
+        if self.shared or self.write_through:
+            return True
+
+        if self.persist is not None:
+            self.persist.hset(self._data_key(user_id), pid, encode_value(item[1]))
+            with self._lock:
+                self.stats.spills += 1
+            return True
+
+        # That was the only copy
+        self._discarded(user_id, pid)
+        return True
+
+    def _discarded(self, user_id, pid):
+        self._snapshot_ids.pop((user_id, pid), None)
+
+        for hook in self.on_discarded:
+            hook(user_id, pid)
+
+    def _enforce_budget(self, user_id=None):
+
+        # A user over their own budget gives up their least recently used
+        # playlists first, so one huge library can't push everyone else out
+        if self.user_budget_bytes and user_id is not None:
+            while True:
+                with self._lock:
+                    if self._user_bytes.get(user_id, 0) <= self.user_budget_bytes or len(self._by_user.get(user_id, ())) <= 1:
+                        break
+                    victim = next(key for key in self._entries if key[0] == user_id)
+
+                if self._evict(*victim):
+                    with self._lock:
+                        self.stats.evictions += 1
+
+        if not self.budget_bytes:
+            return
+
+        while True:
+            with self._lock:
+                if self.total_bytes <= self.budget_bytes or len(self._entries) <= 1:
+                    return
+                (user_id, pid) = next(iter(self._entries))
+
+            if self._evict(user_id, pid):
+                with self._lock:
+                    self.stats.evictions += 1
+
+    def touch(self, user_id):
+        now = time.time()
+        self._last_seen[user_id] = now
+
+        # Other workers expire shared data by this stamp, so it only has to
+        # be fresh to within a sweep interval
+        if self.shared and self.idle_ttl and now - self._published_seen.get(user_id, 0) > self.SWEEP_INTERVAL:
+            self._published_seen[user_id] = now
+            self.backend.hset(self._seen_key(), user_id, str(now).encode())
+
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        now = time.time()
+
+        if not self.idle_ttl or now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+
+        self._last_sweep = now
+        self.sweep_idle(now)
+
+    def sweep_idle(self, now=None):
+        now = now or time.time()
+
+        idle = [
+            user_id for user_id, seen in list(self._last_seen.items())
+            if now - seen > self.idle_ttl
+        ]
+
+        for user_id in idle:
+            self._last_seen.pop(user_id, None)
+            self._published_seen.pop(user_id, None)
+            self._forget_snapshot_ids(user_id)
+
+            if self.persist is not None and not self.write_through:
+                # Spilling would only move an idle user's data to disk
+                for pid in list(self._by_user.get(user_id, ())):
+                    self._remove_local(user_id, pid)
+                self.persist.delete(self._data_key(user_id))
+            else:
+                for pid in list(self._by_user.get(user_id, ())):
+                    self._evict(user_id, pid)
+
+            with self._lock:
+                self.stats.expirations += 1
+
+            for hook in self.on_user_expired:
+                hook(user_id)
+
+        if self.shared:
+            self._sweep_shared(now)
+
+        if self.write_through and self.snapshot_ttl and now - self._last_snapshot_sweep >= self.SNAPSHOT_SWEEP_INTERVAL:
+            self._last_snapshot_sweep = now
+            self.sweep_snapshots(now)
+
+        return idle
+
+    def sweep_snapshots(self, now=None):
+        now = now or time.time()
+
+        # Users active here keep theirs even if nothing was rewritten lately
+        active = {self._data_key(user_id) for user_id in list(self._last_seen)}
+
+        return self.persist.expire(now - self.snapshot_ttl, keep=active)
+
+    def _sweep_shared(self, now):
+
+        # Users no worker has touched within idle_ttl, including ones only
+        # a stopped worker knew about
+        users = self.backend.hkeys(self._seen_key())
+        stamps = self.backend.hmget(self._seen_key(), users)
+
+        for user_id, seen in zip(users, stamps):
+            if seen is None or now - float(seen) <= self.idle_ttl:
+                continue
+
+            self.backend.delete(self._stamp_key(user_id))
+            self.backend.delete(self._data_key(user_id))
+            self.backend.hdel(self._seen_key(), user_id)
+
+    # ---------------------------------
+    # Public API
+    # ---------------------------------
+
+    def ids(self, user_id):
+        if self.shared:
+            return set(self.backend.hkeys(self._stamp_key(user_id)))
+
+        ids = set(self._by_user.get(user_id, ()))
+
+        if self.persist is not None:
+            ids.update(self.persist.hkeys(self._data_key(user_id)))
+
+        return ids
+
+    def has(self, user_id, pid):
+        if self.shared:
+            return self.backend.hget(self._stamp_key(user_id), pid) is not None
+
+        if (user_id, pid) in self._entries:
+            return True
+
+        return self.persist is not None and self.persist.hget(self._data_key(user_id), pid) is not None
+
+    def get(self, user_id, pid):
+        return self.get_many(user_id, [pid]).get(pid)
+
+    def get_many(self, user_id, pids):
+        pids = list(pids)
+        self.touch(user_id)
+
+        stamps = None
+        if self.shared:
+            stamps = self.backend.hmget(self._stamp_key(user_id), pids)
+        else:
+            stamps = [None] * len(pids)
+
+        out = {}
+        misses = []
+
+        with self._lock:
+            for pid, stamp in zip(pids, stamps):
+                if self.shared and stamp is None:
+                    continue
+
+                local = self._entries.get((user_id, pid))
+
+                if local and (not self.shared or local[0] == stamp):
+                    self._entries.move_to_end((user_id, pid))
+                    out[pid] = local[1]
+                    self.stats.hits += 1
+                else:
+                    misses.append((pid, stamp))
+                    self.stats.misses += 1
+
+        if not misses:
+            return out
+
+        source = self.backend if self.shared else self.persist
+        if source is None:
+            return out
+
+        blobs = source.hmget(self._data_key(user_id), [pid for pid, _ in misses])
+
+        for (pid, stamp), blob in zip(misses, blobs):
+            if blob is None:
+                continue
+
+            entry = decode_value(blob)
+            out[pid] = entry
+
+            if not self.shared:
+                if self.write_through:
+                    # Without metadata nothing has compared it to a listing
+                    if (user_id, pid) not in self._snapshot_ids or entry.get("fetched_at", 0) < self._started_at:
+                        self._unverified.add((user_id, pid))
+                    self._snapshot_ids[(user_id, pid)] = entry["dataset"].get("snapshot_id")
+                else:
+                    self.persist.hdel(self._data_key(user_id), pid)
+
+                with self._lock:
+                    self.stats.restores += 1
+
+            self._store_local(user_id, pid, stamp, entry)
+
+        return out
+
+    def versions(self, user_id, pids):
+
+        # Cheap content version per playlist (its fetched_at stamp) without
+        # loading entries. None when unknown here: not loaded locally yet,
+        # or restored but not verified against Spotify.
+
+        if self.shared:
+            stamps = self.backend.hmget(self._stamp_key(user_id), pids)
+            return {
+                pid: stamp.decode() if stamp is not None else None
+                for pid, stamp in zip(pids, stamps)
+            }
+
+        with self._lock:
+            out = {}
+
+            for pid in pids:
+                local = self._entries.get((user_id, pid))
+
+                if local is None or (user_id, pid) in self._unverified:
+                    out[pid] = None
+                else:
+                    out[pid] = str(local[1].get("fetched_at", ""))
+
+            return out
+
+    def snapshot_ids(self, user_id, pids):
+
+        # Saved snapshot_id per playlist without loading entries. None when
+        # not known here: restored snapshots are checked on load instead.
+
+        if self.shared:
+            stamps = self.backend.hmget(self._stamp_key(user_id), pids)
+            return {
+                pid: self._stamp_snapshot_id(stamp) if stamp is not None else None
+                for pid, stamp in zip(pids, stamps)
+            }
+
+        return {pid: self._snapshot_ids.get((user_id, pid)) for pid in pids}
+
+    def _forget_snapshot_ids(self, user_id):
+        for key in [k for k in self._snapshot_ids if k[0] == user_id]:
+            self._snapshot_ids.pop(key, None)
+
+    def put(self, user_id, pid, entry):
+        self.touch(user_id)
+
+        stamp = None
+
+        if self.shared:
+            stamp = self._make_stamp(entry)
+            self.backend.hset(self._data_key(user_id), pid, encode_value(entry))
+            self.backend.hset(self._stamp_key(user_id), pid, stamp)
+        elif self.write_through:
+            self.persist.hset(self._data_key(user_id), pid, encode_value(entry))
+        elif self.persist is not None:
+            self.persist.hdel(self._data_key(user_id), pid)
+
+        if not self.shared:
+            self._snapshot_ids[(user_id, pid)] = entry["dataset"].get("snapshot_id")
+
+        self._unverified.discard((user_id, pid))
+        self._store_local(user_id, pid, stamp, entry)
+
+    def drop(self, user_id, pid):
+        self._remove_local(user_id, pid)
+        self._unverified.discard((user_id, pid))
+        self._snapshot_ids.pop((user_id, pid), None)
+
+        if self.shared:
+            self.backend.hdel(self._stamp_key(user_id), pid)
+            self.backend.hdel(self._data_key(user_id), pid)
+        elif self.persist is not None:
+            self.persist.hdel(self._data_key(user_id), pid)
+
+    def drop_user(self, user_id):
+        for pid in list(self._by_user.get(user_id, ())):
+            self._remove_local(user_id, pid)
+
+        self._last_seen.pop(user_id, None)
+        self._published_seen.pop(user_id, None)
+        self._unverified = {k for k in self._unverified if k[0] != user_id}
+        self._forget_snapshot_ids(user_id)
+
+        if self.shared:
+            self.backend.delete(self._stamp_key(user_id))
+            self.backend.delete(self._data_key(user_id))
+            self.backend.hdel(self._seen_key(), user_id)
+        elif self.persist is not None:
+            self.persist.delete(self._data_key(user_id))
+
+    def unverified(self, user_id, pids):
+        return [pid for pid in pids if (user_id, pid) in self._unverified]
+
+    def mark_verified(self, user_id, pid):
+        self._unverified.discard((user_id, pid))
+
+    def user_footprints(self):
+        with self._lock:
+            return {
+                user_id: {"bytes": size, "entries": len(self._by_user.get(user_id, ()))}
+                for user_id, size in self._user_bytes.items()
+            }
+
+    def snapshot_stats(self):
+        with self._lock:
+            return {
+                **self.stats.as_dict(),
+                "entries": len(self._entries),
+                "users": len(self._by_user),
+                "total_bytes": self.total_bytes,
+                "budget_bytes": self.budget_bytes,
+            }
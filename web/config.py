@@ -1 +1,108 @@
-DEBUG_BUILD = True
\ No newline at end of file
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+load_dotenv(BASE_DIR / ".env")
+
+# ------------------------------------------------------------
+# Cache backend
+# ------------------------------------------------------------
+
+# "memory" keeps everything in this process (single worker only).
+# "sqlite" and "redis" share completed builds between workers.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", str(BASE_DIR / "data" / "cache.sqlite3"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Process-local playlist data is size-accounted and LRU-evicted past this budget
+CACHE_MEMORY_BUDGET_MB = int(os.getenv("CACHE_MEMORY_BUDGET_MB", "1024"))
+
+# Optional per-user share of that budget: a user over it loses their own
+# least recently used playlists first. 0 leaves eviction purely global.
+CACHE_USER_BUDGET_MB = int(os.getenv("CACHE_USER_BUDGET_MB", "0"))
+
+# Users not seen for this long have all their cached data dropped
+CACHE_USER_IDLE_TTL = int(os.getenv("CACHE_USER_IDLE_TTL", str(6 * 60 * 60)))
+
+# Optional SQLite file that evicted playlists spill to (memory backend only)
+CACHE_SPILL_PATH = os.getenv("CACHE_SPILL_PATH")
+
+# Completed playlists are snapshotted here so restarts reload from disk
+# instead of refetching (memory backend only). Set to "" to disable.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", str(BASE_DIR / "data" / "snapshots"))
+
+# Snapshots not rewritten for this long are deleted (0 keeps them forever)
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", str(14 * 24 * 60 * 60)))
+
+# ------------------------------------------------------------
+# Sessions
+# ------------------------------------------------------------
+
+# Sessions are stored server-side in the cache backend; the cookie only
+# carries an opaque id
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 60 * 60)))
+
+# With the memory backend, sessions go to this SQLite file instead so a
+# restart doesn't log everyone out. Set to "" to keep them in memory.
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", str(BASE_DIR / "data" / "sessions.sqlite3"))
+
+# ------------------------------------------------------------
+# Admin
+# ------------------------------------------------------------
+
+# Admin endpoints require this value in the X-Admin-Token header (or as
+# "Authorization: Bearer <token>").
+# Left unset, they are disabled.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# ------------------------------------------------------------
+# Responses
+# ------------------------------------------------------------
+
+# Pre-encoded analytics results kept per process, LRU-evicted past this size
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "64"))
+
+# Album artwork/release metadata shared by all users, per process
+ALBUM_CACHE_MB = int(os.getenv("ALBUM_CACHE_MB", "32"))
+
+# Per-playlist genre indexes behind /api/genres, per process
+GENRE_INDEX_CACHE_MB = int(os.getenv("GENRE_INDEX_CACHE_MB", "64"))
+
+# ------------------------------------------------------------
+# Spotify endpoints
+# ------------------------------------------------------------
+
+# Point the app at another Web API / accounts host, e.g. the local fake
+# in scripts/fake_spotify.py. Left unset, the real Spotify hosts are used.
+SPOTIFY_API_PREFIX = os.getenv("SPOTIFY_API_PREFIX")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL")
+
+# ------------------------------------------------------------
+# Observability
+# ------------------------------------------------------------
+
+# Adds Server-Timing headers (auth, dataset, compute, encode) to /api
+# responses and keeps rolling per-route latency histograms, served at
+# /api/admin/route-timings. Off, the span hooks are a no-op.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# Build events (pages, artist batches, 429 waits, playlist timings, cancels)
+# kept in memory for /api/admin/build-telemetry, newest last
+BUILD_EVENT_BUFFER = int(os.getenv("BUILD_EVENT_BUFFER", "5000"))
+
+# Also print each build event to stdout (off by default; the buffer
+# above replaces the old build_debug prints)
+DEBUG_BUILD = os.getenv("DEBUG_BUILD", "0") == "1"
+
+# Prometheus text exposition at /metrics (same token as the admin
+# endpoints, as X-Admin-Token or a bearer token). With a shared cache
+# backend each worker publishes its metrics there every interval, so a
+# scrape served by any worker reports all of them.
+METRICS = os.getenv("METRICS", "1") == "1"
+METRICS_PUBLISH_INTERVAL = int(os.getenv("METRICS_PUBLISH_INTERVAL", "15"))
+
+# Admins can profile a single request with X-Profile: 1 (see
+# web/utils/profiling.py); the last PROFILE_KEEP profiles are kept
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
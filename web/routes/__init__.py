@@ -8,6 +8,8 @@ from .library import router as library_router
 from .nav import router as nav_router
 from .analytics import router as analytics_router
 from .recommendations import router as recommendations_router
+from .admin import router as admin_router
+from .metrics import router as metrics_router
 
 router = APIRouter()
 
@@ -18,4 +20,6 @@ router.include_router(build_router)
 router.include_router(library_router)
 router.include_router(nav_router)
 router.include_router(analytics_router)
-router.include_router(recommendations_router)
\ No newline at end of file
+router.include_router(recommendations_router)
+router.include_router(admin_router)
+router.include_router(metrics_router)
\ No newline at end of file
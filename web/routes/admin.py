@@ -0,0 +1,160 @@
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from web import config
+from web.state import PLAYLIST_CACHE, PLAYLIST_DATA_CACHE, ARTIST_CACHE, ALBUM_CACHE, USER_BUILD_STATE, user_footprints
+from web.services.results import RESULT_CACHE
+from web.services.genre_stats import GENRE_INDEX_CACHE
+from web.services.build_telemetry import recent_events, summarize, build_summaries
+from web.utils.timing import ROUTE_TIMINGS
+from web.utils.profiling import get_profile, list_profiles
+from web.utils.admin_auth import is_admin
+
+router = APIRouter()
+
+# ------------------------------------------------------------
+# Helper
+# ------------------------------------------------------------
+
+def admin_denied(request: Request):
+
+    if is_admin(request.headers):
+        return None
+
+    return JSONResponse({"status": "error", "message": "Forbidden"}, status_code=403)
+
+# ------------------------------------------------------------
+# Cache Stats
+# ------------------------------------------------------------
+
+@router.get("/api/admin/cache-stats")
+def cache_stats(request: Request):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    return {
+        "status": "ready",
+        "data": {
+            "playlist_data": PLAYLIST_DATA_CACHE.snapshot_stats(),
+            "results": RESULT_CACHE.snapshot_stats(),
+            "albums": ALBUM_CACHE.snapshot_stats(),
+            "genre_index": GENRE_INDEX_CACHE.snapshot_stats(),
+            "artist_cache_users": len(ARTIST_CACHE),
+            "artist_cache_entries": sum(len(c) for c in list(ARTIST_CACHE.values())),
+            "playlist_cache_shared": PLAYLIST_CACHE.shared,
+            "active_builds": len([
+                s for s in list(USER_BUILD_STATE.values())
+                if s.get("status") == "building"
+            ])
+        }
+    }
+
+# ------------------------------------------------------------
+# Memory By User
+# ------------------------------------------------------------
+
+@router.get("/api/admin/memory")
+def memory_by_user(request: Request, limit: int = Query(50)):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    users = user_footprints()
+    totals = [u["total_bytes"] for u in users]
+
+    budget = PLAYLIST_DATA_CACHE.budget_bytes
+    mean = sum(totals) / len(totals) if totals else 0
+
+    return {
+        "status": "ready",
+        "data": {
+            "users": len(users),
+            "total_bytes": sum(totals),
+            "mean_user_bytes": round(mean),
+            "p95_user_bytes": sorted(totals)[int(0.95 * (len(totals) - 1))] if totals else 0,
+            "budget_bytes": budget,
+            "user_budget_bytes": PLAYLIST_DATA_CACHE.user_budget_bytes,
+            # Users of today's average size that fit in the budget
+            "capacity_users": int(budget / mean) if budget and mean else None,
+            "top": users[:limit]
+        }
+    }
+
+# ------------------------------------------------------------
+# Route Timings
+# ------------------------------------------------------------
+
+@router.get("/api/admin/route-timings")
+def route_timings(request: Request):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    return {
+        "status": "ready",
+        "data": {
+            "enabled": config.SERVER_TIMING,
+            "routes": ROUTE_TIMINGS.snapshot()
+        }
+    }
+
+
+# ------------------------------------------------------------
+# Build Telemetry
+# ------------------------------------------------------------
+
+@router.get("/api/admin/build-telemetry")
+def build_telemetry(
+    request: Request,
+    user_id: str = Query(None),
+    since: int = Query(0),
+    limit: int = Query(100)
+):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    events = recent_events(user_id=user_id, limit=config.BUILD_EVENT_BUFFER)
+
+    return {
+        "status": "ready",
+        "data": {
+            "global": summarize(events),
+            "builds": build_summaries(events),
+            # Poll with since=<last seq> to tail the buffer
+            "events": [e for e in events if e["seq"] > since][-limit:] if limit > 0 else []
+        }
+    }
+
+
+# ------------------------------------------------------------
+# Request Profiles
+# ------------------------------------------------------------
+
+@router.get("/api/admin/profiles")
+def profiles(request: Request):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    return {"status": "ready", "data": list_profiles()}
+
+@router.get("/api/admin/profiles/{profile_id}")
+def profile_stacks(request: Request, profile_id: str):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    profile = get_profile(profile_id)
+    if not profile:
+        return JSONResponse({"status": "error", "message": "Unknown profile"}, status_code=404)
+
+    # Collapsed stacks: pipe into flamegraph.pl or load in speedscope
+    return PlainTextResponse(profile.collapsed())
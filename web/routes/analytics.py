@@ -1,8 +1,11 @@
-from itertools import count
-
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Query
 from web.spotify_auth import get_spotify_client
 from web.routes.library import get_active_dataset_and_profiles
+from web.services.results import cached_result
+from web.services.stats import StreamingStats
+from web.services.genre_stats import TrackGenres, genre_index, genre_metrics, genre_cooccurrence
+from web.utils.timing import timed
+import numpy as np
 import math
 import statistics
 from collections import Counter
@@ -43,8 +46,21 @@ def get_dataset(request: Request):
 # Average Length
 # ------------------------------------------------------------
 
+# Seconds
+DURATION_BANDS = {
+    "short": lambda x: x < 150,
+    "long": lambda x: x > 300,
+    "radio": lambda x: 150 <= x <= 270
+}
+
 @router.get("/api/avg-length")
-def avg_length(request: Request):
+@cached_result("avg-length")
+def avg_length(
+    request: Request,
+    bin_width: float = Query(30, gt=0),
+    bins: int | None = Query(None, gt=0),
+    raw: bool = Query(False)
+):
 
     result, err = get_dataset(request)
     if err:
@@ -52,86 +68,69 @@ def avg_length(request: Request):
 
     dataset, _profiles = result
 
-    def compute_stats(durations, tracks):
-
-        n = len(durations)
-        if n == 0:
-            return None
-
-        durations_sorted = sorted(durations)
-
-        avg = sum(durations_sorted) / n
-
-        if n % 2:
-            median = durations_sorted[n // 2]
-        else:
-            median = (
-                durations_sorted[n // 2 - 1] +
-                durations_sorted[n // 2]
-            ) / 2
+    return compute_avg_length(dataset, bin_width=bin_width, bins=bins, raw=raw)
 
-        min_v = min(durations)
-        max_v = max(durations)
+@timed("compute")
+def compute_avg_length(dataset, bin_width=30, bins=None, raw=False):
 
-        variance = sum((x - avg) ** 2 for x in durations) / n
-        std_dev = math.sqrt(variance)
+    def compute_stats(acc):
 
-        short_pct = len([x for x in durations if x < 150]) / n * 100
-        long_pct = len([x for x in durations if x > 300]) / n * 100
-        radio_pct = len([x for x in durations if 150 <= x <= 270]) / n * 100
+        n = acc.n
+        if n == 0:
+            return None
 
-        # Total runtime (seconds)
-        total_runtime_seconds = sum(durations)
+        avg = acc.mean
 
         # Flow density: % of tracks within ±30 sec of average
         flow_band = 30
-        flow_count = len([
-            x for x in durations
-            if abs(x - avg) <= flow_band
-        ])
-        flow_density = (flow_count / n) * 100
+        flow_count = acc.count_between(avg - flow_band, avg + flow_band)
 
-        # Find actual track objects
-        shortest_track = min(tracks, key=lambda t: t["duration_ms"])
-        longest_track = max(tracks, key=lambda t: t["duration_ms"])
+        # Track objects were kept alongside the extremes
+        shortest_track = acc.min_ref
+        longest_track = acc.max_ref
 
-        return {
+        stats = {
             "average_length_seconds": round(avg, 2),
-            "median_length_seconds": round(median, 2),
-            "std_dev_seconds": round(std_dev, 2),
+            "median_length_seconds": round(acc.median, 2),
+            "std_dev_seconds": round(acc.std_dev, 2),
             "track_count": n,
-            "short_pct": round(short_pct, 2),
-            "long_pct": round(long_pct, 2),
-            "radio_pct": round(radio_pct, 2),
-            "durations": durations_sorted,
-            "total_runtime_seconds": round(total_runtime_seconds, 2),
-            "flow_density_pct": round(flow_density, 2),
+            "short_pct": round(acc.pct(acc.band_counts["short"]), 2),
+            "long_pct": round(acc.pct(acc.band_counts["long"]), 2),
+            "radio_pct": round(acc.pct(acc.band_counts["radio"]), 2),
+            "histogram": acc.histogram(bin_width=bin_width, bins=bins),
+            "total_runtime_seconds": round(acc.total, 2),
+            "flow_density_pct": round(acc.pct(flow_count), 2),
             "shortest_track": {
                 "name": shortest_track["track_name"],
-                "seconds": round(min_v, 2),
+                "seconds": round(acc.min, 2),
                 "url": shortest_track["spotify_url"]
             },
             "longest_track": {
                 "name": longest_track["track_name"],
-                "seconds": round(max_v, 2),
+                "seconds": round(acc.max, 2),
                 "url": longest_track["spotify_url"]
             }
-        }               
+        }
 
-    combined_durations = []
-    combined_tracks = []
+        # Per-track values only on request; charts use the histogram
+        if raw:
+            stats["durations"] = sorted(acc.values)
+
+        return stats
+
+    combined = StreamingStats(bands=DURATION_BANDS, quantiles="exact")
     per_playlist = {}
 
     for pid, playlist in dataset.items():
 
-        durations = []
+        acc = StreamingStats(bands=DURATION_BANDS, quantiles="exact")
 
         for track in playlist.get("tracks", []):
             duration = track.get("duration_ms")
             if duration:
-                durations.append(duration / 1000)
+                acc.add(duration / 1000, track)
 
-        stats = compute_stats(durations, playlist["tracks"])
+        stats = compute_stats(acc)
 
         if not stats:
             continue
@@ -141,13 +140,12 @@ def avg_length(request: Request):
             **stats
         }
 
-        combined_durations.extend(durations)
-        combined_tracks.extend(playlist["tracks"])
+        combined.merge(acc)
 
-    if not combined_durations:
+    if not combined.n:
         return {"status": "empty"}
 
-    combined_stats = compute_stats(combined_durations, combined_tracks)
+    combined_stats = compute_stats(combined)
 
     return {
         "status": "ready",
@@ -162,8 +160,21 @@ def avg_length(request: Request):
 # Popularity
 # ------------------------------------------------------------
 
+POPULARITY_TIERS = {
+    "underground": lambda p: p < 30,
+    "emerging": lambda p: 30 <= p < 60,
+    "popular": lambda p: 60 <= p < 80,
+    "hit": lambda p: p >= 80
+}
+
 @router.get("/api/popularity")
-def popularity(request: Request):
+@cached_result("popularity")
+def popularity(
+    request: Request,
+    bin_width: float = Query(10, gt=0),
+    bins: int | None = Query(None, gt=0),
+    raw: bool = Query(False)
+):
 
     result, err = get_dataset(request)
     if err:
@@ -171,30 +182,22 @@ def popularity(request: Request):
 
     dataset, _profiles = result
 
-    def compute_metrics(tracks):
+    return compute_popularity(dataset, bin_width=bin_width, bins=bins, raw=raw)
 
-        popularities = [
-            t.get("popularity")
-            for t in tracks
-            if t.get("popularity") is not None
-        ]
+@timed("compute")
+def compute_popularity(dataset, bin_width=10, bins=None, raw=False):
 
-        if not popularities:
-            return None
+    def compute_metrics(acc, distribution):
 
-        n = len(popularities)
+        n = acc.n
+        if n == 0:
+            return None
 
-        avg_pop = statistics.mean(popularities)
-        median_pop = statistics.median(popularities)
-        std_dev = statistics.pstdev(popularities) if n > 1 else 0
+        avg_pop = acc.mean
+        std_dev = acc.std_dev
 
         # Tier breakdown
-        tiers = {
-            "underground": len([p for p in popularities if p < 30]),
-            "emerging": len([p for p in popularities if 30 <= p < 60]),
-            "popular": len([p for p in popularities if 60 <= p < 80]),
-            "hit": len([p for p in popularities if p >= 80]),
-        }
+        tiers = dict(acc.band_counts)
 
         tier_pct = {
             k: round((v / n) * 100, 1)
@@ -202,15 +205,8 @@ def popularity(request: Request):
         }
 
         # Extremes
-        most_popular = max(
-            tracks,
-            key=lambda t: t.get("popularity", -1)
-        )
-
-        least_popular = min(
-            tracks,
-            key=lambda t: t.get("popularity", 101)
-        )
+        most_popular = acc.max_ref
+        least_popular = acc.min_ref
 
         # Derived metrics
         mainstream_index = round(avg_pop * (1 - std_dev / 100), 1)
@@ -222,12 +218,12 @@ def popularity(request: Request):
         else:
             spread_label = "Wide Popularity Range"
 
-        return {
+        stats = {
             "average_popularity": round(avg_pop, 1),
-            "median_popularity": round(median_pop, 1),
+            "median_popularity": round(acc.median, 1),
             "std_dev": round(std_dev, 1),
             "track_count": n,
-            "distribution": popularities,
+            "histogram": acc.histogram(bin_width=bin_width, bins=bins, lo=0, hi=100),
             "tier_counts": tiers,
             "tier_percentages": tier_pct,
             "mainstream_index": mainstream_index,
@@ -244,14 +240,36 @@ def popularity(request: Request):
             }
         }
 
-    combined_tracks = []
+        if raw:
+            stats["distribution"] = distribution
+
+        return stats
+
+    # Popularity is an integer 0-100, so unit bins give exact quantiles
+    # in constant memory
+    def new_acc():
+        return StreamingStats(bands=POPULARITY_TIERS, quantiles="binned", lo=0, hi=100)
+
+    combined = new_acc()
+    combined_distribution = []
     per_playlist = {}
 
     for pid, playlist in dataset.items():
 
-        tracks = playlist.get("tracks", [])
+        acc = new_acc()
+        distribution = []
+
+        for track in playlist.get("tracks", []):
+            pop = track.get("popularity")
+            if pop is None:
+                continue
 
-        stats = compute_metrics(tracks)
+            acc.add(pop, track)
+
+            if raw:
+                distribution.append(pop)
+
+        stats = compute_metrics(acc, distribution)
 
         if not stats:
             continue
@@ -261,12 +279,13 @@ def popularity(request: Request):
             **stats
         }
 
-        combined_tracks.extend(tracks)
+        combined.merge(acc)
+        combined_distribution.extend(distribution)
 
-    if not combined_tracks:
+    if not combined.n:
         return {"status": "empty"}
 
-    combined_stats = compute_metrics(combined_tracks)
+    combined_stats = compute_metrics(combined, combined_distribution)
 
     return {
         "status": "ready",
@@ -281,6 +300,7 @@ def popularity(request: Request):
 # ------------------------------------------------------------
 
 @router.get("/api/artist-frequency")
+@cached_result("artist-frequency")
 def artist_frequency(request: Request):
 
     result, err = get_dataset(request)
@@ -289,6 +309,11 @@ def artist_frequency(request: Request):
 
     dataset, _profiles = result
 
+    return compute_artist_frequency(dataset)
+
+@timed("compute")
+def compute_artist_frequency(dataset):
+
     def compute_artist_metrics(tracks):
 
         import math
@@ -489,6 +514,7 @@ def artist_frequency(request: Request):
 # ------------------------------------------------------------
 
 @router.get("/api/release-years")
+@cached_result("release-years")
 def release_years(request: Request):
 
     result, err = get_dataset(request)
@@ -497,6 +523,11 @@ def release_years(request: Request):
 
     dataset, _profiles = result
 
+    return compute_release_years(dataset)
+
+@timed("compute")
+def compute_release_years(dataset):
+
     def compute_year_metrics(tracks):
 
         oldest_track = None
@@ -601,6 +632,7 @@ def release_years(request: Request):
 # ------------------------------------------------------------
 
 @router.get("/api/playlist-profile")
+@cached_result("playlist-profile")
 def playlist_profile(request: Request):
 
     result, err = get_dataset(request)
@@ -728,7 +760,11 @@ def playlist_profile(request: Request):
 # ------------------------------------------------------------
 
 @router.get("/api/genres")
-def genres(request: Request):
+@cached_result("genres")
+def genres(
+    request: Request,
+    cooccurrence_top: int = Query(25, ge=0, le=200)
+):
 
     result, err = get_dataset(request)
     if err:
@@ -736,207 +772,46 @@ def genres(request: Request):
 
     dataset, _profiles = result
 
-    import math
-
-    def compute_genre_metrics(tracks):
-
-        track_count = 0
-        genre_counts = {}
-
-        multi_genre_tracks = 0
-        max_genres_on_track = 0
-        max_genre_track = None
-
-        for track in tracks:
-            track_count += 1
-
-            # Build unique genre set for this track from its artists
-            track_genres = set()
-
-            for artist in track.get("artists", []):
-                for g in artist.get("genres", []):
-                    if g:
-                        track_genres.add(g)
-
-            # Count per-track genre appearances (deduped per track)
-            for g in track_genres:
-                genre_counts[g] = genre_counts.get(g, 0) + 1
+    return compute_genres(dataset, cooccurrence_top=cooccurrence_top)
 
-            # Multi-genre track logic
-            if len(track_genres) > 1:
-                multi_genre_tracks += 1
+@timed("compute")
+def compute_genres(dataset, cooccurrence_top=25):
 
-            # Genre-dense track logic
-            if len(track_genres) > max_genres_on_track:
-                max_genres_on_track = len(track_genres)
-                max_genre_track = track
-
-        if not genre_counts or track_count == 0:
-            return None
-
-        sorted_genres = sorted(
-            genre_counts.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
-
-        unique_genres = len(sorted_genres)
-
-        # ---------------------------------
-        # Top genre
-        # ---------------------------------
-
-        top_genre, top_count = sorted_genres[0]
-        top_genre_pct = round((top_count / track_count) * 100, 1)
-
-        # ---------------------------------
-        # Dominance gap (skip ties)
-        # ---------------------------------
-
-        second_distinct_count = None
-
-        for _, count in sorted_genres[1:]:
-            if count < top_count:
-                second_distinct_count = count
-                break
-
-        if second_distinct_count is not None:
-            dominance_gap = round(
-                (top_count - second_distinct_count) / track_count * 100,
-                1
-            )
-        else:
-            dominance_gap = 0
-            
-        # ---------------------------------
-        # Diversity + Concentration
-        # ---------------------------------
-
-        entropy = 0
-        hhi = 0
-
-        for _, count in sorted_genres:
-            p = count / track_count
-            entropy += -p * math.log(p)
-            hhi += p ** 2
-
-        max_entropy = math.log(unique_genres) if unique_genres > 1 else 1
-        diversity_score = round((entropy / max_entropy) * 100, 1)
-
-        concentration_value = hhi * 100
-
-        if concentration_value < 2:
-            concentration = "Very Diverse"
-        elif concentration_value < 5:
-            concentration = "Diverse"
-        elif concentration_value < 10:
-            concentration = "Balanced"
-        elif concentration_value < 25:
-            concentration = "Leaning"
-        else:
-            concentration = "Dominated"
-
-        # ---------------------------------
-        # Additional metrics
-        # ---------------------------------
-
-        avg_tracks_per_genre = round(track_count / unique_genres, 2)
-
-        multi_genre_track_pct = round(
-            (multi_genre_tracks / track_count) * 100,
-            1
-        )
-
-        max_genre_track_name = None
-        max_genre_track_id = None
-
-        if max_genre_track:
-            max_genre_track_name = max_genre_track.get("track_name")
-            max_genre_track_id = max_genre_track.get("track_id")
-
-        # ---------------------------------
-        # Build full + bucketed datasets
-        # ---------------------------------
-
-        all_genres = [
-            {"genre": g, "count": c}
-            for g, c in sorted_genres
-        ]
-
-        if len(sorted_genres) > 50:
-            top = sorted_genres[:165]
-            rest = sorted_genres[165:]
-
-            other_count = sum(c for _, c in rest)
-
-            bucketed = [
-                {"genre": g, "count": c}
-                for g, c in top
-            ]
-
-            if other_count > 0:
-                bucketed.append({
-                    "genre": "Other",
-                    "count": other_count
-                })
-
-        else:
-            bucketed = all_genres
-
-        return {
-            "track_count": track_count,
-            "unique_genres": unique_genres,
-
-            "diversity_score": diversity_score,
-            "concentration": concentration,
-
-            "top_genre": top_genre,
-            "top_genre_pct": top_genre_pct,
-            "dominance_gap": dominance_gap,
-
-            "avg_tracks_per_genre": avg_tracks_per_genre,
-            "multi_genre_track_pct": multi_genre_track_pct,
-
-            "max_genres_on_track": max_genres_on_track,
-            "max_genre_track_name": max_genre_track_name,
-            "max_genre_track_id": max_genre_track_id,
-
-            "top_10": [
-                {"genre": g, "count": c}
-                for g, c in sorted_genres[:10]
-            ],
-
-            "all_genres": all_genres,
-
-            "display_genres": bucketed
-        }
+    # Counting runs over integer-coded genre pairs, merged from indexes
+    # built once per playlist (warmed when a build caches it)
+    track_genres = TrackGenres.merge(dataset, [genre_index(pid, p) for pid, p in dataset.items()])
 
     # ---------------------------------
     # Per-playlist
     # ---------------------------------
 
     per_playlist = {}
-    combined_tracks = []
+    combined_entries = []
 
-    for pid, playlist in dataset.items():
+    for p, pid in enumerate(dataset):
 
-        tracks = playlist.get("tracks", [])
+        entries = track_genres.playlist_entries(p)
 
-        stats = compute_genre_metrics(tracks)
+        # Ties rank by first appearance within the playlist itself
+        stats = genre_metrics(track_genres, entries, order=track_genres.playlist_order(p))
         if not stats:
             continue
 
         per_playlist[pid] = {
-            "playlist_name": playlist["playlist_name"],
+            "playlist_name": dataset[pid]["playlist_name"],
             **stats
         }
 
-        combined_tracks.extend(tracks)
+        combined_entries.append(entries)
 
-    if not combined_tracks:
+    if not combined_entries:
         return {"status": "empty"}
 
-    combined_stats = compute_genre_metrics(combined_tracks)
+    entries = np.concatenate(combined_entries)
+    combined_stats = genre_metrics(track_genres, entries)
+
+    # Sparse pairs among the top genres, combined scope only
+    combined_stats["cooccurrence"] = genre_cooccurrence(track_genres, entries, cooccurrence_top)
 
     return {
         "status": "ready",
@@ -946,9 +821,11 @@ def genres(request: Request):
         }
     }
 
-from web.services.fetch_data import safe_spotify_call
+from starlette.concurrency import run_in_threadpool
+from web.services.albums import get_albums
 
 @router.get("/api/album-frequency")
+@cached_result("album-frequency")
 def album_frequency(request: Request):
 
     result, err = get_dataset(request)
@@ -961,6 +838,11 @@ def album_frequency(request: Request):
 
     dataset, _profiles = result
 
+    return compute_album_frequency(dataset)
+
+@timed("compute")
+def compute_album_frequency(dataset):
+
     import math
 
     def compute_album_metrics(tracks):
@@ -1087,24 +969,16 @@ async def album_images(request: Request):
     if not sp:
         return {"albums": []}
 
-    results = safe_spotify_call(sp.albums, ids)
-
-    out = []
+    # Cache lookups are sync; keep any Spotify batches off the event loop
+    albums = await run_in_threadpool(get_albums, sp, ids)
 
-    for album in results.get("albums", []):
-        if not album:
-            continue
-
-        images = album.get("images") or []
-
-        out.append({
-            "album_id": album["id"],
-            "image_url": images[0]["url"] if images else None
-        })
-
-    return {"albums": out}
+    return {"albums": [
+        {"album_id": aid, "image_url": meta["image_url"]}
+        for aid, meta in albums.items()
+    ]}
 
 @router.get("/api/relationships")
+@cached_result("relationships")
 def relationships(request: Request):
 
     result, err = get_dataset(request)
@@ -1113,6 +987,11 @@ def relationships(request: Request):
 
     dataset, _profiles = result
 
+    return compute_relationships(dataset)
+
+@timed("compute")
+def compute_relationships(dataset):
+
     if not dataset or len(dataset) < 2:
         return {
             "status": "ready",
@@ -1378,6 +1257,7 @@ from pathlib import Path
 DEMO_PATH = Path("static/demoData.json")
 
 
+@timed("dataset")
 def load_demo_dataset():
     if not DEMO_PATH.exists():
         return None
@@ -1388,8 +1268,9 @@ def load_demo_dataset():
 @router.get("/api/demo-snapshot")
 def demo_snapshot(request: Request):
 
-    genres_data = genres(request)
-    years_data = release_years(request)
+    # __wrapped__ bypasses FastAPI, so Query defaults must be passed explicitly
+    genres_data = genres.__wrapped__(request, cooccurrence_top=25)
+    years_data = release_years.__wrapped__(request)
 
     if genres_data.get("status") != "ready":
         return {"status": "error", "message": "Genres not ready"}
@@ -1,9 +1,8 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, JSONResponse
-import spotipy
 
-from web.spotify_auth import build_oauth, get_user_id, get_spotify_client
-from web.state import USER_BUILD_STATE, PLAYLIST_DATA_CACHE, PLAYLIST_CACHE, BUILD_STATE
+from web.spotify_auth import build_oauth, get_user_id, get_spotify_client, register_client, drop_client, make_spotify
+from web.state import USER_BUILD_STATE, PLAYLIST_DATA_CACHE, PLAYLIST_CACHE, BUILD_STATE, BUILD_PROGRESS, BUILD_REQUESTS
 
 router = APIRouter()
 
@@ -18,9 +17,12 @@ def logout(request: Request):
     if sp:
         user_id = get_user_id(request)
         USER_BUILD_STATE.pop(user_id, None)
-        PLAYLIST_DATA_CACHE.pop(user_id, None)
+        PLAYLIST_DATA_CACHE.drop_user(user_id)
         PLAYLIST_CACHE.pop(user_id, None)
         BUILD_STATE.pop(user_id, None)
+        BUILD_PROGRESS.pop(user_id, None)
+        BUILD_REQUESTS.pop(user_id, None)
+        drop_client(user_id)
 
     request.session.clear()
     response = RedirectResponse(url="/", status_code=302)
@@ -42,8 +44,13 @@ def callback(request: Request):
     token_info = oauth.get_access_token(code, check_cache=False)
     request.session["token_info"] = token_info
 
-    sp = spotipy.Spotify(auth_manager=oauth)
+    # New session id on login (see web/sessions.py)
+    request.session.rotate = True
+
+    sp = make_spotify(token_info["access_token"])
     user_id = sp.current_user()["id"]
     request.session["user_id"] = user_id
 
+    register_client(user_id, token_info)
+
     return RedirectResponse("/dashboard")
\ No newline at end of file
@@ -1,25 +1,266 @@
 import traceback
 from fastapi import APIRouter, Request
+import secrets
 import threading
 import time
-import spotipy
-from web.utils.debug import build_debug
-from web.spotify_auth import get_spotify_client, build_oauth
-from web.state import BUILD_STATE, PLAYLIST_CACHE, USER_BUILD_STATE, PLAYLIST_DATA_CACHE, ARTIST_CACHE
-from web.services.fetch_data import fetch_single_playlist
+from concurrent.futures import ThreadPoolExecutor
+from web.services.build_telemetry import emit, set_build_context
+from web.spotify_auth import get_spotify_client, client_for_user
+from web.state import BUILD_STATE, PLAYLIST_CACHE, USER_BUILD_STATE, PLAYLIST_DATA_CACHE, BUILD_PROGRESS, BUILD_REQUESTS, artist_cache_for
+from web.services.fetch_data import fetch_playlist_shared
 from web.services.profile_library import build_playlist_profiles
+from web.services.genre_stats import genre_index
+from web.utils.metrics import WORKER_ID
 
 router = APIRouter()
 
+# ------------------------------------------------------------
+# Build ownership
+# ------------------------------------------------------------
+
+# A build runs in the worker that started it. With a shared backend its
+# progress is published with that worker as owner, and the owner keeps
+# the stamp fresh as pages load. Another worker that sees a live build
+# hands selection changes to it (BUILD_REQUESTS) instead of starting a
+# second build. A build whose owner stopped publishing for this long is
+# treated as dead, so a crashed worker can't block builds for good.
+BUILD_OWNER_TTL = 10 * 60
+
+def remote_build(user_id):
+
+    # The user's running build when another worker owns it, else None
+    if not BUILD_PROGRESS.shared:
+        return None
+
+    progress = BUILD_PROGRESS.get(user_id)
+
+    if not progress or progress.get("status") != "building" or progress.get("owner") == WORKER_ID:
+        return None
+
+    if time.time() - progress.get("updated_at", 0) > BUILD_OWNER_TTL:
+        return None
+
+    return progress
+
+def building_here(user_id):
+    state = USER_BUILD_STATE.get(user_id)
+    return bool(state) and state.get("status") == "building"
+
+def current_build_state(user_id):
+
+    # This worker's build while it runs one, else a live one elsewhere
+    if building_here(user_id):
+        return USER_BUILD_STATE[user_id]
+
+    return remote_build(user_id) or USER_BUILD_STATE.get(user_id) or BUILD_PROGRESS.get(user_id)
+
+def publish_build_state(user_id):
+
+    # Lets workers that don't own the build answer progress polls
+    if not BUILD_PROGRESS.shared:
+        return
+
+    # Never overwrite a build another worker is running
+    if not building_here(user_id) and remote_build(user_id):
+        return
+
+    state = USER_BUILD_STATE.get(user_id)
+
+    if not state:
+        BUILD_PROGRESS.pop(user_id, None)
+        return
+
+    BUILD_PROGRESS[user_id] = {
+        "version": state.get("version"),
+        "status": state.get("status"),
+        "total_tracks": state.get("total_tracks", 0),
+        "tracks_processed": state.get("tracks_processed", 0),
+        "owner": WORKER_ID,
+        "updated_at": time.time()
+    }
+
+def hand_off_selection(user_id, build, selected_ids):
+
+    # Addressed to one build, so a leftover request never reaches a later
+    # one. Latest selection wins; the owner applies each id once.
+    BUILD_REQUESTS[user_id] = {
+        "id": secrets.token_hex(8),
+        "owner": build["owner"],
+        "version": build["version"],
+        "selected_ids": selected_ids
+    }
+
+def handed_off_selection(user_id, version):
+
+    # The latest selection handed to this worker's build `version`
+    if not BUILD_REQUESTS.shared:
+        return None
+
+    entry = BUILD_REQUESTS.get(user_id)
+
+    if entry and entry.get("owner") == WORKER_ID and entry.get("version") == version:
+        return entry
+
+    return None
+
+# ------------------------------------------------------------
+# Tracked playlists
+# ------------------------------------------------------------
+
+def untrack_playlists(user_id, state, pids):
+
+    # Deselected playlists leave the build; emptying it cancels the build
+    for pid in pids:
+
+        removed_tracks = state["playlist_track_map"].get(pid, 0)
+
+        state["total_tracks"] -= removed_tracks
+
+        if PLAYLIST_DATA_CACHE.has(user_id, pid):
+            state["tracks_processed"] -= removed_tracks
+
+        state["tracks_processed"] = max(state["tracks_processed"], 0)
+        state["total_tracks"] = max(state["total_tracks"], 0)
+
+        state["playlist_track_map"].pop(pid, None)
+        state.get("pending_counts", set()).discard(pid)
+
+    if not state["playlist_track_map"]:
+        # bump version so worker/progress callbacks stop immediately
+        state["version"] = state.get("version", 0) + 1
+
+        state["status"] = "cancelled"
+        state["tracks_processed"] = 0
+        state["total_tracks"] = 0
+
+def track_playlists(state, pids, track_lookup):
+
+    # Adds playlists to a running build. Counts not in the listing start at
+    # 0 and stay in pending_counts until resolve_track_counts fills them in.
+    added = []
+
+    for pid in pids:
+
+        if pid in state["playlist_track_map"]:
+            continue
+
+        tracks = track_lookup.get(pid) or 0
+
+        state["playlist_track_map"][pid] = tracks
+        state["total_tracks"] += tracks
+
+        if not tracks:
+            state.setdefault("pending_counts", set()).add(pid)
+
+        added.append(pid)
+
+    return added
+
+def listing_track_counts(user_id):
+    playlist_cache = PLAYLIST_CACHE.get(user_id, {})
+    return {p["id"]: p["track_count"] for p in playlist_cache.get("data", [])}
+
+def apply_handed_off_selection(sp, user_id, state, selected_ids):
+
+    tracked = set(state["playlist_track_map"])
+    removed = tracked - set(selected_ids)
+
+    if removed:
+        emit("playlists_removed", user_id, state.get("version"), playlists=sorted(removed))
+        untrack_playlists(user_id, state, removed)
+
+    if state["status"] == "building":
+
+        cached_ids = PLAYLIST_DATA_CACHE.ids(user_id)
+        missing = [pid for pid in selected_ids if pid not in cached_ids and pid not in tracked]
+
+        added = track_playlists(state, missing, listing_track_counts(user_id))
+
+        if added:
+            emit("build_extend", user_id, state["version"], playlists=len(added), source="handoff")
+            resolve_track_counts(sp, user_id, [pid for pid in added if pid in state.get("pending_counts", ())])
+
+    publish_build_state(user_id)
+
+# ------------------------------------------------------------
+# Track count resolution
+# ------------------------------------------------------------
+
+# Counts missing from the playlist listing are looked up here instead of
+# inside the selection request, so the build can start straight away
+COUNT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="track-count")
+COUNT_LOCK = threading.Lock()
+
+# Lookups submitted to COUNT_POOL that haven't started yet
+COUNT_QUEUED = 0
+
+def queued_track_counts():
+    return COUNT_QUEUED
+
+def fetch_track_count(sp, pid):
+
+    if pid == "__liked__":
+        return sp.current_user_saved_tracks(limit=1)["total"]
+
+    return sp.playlist(pid, fields="tracks.total")["tracks"]["total"]
+
+def resolve_track_counts(sp, user_id, pids):
+
+    global COUNT_QUEUED
+
+    state = USER_BUILD_STATE.get(user_id)
+    if not state or not pids:
+        return
+
+    def resolve(pid):
+
+        global COUNT_QUEUED
+
+        with COUNT_LOCK:
+            COUNT_QUEUED -= 1
+
+        try:
+            tracks = fetch_track_count(client_for_user(user_id) or sp, pid)
+        except Exception as e:
+            emit("track_count_failed", user_id, pid=pid, error=str(e))
+            tracks = None
+
+        # Only fill in counts for the build this lookup was started for
+        if USER_BUILD_STATE.get(user_id) is not state:
+            return
+
+        with COUNT_LOCK:
+            pending = state.setdefault("pending_counts", set())
+            if pid not in pending or state.get("status") != "building":
+                return
+
+            # A failed lookup leaves the playlist out of total_tracks
+            pending.discard(pid)
+
+            if tracks is not None:
+                state["playlist_track_map"][pid] = tracks
+                state["total_tracks"] += tracks
+
+            if not pending:
+                state["tracks_processed"] = min(state["tracks_processed"], state["total_tracks"])
+
+        publish_build_state(user_id)
+
+        if tracks is not None:
+            emit("track_count", user_id, state.get("version"), pid=pid, tracks=tracks)
+
+    with COUNT_LOCK:
+        COUNT_QUEUED += len(pids)
+
+    for pid in pids:
+        COUNT_POOL.submit(resolve, pid)
+
 def start_incremental_build(request: Request, user_id: str, version: int):
 
     token_info = request.session.get("token_info")
     if not token_info:
         return
 
-    oauth = build_oauth(request)
-    oauth.token_info = token_info
-
     sp = get_spotify_client(request)
     if not sp:
         return
@@ -27,37 +268,56 @@ def start_incremental_build(request: Request, user_id: str, version: int):
     def run_job():
         try:
 
-            build_debug(f"Build worker started → version {version}")
+            # Fetch-level events (pages, artist batches, 429s) from this
+            # thread are attributed to this build
+            set_build_context(user_id, version)
 
-            thread_sp = spotipy.Spotify(auth_manager=oauth)
-            artist_cache = ARTIST_CACHE.setdefault(user_id, {})
+            artist_cache = artist_cache_for(user_id)
+
+            listing = PLAYLIST_CACHE.get(user_id) or {}
+            snapshot_ids = {
+                p["id"]: p.get("snapshot_id")
+                for p in listing.get("data", [])
+            }
 
             build_start_time = time.time()
+            applied_request = None
 
             while True:
 
                 state = USER_BUILD_STATE.get(user_id)
 
-                if not state or state.get("version") != version or state.get("status") != "building":
-                    build_debug("Build cancelled due to version change")
+                if not state:
+                    emit("build_cancel", reason="state_missing")
                     return
 
-                if not state:
-                    build_debug("Build state missing, exiting worker")
+                # Selection changes posted to other workers, checked before
+                # every fetch
+                handed_off = handed_off_selection(user_id, version)
+
+                if handed_off and handed_off["id"] != applied_request and state.get("version") == version and state.get("status") == "building":
+                    applied_request = handed_off["id"]
+                    apply_handed_off_selection(client_for_user(user_id) or sp, user_id, state, handed_off["selected_ids"])
+                    continue
+
+                if state.get("version") != version or state.get("status") != "building":
+                    emit("build_cancel", reason="selection_emptied" if state.get("status") == "cancelled" else "superseded")
                     return
 
                 state = USER_BUILD_STATE.get(user_id)
 
                 playlist_map = state.get("playlist_track_map", {})
 
+                cached_ids = PLAYLIST_DATA_CACHE.ids(user_id)
+
                 pending = [
                     pid for pid in playlist_map
-                    if pid not in PLAYLIST_DATA_CACHE.get(user_id, {})
+                    if pid not in cached_ids
                 ]
 
                 # If user removed everything, stop immediately
                 if not playlist_map:
-                    build_debug("No playlists remain in build — stopping worker")
+                    emit("build_cancel", reason="selection_emptied")
                     return
 
                 if not pending:
@@ -67,8 +327,19 @@ def start_incremental_build(request: Request, user_id: str, version: int):
                     if state and state.get("version") == version and state.get("status") == "building":
                         state["tracks_processed"] = state["total_tracks"]
                         state["status"] = "complete"
+                        publish_build_state(user_id)
 
-                    build_debug("Build finished — no pending playlists")
+                        # Checked again after publishing: a worker that still
+                        # saw this build running may have just handed off
+                        handed_off = handed_off_selection(user_id, version)
+
+                        if handed_off and handed_off["id"] != applied_request:
+                            state["status"] = "building"
+                            publish_build_state(user_id)
+                            continue
+
+                        if handed_off:
+                            BUILD_REQUESTS.pop(user_id, None)
 
                     break
 
@@ -77,13 +348,11 @@ def start_incremental_build(request: Request, user_id: str, version: int):
                 state = USER_BUILD_STATE.get(user_id)
 
                 if state and pid not in state.get("playlist_track_map", {}):
-                    build_debug(f"Skipping removed playlist → {pid}")
+                    emit("playlist_cancelled", pid=pid, reason="removed_before_fetch")
                     continue
 
                 playlist_start_time = time.time()
 
-                build_debug(f"Loading playlist → {pid}")
-
                 def progress_increment(amount):
                     state = USER_BUILD_STATE.get(user_id)
                     if not state:
@@ -95,12 +364,14 @@ def start_incremental_build(request: Request, user_id: str, version: int):
                     if state.get("version") != version:
                         return
 
-                    state["tracks_processed"] = min(
-                        state["tracks_processed"] + amount,
-                        state["total_tracks"]
-                    )
+                    state["tracks_processed"] += amount
+
+                    # total_tracks lacks counts still being looked up, so
+                    # clamping before they are in would drop these pages
+                    if not state.get("pending_counts"):
+                        state["tracks_processed"] = min(state["tracks_processed"], state["total_tracks"])
 
-                    build_debug(f"Progress → {state['tracks_processed']} / {state['total_tracks']}")
+                    publish_build_state(user_id)
 
                 def cancel_check():
 
@@ -120,47 +391,62 @@ def start_incremental_build(request: Request, user_id: str, version: int):
 
                     return False
 
-                playlist_dataset = fetch_single_playlist(
+                # Registry client: token is kept fresh across long builds
+                thread_sp = client_for_user(user_id) or sp
+
+                playlist_dataset = fetch_playlist_shared(
                     thread_sp,
                     pid,
+                    user_id,
+                    snapshot_id=snapshot_ids.get(pid),
                     artist_cache=artist_cache,
                     progress_callback=progress_increment,
                     cancel_check=cancel_check
                 )
 
                 if playlist_dataset is None:
-                    build_debug(f"Playlist cancelled mid-fetch → {pid}")
+                    emit("playlist_cancelled", pid=pid, reason="cancelled_mid_fetch")
                     continue
 
                 state = USER_BUILD_STATE.get(user_id)
                 if not state or pid not in state.get("playlist_track_map", {}):
-                    build_debug(f"Discarding playlist removed mid-load → {pid}")
+                    emit("playlist_cancelled", pid=pid, reason="removed_mid_load")
                     continue
 
                 playlist_duration = time.time() - playlist_start_time
 
-                build_debug(f"Playlist loaded → {pid} ({playlist_duration:.2f}s)")
+                emit(
+                    "playlist_done",
+                    pid=pid,
+                    tracks=len(playlist_dataset.get("tracks", [])),
+                    duration_ms=round(playlist_duration * 1000, 1)
+                )
 
                 single_dataset = {pid: playlist_dataset}
                 profile = build_playlist_profiles(single_dataset).get(pid)
 
-                PLAYLIST_DATA_CACHE.setdefault(user_id, {})
-                PLAYLIST_DATA_CACHE[user_id][pid] = {
+                PLAYLIST_DATA_CACHE.put(user_id, pid, {
                     "dataset": playlist_dataset,
                     "profile": profile,
                     "fetched_at": time.time()
-                }
+                })
+
+                # So /api/genres only merges indexes
+                genre_index(pid, playlist_dataset)
 
             total_duration = time.time() - build_start_time
-            build_debug(f"Build complete in {total_duration:.2f}s")
+            emit("build_complete", duration_ms=round(total_duration * 1000, 1))
 
         except Exception as e:
             print("Incremental build error:", e)
             traceback.print_exc()
 
+            emit("build_error", error=repr(e))
+
             state = USER_BUILD_STATE.get(user_id)
             if state and state["version"] == version:
                 state["status"] = "error"
+                publish_build_state(user_id)
 
     threading.Thread(target=run_job, daemon=True).start()
 
@@ -179,9 +465,7 @@ def build_progress(request: Request):
         user_id = sp.current_user()["id"]
         request.session["user_id"] = user_id
 
-    state = USER_BUILD_STATE.get(user_id)
-
-    build_debug(f"Progress request {state}")
+    state = current_build_state(user_id)
 
     if not state:
         return {"status": "idle"}
@@ -200,9 +484,12 @@ def build_progress(request: Request):
     if status != "building":
         return {"status": "idle"}
 
+    total_tracks = state.get("total_tracks", 0)
+    tracks_processed = min(state.get("tracks_processed", 0), total_tracks)
+
     return {
         "status": "building",
-        "total_tracks": state.get("total_tracks", 0),
-        "tracks_processed": state.get("tracks_processed", 0),
-        "loaded_tracks": state.get("tracks_processed", 0)
+        "total_tracks": total_tracks,
+        "tracks_processed": tracks_processed,
+        "loaded_tracks": tracks_processed
     }
\ No newline at end of file
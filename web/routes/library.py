@@ -2,9 +2,13 @@ from fastapi import APIRouter, Request
 
 from web.spotify_auth import get_spotify_client, build_oauth
 from web.state import PLAYLIST_DATA_CACHE
+from web.services.snapshots import validate_restored
+from web.services.results import cached_result
+from web.utils.timing import timed
 
 router = APIRouter()
 
+@timed("dataset")
 def get_active_dataset_and_profiles(request: Request, sp):
     from web.spotify_auth import get_user_id
     user_id = get_user_id(request)
@@ -13,7 +17,9 @@ def get_active_dataset_and_profiles(request: Request, sp):
     if not selected_ids:
         return None, None, {"status": "empty"}
 
-    user_cache = PLAYLIST_DATA_CACHE.get(user_id, {})
+    validate_restored(sp, user_id, selected_ids)
+
+    user_cache = PLAYLIST_DATA_CACHE.get_many(user_id, selected_ids)
     missing = [pid for pid in selected_ids if pid not in user_cache]
 
     if missing:
@@ -30,6 +36,7 @@ def get_active_dataset_and_profiles(request: Request, sp):
 
 
 @router.get("/api/library")
+@cached_result("library")
 def get_library(request: Request):
 
     sp = get_spotify_client(request)
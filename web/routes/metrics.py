@@ -0,0 +1,158 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from web import config
+from web.state import PLAYLIST_CACHE, PLAYLIST_DATA_CACHE, ARTIST_CACHE, ALBUM_CACHE, USER_BUILD_STATE, CACHE_BACKEND, user_footprints
+from web.cache import CacheNamespace
+from web.services.results import RESULT_CACHE
+from web.services.genre_stats import GENRE_INDEX_CACHE
+from web.routes.admin import admin_denied
+from web.routes.build import queued_track_counts
+from web.utils.metrics import REGISTRY, MetricsPublisher, gauge_family, render
+
+router = APIRouter()
+
+PUBLISHER = MetricsPublisher(
+    CacheNamespace(CACHE_BACKEND, "metrics"),
+    interval=config.METRICS_PUBLISH_INTERVAL
+)
+
+# ------------------------------------------------------------
+# Collectors
+# ------------------------------------------------------------
+
+# Read at scrape time from the state the app already keeps, so none of
+# these cost anything on the request path
+
+@REGISTRY.collector
+def cache_metrics():
+
+    playlist_data = PLAYLIST_DATA_CACHE.snapshot_stats()
+    results = RESULT_CACHE.snapshot_stats()
+    albums = ALBUM_CACHE.snapshot_stats()
+    genre_indexes = GENRE_INDEX_CACHE.snapshot_stats()
+    artist_caches = list(ARTIST_CACHE.values())
+    footprints = user_footprints()
+
+    listings = len(PLAYLIST_CACHE.backend.hkeys(PLAYLIST_CACHE.name))
+
+    entries = [
+        ("", {"cache": "playlist_data"}, playlist_data["entries"]),
+        ("", {"cache": "artist"}, sum(len(c) for c in artist_caches)),
+        ("", {"cache": "results"}, results["entries"]),
+        ("", {"cache": "albums"}, albums["entries"]),
+        ("", {"cache": "genre_index"}, genre_indexes["entries"]),
+    ]
+
+    # A shared backend holds one listing per user for all workers, so every
+    # worker would report the same count and sum() would multiply it
+    if PLAYLIST_CACHE.shared:
+        shared = gauge_family("shared_cache_entries", "Entries in shared-backend caches, the same from every worker", [
+            ("", {"cache": "playlist_listing"}, listings),
+        ])
+    else:
+        entries.append(("", {"cache": "playlist_listing"}, listings))
+        shared = {}
+
+    return {
+        **gauge_family("cache_entries", "Entries held per cache in this worker", entries),
+        **shared,
+        **gauge_family("cache_users", "Users with data in each per-user cache", [
+            ("", {"cache": "playlist_data"}, playlist_data["users"]),
+            ("", {"cache": "artist"}, len(artist_caches)),
+        ]),
+        **gauge_family("cache_bytes", "Accounted size of each cache, measured at insert", [
+            ("", {"cache": "playlist_data"}, playlist_data["total_bytes"]),
+            ("", {"cache": "artist"}, sum(c.footprint() for c in artist_caches)),
+            ("", {"cache": "playlist_listing"}, sum(PLAYLIST_CACHE.sizes.values())),
+            ("", {"cache": "results"}, results["bytes"]),
+            ("", {"cache": "albums"}, albums["bytes"]),
+            ("", {"cache": "genre_index"}, genre_indexes["bytes"]),
+        ]),
+        # Per-user series would be unbounded; /api/admin/memory has the list
+        **gauge_family("user_bytes_max", "Largest per-user footprint across playlist data, artists and listing", [
+            ("", {}, footprints[0]["total_bytes"] if footprints else 0),
+        ]),
+        **gauge_family("cache_budget_bytes", "Memory budget of size-budgeted caches", [
+            ("", {"cache": "playlist_data"}, playlist_data["budget_bytes"] or 0),
+            ("", {"cache": "results"}, results["budget_bytes"] or 0),
+            ("", {"cache": "albums"}, albums["budget_bytes"]),
+            ("", {"cache": "genre_index"}, genre_indexes["budget_bytes"]),
+        ]),
+        # Same family as the CACHE_LOOKUPS counter, from CacheStats
+        "spotifymatcher_cache_lookups_total": {
+            "type": "counter",
+            "help": "Cache lookups by cache and result",
+            "samples": [
+                ("", {"cache": "playlist_data", "result": "hit"}, playlist_data["hits"]),
+                ("", {"cache": "playlist_data", "result": "miss"}, playlist_data["misses"]),
+                ("", {"cache": "results", "result": "hit"}, results["hits"]),
+                ("", {"cache": "results", "result": "miss"}, results["misses"]),
+                ("", {"cache": "albums", "result": "hit"}, albums["hits"]),
+                ("", {"cache": "albums", "result": "miss"}, albums["misses"]),
+                ("", {"cache": "genre_index", "result": "hit"}, genre_indexes["hits"]),
+                ("", {"cache": "genre_index", "result": "miss"}, genre_indexes["misses"]),
+            ]
+        },
+        "spotifymatcher_cache_evictions_total": {
+            "type": "counter",
+            "help": "Entries evicted to stay under the memory budget",
+            "samples": [
+                ("", {"cache": "playlist_data"}, playlist_data["evictions"]),
+                ("", {"cache": "results"}, results["evictions"]),
+                ("", {"cache": "albums"}, albums["evictions"]),
+                ("", {"cache": "genre_index"}, genre_indexes["evictions"]),
+            ]
+        },
+    }
+
+@REGISTRY.collector
+def build_metrics():
+
+    active = [
+        (user_id, s) for user_id, s in list(USER_BUILD_STATE.items())
+        if s.get("status") == "building"
+    ]
+
+    pending = 0
+    tracks_remaining = 0
+
+    for user_id, state in active:
+        cached = PLAYLIST_DATA_CACHE.ids(user_id)
+        pending += sum(1 for pid in list(state.get("playlist_track_map", {})) if pid not in cached)
+        tracks_remaining += max(state.get("total_tracks", 0) - state.get("tracks_processed", 0), 0)
+
+    return {
+        **gauge_family("builds_active", "Builds currently running in this worker", [
+            ("", {}, len(active)),
+        ]),
+        **gauge_family("build_queue_playlists", "Playlists waiting to be fetched across active builds", [
+            ("", {}, pending),
+        ]),
+        **gauge_family("build_queue_tracks", "Tracks not yet loaded across active builds", [
+            ("", {}, tracks_remaining),
+        ]),
+        **gauge_family("track_count_queue", "Track count lookups waiting for a worker thread", [
+            ("", {}, queued_track_counts()),
+        ]),
+    }
+
+if config.METRICS and CACHE_BACKEND.shared:
+    PUBLISHER.start()
+
+
+# ------------------------------------------------------------
+# Exposition
+# ------------------------------------------------------------
+
+@router.get("/metrics")
+def metrics(request: Request):
+
+    denied = admin_denied(request)
+    if denied:
+        return denied
+
+    return PlainTextResponse(
+        render(PUBLISHER.snapshots()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Request
 
 from web.spotify_auth import get_spotify_client, build_oauth
-from web.state import USER_BUILD_STATE, PLAYLIST_DATA_CACHE
+from web.state import PLAYLIST_DATA_CACHE
+from web.services.snapshots import validate_restored
+from web.routes.build import current_build_state
 
 router = APIRouter()
 
@@ -19,14 +21,16 @@ def nav_state(request: Request):
     from web.spotify_auth import get_user_id
     user_id = get_user_id(request)
 
-    state = USER_BUILD_STATE.get(user_id)
+    state = current_build_state(user_id)
     build_status = state["status"] if state else "idle"
 
     selected_ids = request.session.get("selected_playlists", [])
     breakdown_source = request.session.get("breakdown_source")
 
-    user_cache = PLAYLIST_DATA_CACHE.get(user_id, {})
-    loaded = all(pid in user_cache for pid in selected_ids)
+    validate_restored(sp, user_id, selected_ids)
+
+    cached_ids = PLAYLIST_DATA_CACHE.ids(user_id)
+    loaded = all(pid in cached_ids for pid in selected_ids)
 
     return {
         "build_status": build_status,
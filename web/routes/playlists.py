@@ -1,12 +1,62 @@
 from fastapi import APIRouter, Request, Body
+import threading
 import time
-from web.utils.debug import build_debug
-from web.spotify_auth import get_spotify_client, build_oauth
+from web.services.build_telemetry import emit
+from web.utils.metrics import CACHE_LOOKUPS
+from web.utils.singleflight import SingleFlight
+from web.spotify_auth import get_spotify_client, build_oauth, client_for_user
 from web.state import PLAYLIST_CACHE, PLAYLIST_DATA_CACHE, BUILD_STATE, USER_BUILD_STATE
-from web.routes.build import start_incremental_build
+from web.routes.build import (
+    start_incremental_build,
+    publish_build_state,
+    resolve_track_counts,
+    remote_build,
+    hand_off_selection,
+    untrack_playlists,
+    track_playlists,
+    listing_track_counts
+)
+from web.services.fetch_data import fetch_playlist_listing
+from web.services.snapshots import invalidate_changed
 
 router = APIRouter()
 
+# Listings older than this are still served, but refreshed in the background
+LISTING_TTL = 300
+LISTING_FLIGHTS = SingleFlight()
+
+def refresh_playlist_listing(sp, user_id):
+
+    def run():
+        playlists = fetch_playlist_listing(sp, user_id)
+
+        changed = invalidate_changed(user_id, playlists)
+        if changed:
+            emit("listing_invalidated", user_id, playlists=sorted(changed))
+
+        PLAYLIST_CACHE[user_id] = {
+            "data": playlists,
+            "fetched_at": time.time()
+        }
+
+        return playlists
+
+    playlists, _ = LISTING_FLIGHTS.do(user_id, run)
+    return playlists
+
+def refresh_listing_in_background(sp, user_id):
+
+    if LISTING_FLIGHTS.in_flight(user_id):
+        return
+
+    def run():
+        try:
+            refresh_playlist_listing(client_for_user(user_id) or sp, user_id)
+        except Exception as e:
+            print("Playlist listing refresh error:", e)
+
+    threading.Thread(target=run, daemon=True).start()
+
 @router.get("/api/playlists")
 def api_playlists(request: Request):
 
@@ -17,45 +67,22 @@ def api_playlists(request: Request):
     from web.spotify_auth import get_user_id
     user_id = get_user_id(request)
 
+    PLAYLIST_DATA_CACHE.touch(user_id)
+
     cache = PLAYLIST_CACHE.get(user_id)
-    if cache and time.time() - cache["fetched_at"] < 300:
-        return {"cache_hit": True, "playlists": cache["data"]}
-
-    playlists = []
-    results = sp.current_user_playlists(limit=50)
-
-    while True:
-        for p in results["items"]:
-            playlists.append({
-                "id": p["id"],
-                "name": p["name"],
-                "track_count": p["tracks"]["total"],
-                "image": p["images"][0]["url"] if p.get("images") else None,
-                "is_owner": p["owner"]["id"] == user_id
-            })
-
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            break
-
-    # add liked songs
-    try:
-        liked_meta = sp.current_user_saved_tracks(limit=1)
-        playlists.append({
-            "id": "__liked__",
-            "name": "Liked Songs",
-            "track_count": liked_meta["total"],
-            "image": None,
-            "is_owner": True
-        })
-    except Exception:
-        pass
-
-    PLAYLIST_CACHE[user_id] = {
-        "data": playlists,
-        "fetched_at": time.time()
-    }
+    if cache:
+        stale = time.time() - cache["fetched_at"] >= LISTING_TTL
+
+        CACHE_LOOKUPS.inc("playlist_listing", "stale" if stale else "hit")
+
+        if stale:
+            refresh_listing_in_background(sp, user_id)
+
+        return {"cache_hit": True, "stale": stale, "playlists": cache["data"]}
+
+    CACHE_LOOKUPS.inc("playlist_listing", "miss")
+
+    playlists = refresh_playlist_listing(sp, user_id)
 
     return {"cache_hit": False, "playlists": playlists}
 
@@ -73,7 +100,7 @@ def update_selection(request: Request, data: dict = Body(...)):
     from web.spotify_auth import get_user_id
     user_id = get_user_id(request)
 
-    build_debug(f"User updated selection → {selected_ids}")
+    emit("selection", user_id, selected=len(selected_ids))
 
     existing_state = USER_BUILD_STATE.get(user_id)
 
@@ -83,31 +110,9 @@ def update_selection(request: Request, data: dict = Body(...)):
         removed = tracked - set(selected_ids)
 
         if removed:
-            build_debug(f"Playlists removed from build → {removed}")
-
-        for pid in removed:
-
-            removed_tracks = existing_state["playlist_track_map"].get(pid, 0)
-
-            existing_state["total_tracks"] -= removed_tracks
+            emit("playlists_removed", user_id, existing_state.get("version"), playlists=sorted(removed))
 
-            if pid in PLAYLIST_DATA_CACHE.get(user_id, {}):
-                existing_state["tracks_processed"] -= removed_tracks
-
-            existing_state["tracks_processed"] = max(existing_state["tracks_processed"], 0)
-            existing_state["total_tracks"] = max(existing_state["total_tracks"], 0)
-
-            existing_state["playlist_track_map"].pop(pid, None)
-
-        if existing_state and not existing_state["playlist_track_map"]:
-            build_debug("All playlists removed — cancelling build")
-
-            # bump version so worker/progress callbacks stop immediately
-            existing_state["version"] = existing_state.get("version", 0) + 1
-
-            existing_state["status"] = "cancelled"
-            existing_state["tracks_processed"] = 0
-            existing_state["total_tracks"] = 0
+        untrack_playlists(user_id, existing_state, removed)
 
     if breakdown_source and breakdown_source not in selected_ids:
         breakdown_source = None
@@ -117,30 +122,46 @@ def update_selection(request: Request, data: dict = Body(...)):
     request.session["hidden_playlists"] = hidden_ids
 
     sp = get_spotify_client(request)
-    if sp:
 
-        user_cache = PLAYLIST_DATA_CACHE.get(user_id, {})
+    # With a shared backend the user's build may be running in another
+    # worker; it gets this selection instead of a second build starting
+    remote = None
+    if sp and not (existing_state and existing_state.get("status") == "building"):
+        remote = remote_build(user_id)
+
+    if remote:
+        hand_off_selection(user_id, remote, selected_ids)
+        emit("build_handoff", user_id, remote.get("version"), owner=remote.get("owner"), selected=len(selected_ids))
+
+        # Completed meanwhile: the owner may have missed it, so build here
+        if not remote_build(user_id):
+            remote = None
+
+    if sp and not remote:
+
+        cached_ids = PLAYLIST_DATA_CACHE.ids(user_id)
 
         existing_state = USER_BUILD_STATE.get(user_id)
 
+        # Only a running build will still fetch what it tracks; anything a
+        # finished or failed build left uncached has to be fetched again
         tracked = set()
-        if existing_state:
+        if existing_state and existing_state.get("status") == "building":
             tracked = set(existing_state.get("playlist_track_map", {}).keys())
 
         missing = [
             pid for pid in selected_ids
-            if pid not in user_cache and pid not in tracked
+            if pid not in cached_ids and pid not in tracked
         ]
 
-        build_debug(f"Playlists missing from cache → {missing}")
-
         if missing:
 
-            playlist_cache = PLAYLIST_CACHE.get(user_id, {})
-            cached_playlists = playlist_cache.get("data", [])
+            track_lookup = listing_track_counts(user_id)
 
-            track_lookup = {p["id"]: p["track_count"] for p in cached_playlists}
-            name_lookup = {p["id"]: p["name"] for p in cached_playlists}
+            # Counts not in the listing start at 0 and are filled in by
+            # resolve_track_counts while the build is already running; until
+            # then they are listed in the state's pending_counts
+            unresolved = [pid for pid in missing if not track_lookup.get(pid)]
 
             BUILD_STATE.setdefault(user_id, {"version": 0})
             BUILD_STATE[user_id]["version"] += 1
@@ -150,30 +171,9 @@ def update_selection(request: Request, data: dict = Body(...)):
 
             if existing_state and existing_state["status"] == "building":
 
-                build_debug("Extending current build")
-
-                for pid in missing:
-
-                    if pid in existing_state["playlist_track_map"]:
-                        continue
+                added = track_playlists(existing_state, missing, track_lookup)
 
-                    tracks = track_lookup.get(pid)
-
-                    if tracks is None or tracks == 0:
-
-                            if pid == "__liked__":
-                                meta = sp.current_user_saved_tracks(limit=1)
-                                tracks = meta["total"]
-                            else:
-                                pl = sp.playlist(pid, fields="name,tracks.total")
-                                tracks = pl["tracks"]["total"]
-
-                            track_lookup[pid] = tracks
-
-                    existing_state["playlist_track_map"][pid] = tracks
-                    existing_state["total_tracks"] += tracks
-
-                    build_debug(f"Added playlist to build → {name_lookup.get(pid,pid)} ({tracks} tracks)")
+                emit("build_extend", user_id, existing_state["version"], playlists=len(added))
 
             else:
 
@@ -181,36 +181,28 @@ def update_selection(request: Request, data: dict = Body(...)):
 
                 for pid in missing:
 
-                    tracks = track_lookup.get(pid)
-
-                    if tracks is None or tracks == 0:
-
-                        if pid == "__liked__":
-                            meta = sp.current_user_saved_tracks(limit=1)
-                            tracks = meta["total"]
-                        else:
-                            pl = sp.playlist(pid, fields="name,tracks.total")
-                            tracks = pl["tracks"]["total"]
-
-                        track_lookup[pid] = tracks
-
+                    tracks = track_lookup.get(pid) or 0
                     total_tracks += tracks
 
-                    build_debug(f"Track count resolved → {name_lookup.get(pid,pid)} : {tracks}")
-
                 USER_BUILD_STATE[user_id] = {
                     "version": version,
                     "status": "building",
                     "total_tracks": total_tracks,
                     "tracks_processed": 0,
                     "playlist_track_map": {
-                        pid: track_lookup.get(pid, 0) for pid in missing
-                    }
+                        pid: track_lookup.get(pid) or 0 for pid in missing
+                    },
+                    "pending_counts": set(unresolved)
                 }
 
                 existing_state = USER_BUILD_STATE[user_id]
 
-                build_debug(f"Starting new build v{version} → {missing}")
+                emit(
+                    "build_start", user_id, version,
+                    playlists=len(missing),
+                    total_tracks=total_tracks,
+                    unresolved_counts=len(unresolved)
+                )
 
             if not existing_state or existing_state["version"] == version:
 
@@ -220,6 +212,10 @@ def update_selection(request: Request, data: dict = Body(...)):
                     version=version,
                 )
 
+            resolve_track_counts(sp, user_id, unresolved)
+
+    publish_build_state(user_id)
+
     return {
         "status": "ok",
         "selected_ids": selected_ids,
@@ -233,4 +229,15 @@ def get_selection(request: Request):
         "selected_ids": request.session.get("selected_playlists", []),
         "breakdown_source": request.session.get("breakdown_source"),
         "hidden_ids": request.session.get("hidden_playlists", [])
-    }
\ No newline at end of file
+    }
+
+@router.post("/api/build")
+def rebuild_selection(request: Request):
+
+    # Dashboard calls this when the saved selection has no loaded data
+    # (e.g. after a restart with stale or missing snapshots)
+    return update_selection(request, {
+        "selected_ids": request.session.get("selected_playlists", []),
+        "breakdown_source": request.session.get("breakdown_source"),
+        "hidden_ids": request.session.get("hidden_playlists", [])
+    })
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Request, Query
 from web.spotify_auth import get_spotify_client
 from web.routes.library import get_active_dataset_and_profiles
+from web.services.results import cached_result
+from web.utils.timing import timed
 
 router = APIRouter()
 
@@ -131,6 +133,7 @@ def score_playlist_match(signals, weights):
 # ------------------------------------------------------------
 
 @router.get("/api/recommendation-breakdown")
+@cached_result("recommendation-breakdown", session_keys=("breakdown_source",))
 def recommendation_breakdown(
     request: Request,
     artist: int = Query(3),
@@ -147,6 +150,18 @@ def recommendation_breakdown(
     if err:
         return err
 
+    return compute_recommendation_breakdown(
+        dataset,
+        request.session.get("breakdown_source"),
+        artist=artist,
+        genre=genre,
+        album=album,
+        decade=decade
+    )
+
+@timed("compute")
+def compute_recommendation_breakdown(dataset, breakdown_id, artist=3, genre=3, album=1, decade=1):
+
     playlist_ids = list(dataset.keys())
 
     if len(playlist_ids) < 2:
@@ -169,8 +184,6 @@ def recommendation_breakdown(
     # Playlist selection
     # ---------------------------------
 
-    breakdown_id = request.session.get("breakdown_source")
-
     if not breakdown_id:
         return {
             "status": "error",
@@ -292,6 +305,7 @@ def recommendation_breakdown(
 # ------------------------------------------------------------
 
 @router.get("/api/recommendation-profiles")
+@cached_result("recommendation-profiles")
 def recommendation_profiles(request: Request):
 
     sp = get_spotify_client(request)
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from web.services.fetch_data import safe_spotify_call
+from web.state import ALBUM_CACHE
+from web.utils.singleflight import SingleFlight
+
+# GET /albums accepts at most 20 ids per call
+ALBUM_BATCH_SIZE = 20
+ALBUM_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="albums")
+ALBUM_FLIGHTS = SingleFlight()
+
+def album_meta(album):
+    images = album.get("images") or []
+
+    return {
+        "image_url": images[0]["url"] if images else None,
+        "album_name": album.get("name"),
+        "release_date": album.get("release_date"),
+        "total_tracks": album.get("total_tracks")
+    }
+
+def record_albums(albums):
+
+    # Called with the album objects seen while paging playlist items, so
+    # artwork is usually known before the workspace asks for it
+    albums = {
+        a["id"]: a for a in albums
+        if a and a.get("id") and a.get("images") is not None
+    }
+
+    if not albums:
+        return
+
+    known = ALBUM_CACHE.get_many(albums)
+
+    for aid, album in albums.items():
+        if aid not in known:
+            ALBUM_CACHE[aid] = album_meta(album)
+
+def _fetch_albums(sp, album_ids):
+
+    batches = [
+        album_ids[i:i + ALBUM_BATCH_SIZE]
+        for i in range(0, len(album_ids), ALBUM_BATCH_SIZE)
+    ]
+
+    fetched = {}
+
+    for results in ALBUM_POOL.map(lambda batch: safe_spotify_call(sp.albums, batch), batches):
+        for album in results.get("albums") or []:
+            if not album or not album.get("id"):
+                continue
+
+            meta = album_meta(album)
+            ALBUM_CACHE[album["id"]] = meta
+            fetched[album["id"]] = meta
+
+    return fetched
+
+def get_albums(sp, album_ids):
+
+    album_ids = list(dict.fromkeys(a for a in album_ids if a))
+
+    found = ALBUM_CACHE.get_many(album_ids)
+
+    misses = [aid for aid in album_ids if aid not in found]
+
+    if misses and sp:
+        found.update(ALBUM_FLIGHTS.do_many(misses, lambda ids: _fetch_albums(sp, ids)))
+
+    return found
@@ -0,0 +1,178 @@
+import itertools
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from web import config
+from web.utils.metrics import BUILD_EVENTS
+
+# ------------------------------------------------------------
+# Build telemetry
+# ------------------------------------------------------------
+
+# Structured events from selection changes, build workers and the fetch
+# path, kept in a ring buffer and summarised at /api/admin/build-telemetry.
+# A build worker sets its context once, so fetch-level events (pages,
+# artist batches, 429 waits) are attributed to the build that caused them.
+#
+#   selection / build_start / build_extend / build_cancel / build_complete
+#   build_error / track_count / playlist_done / playlist_shared
+#   playlist_cancelled / page / artist_batch / rate_limited / snapshot_stale
+
+EVENTS = deque(maxlen=config.BUILD_EVENT_BUFFER)
+_seq = itertools.count(1)
+
+_BUILD = ContextVar("build_context", default=None)
+
+# Spotify's cap on /artists ids per call
+ARTIST_BATCH_MAX = 50
+
+
+def set_build_context(user_id, version):
+    _BUILD.set((user_id, version))
+
+def emit(kind, user_id=None, version=None, **fields):
+
+    context = _BUILD.get()
+    if context:
+        user_id = user_id or context[0]
+        version = context[1] if version is None else version
+
+    event = {
+        "seq": next(_seq),
+        "ts": time.time(),
+        "kind": kind,
+        "user_id": user_id,
+        "version": version,
+        **fields
+    }
+
+    # deque.append is atomic; readers copy before iterating
+    EVENTS.append(event)
+    BUILD_EVENTS.inc(kind)
+
+    if config.DEBUG_BUILD:
+        print("[BUILD]", format_event(event))
+
+    return event
+
+def format_event(event):
+    fields = " ".join(
+        f"{k}={v}" for k, v in event.items()
+        if k not in ("seq", "ts", "kind", "user_id", "version") and v is not None
+    )
+    return f"{event['kind']} user={event['user_id']} v={event['version']} {fields}".rstrip()
+
+def recent_events(user_id=None, since=0, limit=200):
+    events = [
+        e for e in list(EVENTS)
+        if e["seq"] > since and (user_id is None or e["user_id"] == user_id)
+    ]
+    return events[-limit:] if limit > 0 else []
+
+
+# ------------------------------------------------------------
+# Aggregates
+# ------------------------------------------------------------
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+def summarize(events):
+
+    page_latency = []
+    page_items = 0
+    artist_batches = []
+    artists_cached = 0
+    artists_fetched = 0
+    rate_limited = 0
+    rate_limit_wait = 0.0
+    playlists = 0
+    shared = 0
+    tracks = 0
+    fetch_seconds = 0.0
+    cancels = Counter()
+
+    for e in events:
+        kind = e["kind"]
+
+        if kind == "page":
+            page_latency.append(e["latency_ms"])
+            page_items += e.get("items", 0)
+            artists_cached += e.get("artists_cached", 0)
+            artists_fetched += e.get("artists_fetched", 0)
+
+        elif kind == "artist_batch":
+            artist_batches.append(e["size"])
+
+        elif kind == "rate_limited":
+            rate_limited += 1
+            rate_limit_wait += e.get("wait_s", 0)
+
+        elif kind == "playlist_done":
+            playlists += 1
+            tracks += e.get("tracks", 0)
+            fetch_seconds += e.get("duration_ms", 0) / 1000
+
+        elif kind == "playlist_shared":
+            shared += 1
+
+        elif kind in ("build_cancel", "playlist_cancelled"):
+            cancels[e.get("reason")] += 1
+
+    artist_lookups = artists_cached + artists_fetched
+
+    return {
+        "pages": len(page_latency),
+        "page_items": page_items,
+        "page_latency_p50_ms": _percentile(page_latency, 0.50),
+        "page_latency_p95_ms": _percentile(page_latency, 0.95),
+        "playlists_loaded": playlists,
+        "playlists_shared": shared,
+        "tracks_loaded": tracks,
+        # Throughput while fetching, so idle time between builds doesn't count
+        "tracks_per_sec": round(tracks / fetch_seconds, 1) if fetch_seconds else None,
+        "artist_batches": len(artist_batches),
+        "artist_batch_mean": round(sum(artist_batches) / len(artist_batches), 1) if artist_batches else None,
+        "artist_batch_fill": round(sum(artist_batches) / (len(artist_batches) * ARTIST_BATCH_MAX), 3) if artist_batches else None,
+        "artist_cache_hit_pct": round(artists_cached / artist_lookups * 100, 1) if artist_lookups else None,
+        "rate_limited": rate_limited,
+        "rate_limit_wait_s": round(rate_limit_wait, 1),
+        "cancels": dict(cancels),
+    }
+
+def build_summaries(events, limit=20):
+
+    builds = {}
+
+    for e in events:
+        if e["user_id"] is None or e["version"] is None:
+            continue
+        builds.setdefault((e["user_id"], e["version"]), []).append(e)
+
+    out = []
+
+    for (user_id, version), build_events in builds.items():
+
+        started = next((e["ts"] for e in build_events if e["kind"] == "build_start"), build_events[0]["ts"])
+        finished = next((e for e in build_events if e["kind"] in ("build_complete", "build_cancel", "build_error")), None)
+        ended = finished["ts"] if finished else time.time()
+
+        summary = summarize(build_events)
+
+        out.append({
+            "user_id": user_id,
+            "version": version,
+            "status": finished["kind"].removeprefix("build_") if finished else "running",
+            "started_at": started,
+            "wall_seconds": round(ended - started, 2),
+            # End to end, including time spent waiting on 429s and counts
+            "tracks_per_wall_sec": round(summary["tracks_loaded"] / (ended - started), 1) if ended > started else None,
+            **summary
+        })
+
+    out.sort(key=lambda b: b["started_at"], reverse=True)
+    return out[:limit]
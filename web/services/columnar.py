@@ -0,0 +1,441 @@
+import json
+import mmap
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# ------------------------------------------------------------
+# Columnar library format
+# ------------------------------------------------------------
+
+# A library (the {pid: fetch_single_playlist(...)} dataset) stored as
+# typed columns so it can be mmap'ed and read without parsing:
+#
+#   MAGIC | uint32 header length | JSON header | 8-byte aligned column blocks
+#
+# The header maps column name -> [dtype, byte offset, item count], with
+# offsets relative to the (8-byte aligned) end of the header.
+# Tables are deduplicated and linked by int32 row indexes:
+#
+#   playlist.*   one row per playlist, entry_offsets -> entry.track
+#   entry.track  one row per playlist track slot -> track row
+#   track.*      unique tracks, artist_offsets -> track.artists (artist rows)
+#   album.*      unique albums
+#   artist.*     unique artists, genre_offsets -> artist.genres (genre rows)
+#   genre.name   unique genre names
+#
+# Strings are <name>.offsets (int64, n + 1) + <name>.data (utf-8 bytes)
+# + <name>.valid (uint8, 0 for None). Missing integers are stored as -1.
+
+MAGIC = b"SMLIBC1\0"
+ALIGN = 8
+
+# ------------------------------------------------------------
+# Writing
+# ------------------------------------------------------------
+
+class _Table:
+
+    def __init__(self):
+        self.index = {}
+        self.rows = []
+
+    def intern(self, key, row):
+        idx = self.index.get(key)
+        if idx is None:
+            idx = len(self.rows)
+            self.index[key] = idx
+            self.rows.append(row)
+        return idx
+
+
+def _int_or_missing(value):
+    return -1 if value is None else int(value)
+
+
+def _release_year(release_date):
+    if isinstance(release_date, str) and len(release_date) >= 4:
+        try:
+            return int(release_date[:4])
+        except ValueError:
+            pass
+    return -1
+
+
+def _encode_strings(values):
+    encoded = [v.encode("utf-8") if v is not None else b"" for v in values]
+
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    return {
+        "offsets": offsets,
+        "data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "valid": np.array([v is not None for v in values], dtype=np.uint8),
+    }
+
+
+def _csr(lists, dtype=np.int32):
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    if lists:
+        offsets[1:] = np.cumsum([len(x) for x in lists])
+
+    flat = np.fromiter((v for x in lists for v in x), dtype=dtype, count=int(offsets[-1]))
+    return offsets, flat
+
+
+def build_columns(dataset):
+
+    genres = _Table()
+    artists = _Table()
+    albums = _Table()
+    tracks = _Table()
+
+    playlists = []
+    entry_tracks = []
+    entry_offsets = [0]
+
+    for pid, playlist in dataset.items():
+
+        for track in playlist.get("tracks", []):
+
+            album = track.get("album") or {}
+            album_key = (
+                album.get("album_id"),
+                album.get("album_name"),
+                album.get("release_date"),
+                album.get("total_tracks"),
+            )
+            album_idx = albums.intern(album_key, album_key)
+
+            artist_idxs = []
+
+            for artist in track.get("artists", []):
+                artist_genres = tuple(artist.get("genres", []))
+                artist_key = (
+                    artist.get("artist_id"),
+                    artist.get("artist_name"),
+                    artist.get("image_url"),
+                    artist_genres,
+                )
+                genre_idxs = [genres.intern(g, g) for g in artist_genres]
+                artist_idxs.append(artists.intern(artist_key, (artist_key, genre_idxs)))
+
+            track_key = (
+                track.get("track_id"),
+                track.get("track_name"),
+                track.get("popularity"),
+                track.get("duration_ms"),
+                track.get("explicit"),
+                track.get("track_number"),
+                track.get("disc_number"),
+                track.get("preview_url"),
+                track.get("spotify_url"),
+                album_idx,
+                tuple(artist_idxs),
+            )
+            entry_tracks.append(tracks.intern(track_key, track_key))
+
+        entry_offsets.append(len(entry_tracks))
+
+        playlists.append((
+            playlist.get("playlist_id", pid),
+            playlist.get("playlist_name"),
+            playlist.get("image"),
+            playlist.get("snapshot_id"),
+            playlist.get("playlist_track_total"),
+        ))
+
+    columns = {}
+
+    def strings(name, values):
+        for part, arr in _encode_strings(values).items():
+            columns[f"{name}.{part}"] = arr
+
+    # ---- playlists ----
+
+    strings("playlist.id", [p[0] for p in playlists])
+    strings("playlist.name", [p[1] for p in playlists])
+    strings("playlist.image", [p[2] for p in playlists])
+    strings("playlist.snapshot_id", [p[3] for p in playlists])
+    columns["playlist.track_total"] = np.array([_int_or_missing(p[4]) for p in playlists], dtype=np.int64)
+    columns["playlist.entry_offsets"] = np.array(entry_offsets, dtype=np.int64)
+    columns["entry.track"] = np.array(entry_tracks, dtype=np.int32)
+
+    # ---- tracks ----
+
+    t = tracks.rows
+    strings("track.id", [r[0] for r in t])
+    strings("track.name", [r[1] for r in t])
+    columns["track.popularity"] = np.array([_int_or_missing(r[2]) for r in t], dtype=np.int16)
+    columns["track.duration_ms"] = np.array([_int_or_missing(r[3]) for r in t], dtype=np.int32)
+    columns["track.explicit"] = np.array([_int_or_missing(r[4]) for r in t], dtype=np.int8)
+    columns["track.track_number"] = np.array([_int_or_missing(r[5]) for r in t], dtype=np.int32)
+    columns["track.disc_number"] = np.array([_int_or_missing(r[6]) for r in t], dtype=np.int32)
+    strings("track.preview_url", [r[7] for r in t])
+    strings("track.spotify_url", [r[8] for r in t])
+    columns["track.album"] = np.array([r[9] for r in t], dtype=np.int32)
+    columns["track.artist_offsets"], columns["track.artists"] = _csr([r[10] for r in t])
+
+    # ---- albums ----
+
+    a = albums.rows
+    strings("album.id", [r[0] for r in a])
+    strings("album.name", [r[1] for r in a])
+    strings("album.release_date", [r[2] for r in a])
+    columns["album.total_tracks"] = np.array([_int_or_missing(r[3]) for r in a], dtype=np.int32)
+    columns["album.release_year"] = np.array([_release_year(r[2]) for r in a], dtype=np.int16)
+
+    # ---- artists + genres ----
+
+    ar = artists.rows
+    strings("artist.id", [r[0][0] for r in ar])
+    strings("artist.name", [r[0][1] for r in ar])
+    strings("artist.image_url", [r[0][2] for r in ar])
+    columns["artist.genre_offsets"], columns["artist.genres"] = _csr([r[1] for r in ar])
+
+    strings("genre.name", genres.rows)
+
+    return columns
+
+
+def _data_start(header_len):
+    prefix = len(MAGIC) + 4 + header_len
+    return -(-prefix // ALIGN) * ALIGN
+
+
+def encode_library(dataset):
+
+    columns = build_columns(dataset)
+
+    # Column offsets are relative to the aligned start of the data section
+    layout = {}
+    offset = 0
+
+    for name, arr in columns.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout[name] = [arr.dtype.str, offset, int(arr.size)]
+        offset += arr.nbytes
+
+    header = json.dumps({"version": 1, "columns": layout}).encode("utf-8")
+    base = _data_start(len(header))
+
+    buf = bytearray(base + offset)
+    buf[:len(MAGIC)] = MAGIC
+    buf[len(MAGIC):len(MAGIC) + 4] = len(header).to_bytes(4, "little")
+    buf[len(MAGIC) + 4:len(MAGIC) + 4 + len(header)] = header
+
+    for name, arr in columns.items():
+        start = base + layout[name][1]
+        buf[start:start + arr.nbytes] = arr.tobytes()
+
+    return bytes(buf)
+
+
+def write_library(path, dataset):
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    data = encode_library(dataset)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return len(data)
+
+# ------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------
+
+class ColumnarLibrary:
+    """Zero-copy numpy views over an encoded library buffer (bytes or mmap)."""
+
+    def __init__(self, buffer, _file=None):
+        self._buffer = buffer
+        self._file = _file
+
+        view = memoryview(buffer)
+
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a columnar library file")
+
+        header_len = int.from_bytes(view[len(MAGIC):len(MAGIC) + 4], "little")
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(bytes(view[header_start:header_start + header_len]))
+
+        view.release()
+
+        base = _data_start(header_len)
+        self._columns = {}
+
+        for name, (dtype, offset, count) in self.header["columns"].items():
+            if count == 0:
+                self._columns[name] = np.empty(0, dtype=np.dtype(dtype))
+            else:
+                self._columns[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=base + offset)
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        # In-memory view, for running column kernels over a live dataset
+        return cls(encode_library(dataset))
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    @property
+    def playlist_count(self):
+        return len(self["playlist.entry_offsets"]) - 1
+
+    @property
+    def entry_count(self):
+        return len(self["entry.track"])
+
+    @property
+    def track_count(self):
+        return len(self["track.album"])
+
+    def string(self, name, i):
+        if not self[f"{name}.valid"][i]:
+            return None
+
+        offsets = self[f"{name}.offsets"]
+        return bytes(self[f"{name}.data"][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def strings(self, name):
+        offsets = self[f"{name}.offsets"]
+        valid = self[f"{name}.valid"]
+        data = bytes(self[f"{name}.data"])
+
+        return [
+            data[offsets[i]:offsets[i + 1]].decode("utf-8") if valid[i] else None
+            for i in range(len(valid))
+        ]
+
+    def playlist_entries(self, p):
+        offsets = self["playlist.entry_offsets"]
+        return self["entry.track"][offsets[p]:offsets[p + 1]]
+
+    def to_dataset(self):
+
+        def ints(name):
+            return [None if v == -1 else int(v) for v in self[name].tolist()]
+
+        genre_names = self.strings("genre.name")
+
+        artist_ids = self.strings("artist.id")
+        artist_names = self.strings("artist.name")
+        artist_images = self.strings("artist.image_url")
+        genre_offsets = self["artist.genre_offsets"].tolist()
+        artist_genres = self["artist.genres"].tolist()
+
+        album_ids = self.strings("album.id")
+        album_names = self.strings("album.name")
+        album_dates = self.strings("album.release_date")
+        album_totals = ints("album.total_tracks")
+
+        track_ids = self.strings("track.id")
+        track_names = self.strings("track.name")
+        previews = self.strings("track.preview_url")
+        urls = self.strings("track.spotify_url")
+        pops = ints("track.popularity")
+        durations = ints("track.duration_ms")
+        explicits = [None if v == -1 else bool(v) for v in self["track.explicit"].tolist()]
+        track_numbers = ints("track.track_number")
+        disc_numbers = ints("track.disc_number")
+        track_albums = self["track.album"].tolist()
+        artist_offsets = self["track.artist_offsets"].tolist()
+        track_artists = self["track.artists"].tolist()
+
+        def make_track(t):
+            a = track_albums[t]
+            return {
+                "track_id": track_ids[t],
+                "track_name": track_names[t],
+                "popularity": pops[t],
+                "duration_ms": durations[t],
+                "explicit": explicits[t],
+                "track_number": track_numbers[t],
+                "disc_number": disc_numbers[t],
+                "preview_url": previews[t],
+                "spotify_url": urls[t],
+                "album": {
+                    "album_id": album_ids[a],
+                    "album_name": album_names[a],
+                    "release_date": album_dates[a],
+                    "total_tracks": album_totals[a],
+                },
+                "artists": [
+                    {
+                        "artist_id": artist_ids[r],
+                        "artist_name": artist_names[r],
+                        "genres": [genre_names[g] for g in artist_genres[genre_offsets[r]:genre_offsets[r + 1]]],
+                        "image_url": artist_images[r],
+                    }
+                    for r in track_artists[artist_offsets[t]:artist_offsets[t + 1]]
+                ],
+            }
+
+        playlist_ids = self.strings("playlist.id")
+        playlist_names = self.strings("playlist.name")
+        playlist_images = self.strings("playlist.image")
+        snapshot_ids = self.strings("playlist.snapshot_id")
+        track_totals = ints("playlist.track_total")
+
+        dataset = {}
+
+        for p, pid in enumerate(playlist_ids):
+            dataset[pid] = {
+                "playlist_id": pid,
+                "playlist_name": playlist_names[p],
+                "image": playlist_images[p],
+                "playlist_track_total": track_totals[p],
+                "tracks": [make_track(t) for t in self.playlist_entries(p).tolist()],
+            }
+
+            if snapshot_ids[p] is not None:
+                dataset[pid]["snapshot_id"] = snapshot_ids[p]
+
+        return dataset
+
+    def close(self):
+        self._columns = {}
+
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+        if self._file is not None:
+            self._file.close()
+
+
+def open_library(path):
+
+    f = open(path, "rb")
+
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except BaseException:
+        f.close()
+        raise
+
+    return ColumnarLibrary(mm, _file=f)
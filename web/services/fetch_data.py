@@ -1,7 +1,28 @@
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import spotipy
 import spotipy.exceptions
 
+from web.utils.singleflight import SingleFlight
+from web.services.build_telemetry import emit
+from web.utils.metrics import CACHE_LOOKUPS, SPOTIFY_BACKOFF_SECONDS
+
+PLAYLIST_FLIGHTS = SingleFlight()
+ARTIST_FLIGHTS = SingleFlight()
+
+# Recently fetched non-Liked playlists by (pid, snapshot_id), shared across users
+SHARED_PLAYLIST_RESULTS = OrderedDict()
+SHARED_PLAYLIST_RESULTS_MAX = 32
+_shared_results_lock = threading.Lock()
+
+# Playlist listing pages are fetched by offset in parallel once the
+# first page tells us the total
+LISTING_PAGE_SIZE = 50
+LISTING_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="listing")
+
 def format_genre(g):
     if not g:
         return g
@@ -19,19 +40,75 @@ def safe_spotify_call(func, *args, **kwargs):
         except spotipy.exceptions.SpotifyException as e:
             if e.http_status == 429:
                 retry_after = int(e.headers.get("Retry-After", 2))
+                emit("rate_limited", endpoint=getattr(func, "__name__", None), wait_s=retry_after)
+                SPOTIFY_BACKOFF_SECONDS.inc("safe_call", amount=retry_after)
                 time.sleep(retry_after)
             else:
                 raise
 
-def _hydrate_artists(sp, artist_ids, artist_cache):
-    if not artist_ids:
-        return
+def liked_snapshot_id(meta):
+
+    # Liked Songs has no snapshot_id; total + newest added_at changes on any save/unsave
+    items = meta.get("items") or []
+    newest = items[0].get("added_at") if items else None
+    return f"{meta.get('total')}:{newest}"
 
-    artist_list = list(artist_ids)
+def _listing_entry(p, user_id):
+    return {
+        "id": p["id"],
+        "name": p["name"],
+        "track_count": p["tracks"]["total"],
+        "image": p["images"][0]["url"] if p.get("images") else None,
+        "is_owner": p["owner"]["id"] == user_id,
+        "snapshot_id": p.get("snapshot_id")
+    }
+
+def fetch_playlist_listing(sp, user_id):
+
+    first = safe_spotify_call(sp.current_user_playlists, limit=LISTING_PAGE_SIZE)
+
+    offsets = range(LISTING_PAGE_SIZE, first.get("total") or 0, LISTING_PAGE_SIZE)
+
+    pages = [first] + list(LISTING_POOL.map(
+        lambda offset: safe_spotify_call(sp.current_user_playlists, limit=LISTING_PAGE_SIZE, offset=offset),
+        offsets
+    ))
+
+    # Playlists added/removed mid-walk can shift pages; keep first occurrence
+    playlists = {}
+
+    for page in pages:
+        for p in page.get("items") or []:
+            if p and p.get("id") and p["id"] not in playlists:
+                playlists[p["id"]] = _listing_entry(p, user_id)
+
+    playlists = list(playlists.values())
+
+    # add liked songs
+    try:
+        liked_meta = safe_spotify_call(sp.current_user_saved_tracks, limit=1)
+        playlists.append({
+            "id": "__liked__",
+            "name": "Liked Songs",
+            "track_count": liked_meta["total"],
+            "image": None,
+            "is_owner": True,
+            "snapshot_id": liked_snapshot_id(liked_meta)
+        })
+    except Exception:
+        pass
+
+    return playlists
+
+def _fetch_artists(sp, artist_ids):
+    fetched = {}
+
+    for i in range(0, len(artist_ids), 50):
+        batch = artist_ids[i:i + 50]
 
-    for i in range(0, len(artist_list), 50):
-        batch = artist_list[i:i + 50]
+        start = time.perf_counter()
         artist_results = safe_spotify_call(sp.artists, batch)
+        emit("artist_batch", size=len(batch), latency_ms=round((time.perf_counter() - start) * 1000, 1))
 
         for artist in (artist_results.get("artists") or []):
             if not artist:
@@ -44,11 +121,25 @@ def _hydrate_artists(sp, artist_ids, artist_cache):
             images = artist.get("images") or []
             image_url = images[0]["url"] if images else None
 
-            artist_cache[aid] = {
+            fetched[aid] = {
                 "genres": [format_genre(g) for g in (artist.get("genres") or [])],
                 "image_url": image_url
             }
 
+    return fetched
+
+def _hydrate_artists(sp, artist_ids, artist_cache):
+    if not artist_ids:
+        return
+
+    # Concurrent builds asking for the same artists share one lookup
+    fetched = ARTIST_FLIGHTS.do_many(
+        list(artist_ids),
+        lambda ids: _fetch_artists(sp, ids)
+    )
+
+    artist_cache.update(fetched)
+
 def _append_tracks_from_page(page_items, playlist_tracks, artist_cache):
     for item in page_items:
         track = item.get("track")
@@ -102,6 +193,8 @@ def _append_tracks_from_page(page_items, playlist_tracks, artist_cache):
 
 def fetch_single_playlist(sp, pid, artist_cache=None, progress_callback=None, cancel_check=None):
 
+    from web.services.albums import record_albums
+
     if artist_cache is None:
         artist_cache = {}
 
@@ -113,32 +206,38 @@ def fetch_single_playlist(sp, pid, artist_cache=None, progress_callback=None, ca
 
         meta = safe_spotify_call(sp.current_user_saved_tracks, limit=1)
         playlist_total_tracks = meta["total"]
+        snapshot_id = liked_snapshot_id(meta)
 
+        page_start = time.perf_counter()
         results = safe_spotify_call(sp.current_user_saved_tracks, limit=50)
 
     else:
         playlist_meta = safe_spotify_call(
             sp.playlist,
             pid,
-            fields="id,name,images,tracks.total"
+            fields="id,name,images,tracks.total,snapshot_id"
         )
 
         playlist_name = playlist_meta["name"]
         playlist_total_tracks = playlist_meta["tracks"]["total"]
+        snapshot_id = playlist_meta.get("snapshot_id")
 
         playlist_image = None
         if playlist_meta.get("images"):
             playlist_image = playlist_meta["images"][0]["url"]
 
+        page_start = time.perf_counter()
         results = safe_spotify_call(
             sp.playlist_items,
             pid,
             limit=100,
-            fields="items(track(id,name,popularity,duration_ms,explicit,track_number,disc_number,preview_url,external_urls,album(id,name,release_date,total_tracks),artists(id,name))),next"
+            fields="items(track(id,name,popularity,duration_ms,explicit,track_number,disc_number,preview_url,external_urls,album(id,name,release_date,total_tracks,images),artists(id,name))),next"
         )
 
     while True:
 
+        page_ms = (time.perf_counter() - page_start) * 1000
+
         if cancel_check and cancel_check():
             return None
 
@@ -148,6 +247,7 @@ def fetch_single_playlist(sp, pid, artist_cache=None, progress_callback=None, ca
             progress_callback(len(page_items))
 
         page_artist_ids = set()
+        page_artists_cached = set()
 
         for item in page_items:
             track = item.get("track")
@@ -156,11 +256,29 @@ def fetch_single_playlist(sp, pid, artist_cache=None, progress_callback=None, ca
 
             for artist in (track.get("artists") or []):
                 aid = artist.get("id")
-                if aid and aid not in artist_cache:
+                if not aid:
+                    continue
+                if aid in artist_cache:
+                    page_artists_cached.add(aid)
+                else:
                     page_artist_ids.add(aid)
 
         _hydrate_artists(sp, page_artist_ids, artist_cache)
 
+        CACHE_LOOKUPS.inc("artist", "hit", amount=len(page_artists_cached))
+        CACHE_LOOKUPS.inc("artist", "miss", amount=len(page_artist_ids))
+
+        emit(
+            "page",
+            pid=pid,
+            items=len(page_items),
+            latency_ms=round(page_ms, 1),
+            artists_cached=len(page_artists_cached),
+            artists_fetched=len(page_artist_ids)
+        )
+
+        record_albums((item.get("track") or {}).get("album") for item in page_items)
+
         _append_tracks_from_page(page_items, playlist_tracks, artist_cache)
 
         if not results.get("next"):
@@ -169,6 +287,7 @@ def fetch_single_playlist(sp, pid, artist_cache=None, progress_callback=None, ca
         if cancel_check and cancel_check():
             return None
 
+        page_start = time.perf_counter()
         results = safe_spotify_call(sp.next, results)
 
     return {
@@ -176,5 +295,58 @@ def fetch_single_playlist(sp, pid, artist_cache=None, progress_callback=None, ca
         "playlist_name": playlist_name,
         "image": playlist_image,
         "playlist_track_total": playlist_total_tracks,
+        "snapshot_id": snapshot_id,
         "tracks": playlist_tracks,
-    }
\ No newline at end of file
+    }
+
+def fetch_playlist_shared(sp, pid, user_id, snapshot_id=None, artist_cache=None, progress_callback=None, cancel_check=None):
+
+    # Any playlist is the same data for every user at a given snapshot, so
+    # concurrent and repeat fetches are shared under (pid, snapshot_id).
+    # The snapshot_id comes from the user's own listing, which shows they
+    # can read it. Liked Songs, and playlists without one (e.g. posted by
+    # id), are only shared within the same user.
+
+    if pid == "__liked__" or not snapshot_id:
+        key = (pid, "user", user_id)
+    else:
+        key = (pid, snapshot_id)
+
+        with _shared_results_lock:
+            cached = SHARED_PLAYLIST_RESULTS.get(key)
+            if cached is not None:
+                SHARED_PLAYLIST_RESULTS.move_to_end(key)
+
+        if cached is not None:
+            emit("playlist_shared", pid=pid, tracks=len(cached["tracks"]), source="recent")
+            if progress_callback:
+                progress_callback(len(cached["tracks"]))
+            return cached
+
+    dataset, shared = PLAYLIST_FLIGHTS.do(
+        key,
+        lambda: fetch_single_playlist(
+            sp,
+            pid,
+            artist_cache=artist_cache,
+            progress_callback=progress_callback,
+            cancel_check=cancel_check
+        ),
+        cancel_check=cancel_check
+    )
+
+    if dataset is None:
+        return None
+
+    if shared:
+        emit("playlist_shared", pid=pid, tracks=len(dataset["tracks"]), source="in_flight")
+        if progress_callback:
+            progress_callback(len(dataset["tracks"]))
+
+    if pid != "__liked__" and dataset.get("snapshot_id"):
+        with _shared_results_lock:
+            SHARED_PLAYLIST_RESULTS[(pid, dataset["snapshot_id"])] = dataset
+            while len(SHARED_PLAYLIST_RESULTS) > SHARED_PLAYLIST_RESULTS_MAX:
+                SHARED_PLAYLIST_RESULTS.popitem(last=False)
+
+    return dataset
@@ -0,0 +1,412 @@
+import hashlib
+import math
+
+import numpy as np
+
+from web import config
+from web.cache import LRUCache
+
+# ------------------------------------------------------------
+# Genre kernels over the columnar library
+# ------------------------------------------------------------
+
+# Genres are integer-coded (track, genre) pairs, so per-track genre sets
+# and all counts are plain numpy ops instead of Python set loops. The
+# pairs come from a ColumnarLibrary's CSR offsets, or are merged from
+# per-playlist indexes that are built once when a playlist is cached.
+
+DISPLAY_TOP = 165
+DISPLAY_MIN_GENRES = 50
+
+def _expand(offsets, rows):
+
+    # For CSR offsets, the flat positions of every row in `rows` plus the
+    # index (into `rows`) each position came from
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    total = int(counts.sum())
+
+    owner = np.repeat(np.arange(len(rows)), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return starts[owner] + within, owner
+
+
+# ------------------------------------------------------------
+# Per-playlist indexes
+# ------------------------------------------------------------
+
+# Keyed by (pid, snapshot_id); a hit is only used when its digest of the
+# track ids still matches the playlist, so Liked Songs (per user) can't be
+# served from another user's index.
+GENRE_INDEX_CACHE = LRUCache(config.GENRE_INDEX_CACHE_MB * 1024 * 1024)
+
+def _tracks_digest(tracks):
+    ids = "\0".join(t.get("track_id") or "" for t in tracks)
+    return hashlib.blake2b(ids.encode("utf-8"), digest_size=16).digest()
+
+def playlist_genre_index(playlist):
+
+    tracks = playlist.get("tracks", [])
+
+    codes = {}
+    pair_track = []
+    pair_genre = []
+
+    for t, track in enumerate(tracks):
+        seen = set()
+
+        for artist in track.get("artists", []):
+            for genre in artist.get("genres", []):
+                if not genre:
+                    continue
+
+                code = codes.setdefault(genre, len(codes))
+                if code not in seen:
+                    seen.add(code)
+                    pair_track.append(t)
+                    pair_genre.append(code)
+
+    return {
+        "digest": _tracks_digest(tracks),
+        "tracks": len(tracks),
+        "genres": list(codes),
+        "pair_track": np.array(pair_track, dtype=np.int32),
+        "pair_genre": np.array(pair_genre, dtype=np.int32),
+    }
+
+def genre_index(pid, playlist):
+
+    key = (pid, playlist.get("snapshot_id"))
+    index = GENRE_INDEX_CACHE.get_many([key]).get(key)
+
+    if index is None or index["digest"] != _tracks_digest(playlist.get("tracks", [])):
+        index = playlist_genre_index(playlist)
+        GENRE_INDEX_CACHE[key] = index
+
+    return index
+
+
+# ------------------------------------------------------------
+# Kernels
+# ------------------------------------------------------------
+
+class TrackGenres:
+    """Deduplicated (track, genre) pairs for every track in a library.
+
+    pair_track must be non-decreasing; track_info(t) -> (name, id).
+    """
+
+    def __init__(self, names, pair_track, pair_genre, track_count, track_info, offsets=None, remaps=None):
+        self.names = names
+        self.genre_count = len(names)
+        self.track_count = track_count
+        self.track_info = track_info
+        self.offsets = offsets
+        self.remaps = remaps
+
+        self.pair_track = pair_track
+        self.pair_genre = pair_genre
+        self.per_track = np.bincount(pair_track, minlength=track_count)
+
+    @classmethod
+    def from_library(cls, lib):
+
+        names = lib.strings("genre.name")
+        genre_count = len(names)
+
+        track_count = lib.track_count
+        tracks = np.arange(track_count)
+
+        # track -> artist slots -> genre slots
+        artist_pos, artist_owner = _expand(lib["track.artist_offsets"], tracks)
+        artists = lib["track.artists"][artist_pos].astype(np.int64)
+
+        genre_pos, genre_owner = _expand(lib["artist.genre_offsets"], artists)
+        genres = lib["artist.genres"][genre_pos].astype(np.int64)
+        owners = artist_owner[genre_owner]
+
+        # Empty genre names don't count, as before
+        usable = np.array([bool(g) for g in names], dtype=bool)
+        keep = usable[genres] if len(genres) else np.zeros(0, dtype=bool)
+
+        # Sorted unique codes = per-track genre sets, track-major
+        codes = np.unique(owners[keep] * max(genre_count, 1) + genres[keep])
+
+        return cls(
+            names,
+            codes // max(genre_count, 1),
+            codes % max(genre_count, 1),
+            track_count,
+            lambda t: (lib.string("track.name", t), lib.string("track.id", t))
+        )
+
+    @classmethod
+    def merge(cls, dataset, indexes):
+
+        # One row per playlist entry, playlists in dataset order. Genre
+        # codes are re-interned by first appearance across the selection,
+        # which is how combined ties rank; each playlist keeps its own
+        # index's code order in remaps for its per-playlist ties.
+        codes = {}
+        pair_track = []
+        pair_genre = []
+        offsets = [0]
+        playlists = []
+        remaps = []
+
+        for playlist, index in zip(dataset.values(), indexes):
+            remap = np.array([codes.setdefault(g, len(codes)) for g in index["genres"]], dtype=np.int64)
+
+            pair_track.append(index["pair_track"].astype(np.int64) + offsets[-1])
+            pair_genre.append(remap[index["pair_genre"]])
+            remaps.append(remap)
+
+            offsets.append(offsets[-1] + index["tracks"])
+            playlists.append(playlist.get("tracks", []))
+
+        offsets = np.array(offsets, dtype=np.int64)
+
+        def track_info(t):
+            p = int(np.searchsorted(offsets, t, side="right")) - 1
+            track = playlists[p][t - int(offsets[p])]
+            return track.get("track_name"), track.get("track_id")
+
+        return cls(
+            list(codes),
+            np.concatenate(pair_track) if pair_track else np.zeros(0, dtype=np.int64),
+            np.concatenate(pair_genre) if pair_genre else np.zeros(0, dtype=np.int64),
+            int(offsets[-1]),
+            track_info,
+            offsets=offsets,
+            remaps=remaps
+        )
+
+    def playlist_entries(self, p):
+        # Merged form only; a library's own entries index its track rows
+        return np.arange(self.offsets[p], self.offsets[p + 1])
+
+    def playlist_order(self, p):
+
+        # Tie-break rank per genre code: first appearance within playlist
+        # p, the order its own genre counts were built in. Genres it lacks
+        # have no count there, so their rank never matters.
+        order = np.arange(self.genre_count, dtype=np.int64) + self.genre_count
+        order[self.remaps[p]] = np.arange(len(self.remaps[p]))
+        return order
+
+    def scope(self, entries):
+
+        # (track, genre, weight) per pair of the tracks among these entries,
+        # weight being how often the track appears there. pair_track is
+        # sorted, so only the span covering the entries is read and one
+        # playlist costs its own size, not the whole selection's.
+        if not len(entries):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        lo = int(entries.min())
+        hi = int(entries.max())
+
+        start = np.searchsorted(self.pair_track, lo, side="left")
+        end = np.searchsorted(self.pair_track, hi, side="right")
+
+        track = self.pair_track[start:end]
+        weights = np.bincount(entries - lo, minlength=hi - lo + 1)
+
+        return track, self.pair_genre[start:end], weights[track - lo]
+
+    def counts(self, scope):
+        _track, genre, weights = scope
+        return np.bincount(genre, weights=weights, minlength=self.genre_count).astype(np.int64)
+
+    def cooccurrence(self, scope, genres):
+
+        # Sparse co-occurrence among `genres`: [a, b, tracks] for a < b,
+        # counting entries whose track carries both
+        if len(genres) < 2:
+            return []
+
+        local = np.full(self.genre_count, -1, dtype=np.int64)
+        local[genres] = np.arange(len(genres))
+
+        track, genre, weights = scope
+
+        keep = (local[genre] >= 0) & (weights > 0)
+        track = track[keep]
+        genre = local[genre[keep]]
+        weights = weights[keep]
+
+        if not len(track):
+            return []
+
+        # Pair every kept genre with the ones after it on the same track
+        group_start = np.flatnonzero(np.r_[True, track[1:] != track[:-1]])
+        group_size = np.diff(np.r_[group_start, len(track)])
+        position = np.arange(len(track)) - np.repeat(group_start, group_size)
+        partners = np.repeat(group_size, group_size) - position - 1
+
+        left = np.repeat(np.arange(len(track)), partners)
+        right = left + 1 + (np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners))
+
+        a = np.minimum(genre[left], genre[right])
+        b = np.maximum(genre[left], genre[right])
+
+        n = len(genres)
+        pair_codes, inverse = np.unique(a * n + b, return_inverse=True)
+        pair_counts = np.bincount(inverse, weights=weights[left]).astype(np.int64)
+
+        order = np.lexsort((pair_codes, -pair_counts))
+
+        return [
+            [int(pair_codes[i] // n), int(pair_codes[i] % n), int(pair_counts[i])]
+            for i in order
+        ]
+
+
+def _ranked(counts, k=None, order=None):
+
+    # Genres with a count, by count desc then first appearance (code order,
+    # or the rank in `order`); only the top k are fully sorted when k is given
+    present = np.flatnonzero(counts)
+
+    if k is not None and k < len(present):
+        part = np.argpartition(-counts[present], k - 1)[:k]
+        present = present[part]
+
+        # Ties at the cut-off resolve by first appearance, like a full sort
+        cutoff = counts[present].min()
+        present = np.union1d(present[counts[present] > cutoff], np.flatnonzero(counts == cutoff))
+
+    first = present if order is None else order[present]
+    ranked = present[np.lexsort((first, -counts[present]))]
+
+    return ranked[:k] if k is not None else ranked
+
+
+def genre_metrics(track_genres, entries, order=None):
+
+    names = track_genres.names
+
+    track_count = len(entries)
+    counts = track_genres.counts(track_genres.scope(entries))
+
+    nonzero = counts[counts > 0]
+    unique_genres = len(nonzero)
+
+    if not unique_genres or track_count == 0:
+        return None
+
+    # ---------------------------------
+    # Top genre + dominance gap (skip ties)
+    # ---------------------------------
+
+    ranked = _ranked(counts, order=order)
+
+    top_idx = int(ranked[0])
+    top_count = int(counts[top_idx])
+    top_genre_pct = round((top_count / track_count) * 100, 1)
+
+    lower = nonzero[nonzero < top_count]
+
+    if len(lower):
+        dominance_gap = round((top_count - int(lower.max())) / track_count * 100, 1)
+    else:
+        dominance_gap = 0
+
+    # ---------------------------------
+    # Diversity + Concentration
+    # ---------------------------------
+
+    p = nonzero / track_count
+    entropy = float(-(p * np.log(p)).sum())
+    hhi = float((p * p).sum())
+
+    max_entropy = math.log(unique_genres) if unique_genres > 1 else 1
+    diversity_score = round((entropy / max_entropy) * 100, 1)
+
+    concentration_value = hhi * 100
+
+    if concentration_value < 2:
+        concentration = "Very Diverse"
+    elif concentration_value < 5:
+        concentration = "Diverse"
+    elif concentration_value < 10:
+        concentration = "Balanced"
+    elif concentration_value < 25:
+        concentration = "Leaning"
+    else:
+        concentration = "Dominated"
+
+    # ---------------------------------
+    # Additional metrics
+    # ---------------------------------
+
+    per_entry = track_genres.per_track[entries]
+
+    avg_tracks_per_genre = round(track_count / unique_genres, 2)
+    multi_genre_track_pct = round(int((per_entry > 1).sum()) / track_count * 100, 1)
+
+    max_genres_on_track = int(per_entry.max())
+    max_genre_track_name = None
+    max_genre_track_id = None
+
+    if max_genres_on_track > 0:
+        t = int(entries[int(per_entry.argmax())])
+        max_genre_track_name, max_genre_track_id = track_genres.track_info(t)
+
+    # ---------------------------------
+    # Top 10 + bucketed display list
+    # ---------------------------------
+
+    def rows(idxs):
+        return [{"genre": names[i], "count": int(counts[i])} for i in idxs.tolist()]
+
+    if unique_genres > DISPLAY_MIN_GENRES:
+        bucketed = rows(ranked[:DISPLAY_TOP])
+
+        other_count = int(nonzero.sum()) - int(counts[ranked[:DISPLAY_TOP]].sum())
+        if other_count > 0:
+            bucketed.append({"genre": "Other", "count": other_count})
+    else:
+        bucketed = rows(ranked)
+
+    stats = {
+        "track_count": track_count,
+        "unique_genres": unique_genres,
+
+        "diversity_score": diversity_score,
+        "concentration": concentration,
+
+        "top_genre": names[top_idx],
+        "top_genre_pct": top_genre_pct,
+        "dominance_gap": dominance_gap,
+
+        "avg_tracks_per_genre": avg_tracks_per_genre,
+        "multi_genre_track_pct": multi_genre_track_pct,
+
+        "max_genres_on_track": max_genres_on_track,
+        "max_genre_track_name": max_genre_track_name,
+        "max_genre_track_id": max_genre_track_id,
+
+        "top_10": rows(ranked[:10]),
+
+        "all_genres": rows(ranked),
+
+        "display_genres": bucketed
+    }
+
+    return stats
+
+
+def genre_cooccurrence(track_genres, entries, top):
+
+    # {"genres": top genre names, "pairs": [[i, j, tracks], ...]} with
+    # i/j indexing "genres", heaviest pairs first
+    scope = track_genres.scope(entries)
+    genres = _ranked(track_genres.counts(scope), top) if top else np.zeros(0, dtype=np.int64)
+
+    return {
+        "genres": [track_genres.names[i] for i in genres.tolist()],
+        "pairs": track_genres.cooccurrence(scope, genres)
+    }
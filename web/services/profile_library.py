@@ -1,5 +1,6 @@
 from collections import Counter
-import statistics
+
+from web.services.stats import StreamingStats
 
 def build_playlist_profiles(dataset):
 
@@ -12,8 +13,8 @@ def build_playlist_profiles(dataset):
         if not tracks:
             continue
 
-        durations = []
-        track_pops = []
+        durations = StreamingStats()
+        track_pops = StreamingStats()
         artist_counter = Counter()
         genre_counter = Counter()
         decade_counter = Counter()
@@ -21,10 +22,10 @@ def build_playlist_profiles(dataset):
         for track in tracks:
             try:
                 if track.get("duration_ms"):
-                    durations.append(track["duration_ms"])
+                    durations.add(track["duration_ms"])
 
                 if track.get("popularity") is not None:
-                    track_pops.append(track["popularity"])
+                    track_pops.add(track["popularity"])
 
                 album = track.get("album") or {}
                 release_date = album.get("release_date")
@@ -54,8 +55,8 @@ def build_playlist_profiles(dataset):
             "playlist_id": pid,
             "playlist_name": playlist["playlist_name"],
             "track_count": len(tracks),
-            "avg_duration_ms": int(sum(durations) / len(durations)) if durations else None,
-            "avg_track_popularity": round(sum(track_pops) / len(track_pops), 2) if track_pops else None,
+            "avg_duration_ms": int(durations.total / durations.n) if durations.n else None,
+            "avg_track_popularity": round(track_pops.total / track_pops.n, 2) if track_pops.n else None,
             "unique_artists": len(artist_counter),
             "genre_counts": dict(genre_counter),
             "decade_counts": dict(decade_counter)
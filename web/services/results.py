@@ -0,0 +1,193 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from web import config
+from web.cache import CacheStats
+from web.state import PLAYLIST_DATA_CACHE
+from web.utils.responses import EncodedBody, dumps, etag_matches, not_modified
+
+# ------------------------------------------------------------
+# Encoded result cache
+# ------------------------------------------------------------
+
+# Analytics results are stored as the JSON bytes we send (plus lazily
+# compressed variants), keyed by everything the result depends on, so a
+# hit skips computing, serializing and compressing.
+
+class ResultCache:
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.total_bytes = 0
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            encoded = self._entries.get(key)
+
+            if encoded is None:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return encoded
+
+    def put(self, key, encoded):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+
+            self._entries[key] = encoded
+            self.total_bytes += encoded.size
+
+            while self.total_bytes > self.budget_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+                self.stats.evictions += 1
+
+    def account(self, key, before):
+
+        # Compressed variants are added after insert; keep the size honest
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self.total_bytes += encoded.size - before
+
+    def snapshot_stats(self):
+        with self._lock:
+            return {
+                **self.stats.as_dict(),
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "budget_bytes": self.budget_bytes
+            }
+
+RESULT_CACHE = ResultCache(config.RESULT_CACHE_MB * 1024 * 1024)
+
+# ------------------------------------------------------------
+# Keys
+# ------------------------------------------------------------
+
+def dataset_version(request):
+
+    # What the active dataset is made of, without loading it.
+    # None means "can't tell cheaply", and the result is not cached.
+
+    if not request.session.get("token_info"):
+        from web.routes.analytics import DEMO_PATH
+
+        try:
+            return ["demo", os.stat(DEMO_PATH).st_mtime_ns]
+        except OSError:
+            return None
+
+    from web.spotify_auth import get_user_id
+    user_id = get_user_id(request)
+    selected_ids = request.session.get("selected_playlists", [])
+
+    if not user_id or not selected_ids:
+        return None
+
+    versions = PLAYLIST_DATA_CACHE.versions(user_id, selected_ids)
+    if any(v is None for v in versions.values()):
+        return None
+
+    return [user_id, [[pid, versions[pid]] for pid in selected_ids]]
+
+def source_digest(path):
+
+    # Tags from before a deploy that changed the endpoint must not match
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+    except OSError:
+        return ""
+
+def result_key(request, metric, session_keys=(), source=""):
+
+    version = dataset_version(request)
+    if version is None:
+        return None
+
+    parts = [
+        metric,
+        source,
+        version,
+        sorted(request.query_params.multi_items()),
+        [request.session.get(k) for k in session_keys]
+    ]
+
+    return hashlib.sha1(dumps(parts)).hexdigest()
+
+# ------------------------------------------------------------
+# Decorator
+# ------------------------------------------------------------
+
+def cached_result(metric, session_keys=()):
+
+    # Wraps a sync endpoint returning {"status": "ready", ...} dicts.
+    # Ready results are encoded once and served from RESULT_CACHE; other
+    # statuses are encoded directly (skipping jsonable_encoder) but not kept.
+    # The result key doubles as a weak ETag, so a browser that already has
+    # the current version gets a 304 before anything is loaded or computed.
+    # The undecorated function stays reachable as endpoint.__wrapped__.
+
+    def decorate(fn):
+
+        source = source_digest(fn.__code__.co_filename)
+
+        @functools.wraps(fn)
+        def endpoint(*args, **kwargs):
+
+            request = kwargs["request"]
+
+            # Profiled requests always run the computation
+            if request.scope.get("profile") is not None:
+                key = None
+            else:
+                key = result_key(request, metric, session_keys, source)
+            etag = f'W/"{key}"' if key else None
+
+            # Tags are only handed out with ready results
+            if etag and etag_matches(request, etag):
+                return not_modified(etag)
+
+            encoded = RESULT_CACHE.get(key) if key else None
+            ready = encoded is not None
+
+            if encoded is None:
+                result = fn(*args, **kwargs)
+
+                encoded = EncodedBody(dumps(result))
+
+                ready = isinstance(result, dict) and result.get("status") == "ready"
+
+                if key and ready:
+                    RESULT_CACHE.put(key, encoded)
+
+            headers = None
+            if etag and ready:
+                headers = {
+                    "ETag": etag,
+                    "Cache-Control": "private, no-cache",
+                    "Vary": "Accept-Encoding, Cookie"
+                }
+
+            before = encoded.size
+            response = encoded.response(request, headers)
+
+            if key and encoded.size != before:
+                RESULT_CACHE.account(key, before)
+
+            return response
+
+        return endpoint
+
+    return decorate
@@ -0,0 +1,95 @@
+import spotipy.exceptions
+
+from web.services.fetch_data import safe_spotify_call, liked_snapshot_id
+from web.state import PLAYLIST_CACHE, PLAYLIST_DATA_CACHE, forget_playlist
+from web.services.build_telemetry import emit
+
+def current_snapshot_id(sp, pid, listing):
+
+    if listing.get(pid):
+        return listing[pid]
+
+    if pid == "__liked__":
+        meta = safe_spotify_call(sp.current_user_saved_tracks, limit=1)
+        return liked_snapshot_id(meta)
+
+    meta = safe_spotify_call(sp.playlist, pid, fields="snapshot_id")
+    return meta.get("snapshot_id")
+
+def invalidate_changed(user_id, playlists):
+
+    # A fresh listing carries every playlist's snapshot_id, so cached builds
+    # can be checked against it without any extra API calls
+    listing = {p["id"]: p.get("snapshot_id") for p in playlists}
+
+    cached = [pid for pid in PLAYLIST_DATA_CACHE.ids(user_id) if listing.get(pid)]
+
+    # Compared without loading any dataset; entries whose snapshot_id isn't
+    # known here are restored snapshots, checked by validate_restored on load
+    saved_ids = PLAYLIST_DATA_CACHE.snapshot_ids(user_id, cached)
+
+    changed = []
+
+    for pid, saved in saved_ids.items():
+
+        if saved is None:
+            continue
+
+        if saved == listing[pid]:
+            PLAYLIST_DATA_CACHE.mark_verified(user_id, pid)
+            continue
+
+        emit("snapshot_stale", user_id, pid=pid, saved=saved, current=listing[pid], source="listing")
+
+        PLAYLIST_DATA_CACHE.drop(user_id, pid)
+        forget_playlist(user_id, pid)
+        changed.append(pid)
+
+    return changed
+
+def validate_restored(sp, user_id, pids):
+
+    # Snapshots written before a restart are only trusted once their
+    # snapshot_id still matches Spotify; stale ones are dropped so the
+    # next build refetches them.
+
+    PLAYLIST_DATA_CACHE.get_many(user_id, pids)
+
+    unverified = PLAYLIST_DATA_CACHE.unverified(user_id, pids)
+    if not unverified:
+        return []
+
+    cached_listing = PLAYLIST_CACHE.get(user_id) or {}
+    listing = {
+        p["id"]: p.get("snapshot_id")
+        for p in cached_listing.get("data", [])
+    }
+
+    stale = []
+
+    for pid in unverified:
+
+        entry = PLAYLIST_DATA_CACHE.get(user_id, pid)
+        if not entry:
+            continue
+
+        saved = entry["dataset"].get("snapshot_id")
+
+        try:
+            current = current_snapshot_id(sp, pid, listing)
+        except spotipy.exceptions.SpotifyException as e:
+            if e.http_status != 404:
+                continue
+            current = None
+
+        if saved and saved == current:
+            PLAYLIST_DATA_CACHE.mark_verified(user_id, pid)
+            continue
+
+        emit("snapshot_stale", user_id, pid=pid, saved=saved, current=current, source="restore")
+
+        PLAYLIST_DATA_CACHE.drop(user_id, pid)
+        forget_playlist(user_id, pid)
+        stale.append(pid)
+
+    return stale
@@ -0,0 +1,223 @@
+import bisect
+import math
+from collections import Counter
+
+import numpy as np
+
+# ------------------------------------------------------------
+# Histograms
+# ------------------------------------------------------------
+
+# Distribution charts only need bucket counts, so endpoints ship these
+# instead of one value per track
+MAX_BINS = 1000
+
+def _plain(x):
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+def histogram(values, bin_width=None, bins=None, lo=None, hi=None, weights=None):
+
+    # With bins set, exactly that many equal bins span [lo or min, hi or max].
+    # Otherwise bins are bin_width wide, starting at lo or the first multiple
+    # of bin_width at or below the minimum. Values past hi land in the last bin.
+
+    arr = np.asarray(values, dtype=np.float64)
+
+    if arr.size == 0:
+        return {"start": _plain(lo or 0), "bin_width": _plain(bin_width or 1), "counts": []}
+
+    span_lo = lo if lo is not None else float(arr.min())
+    span_hi = hi if hi is not None else float(arr.max())
+    span = max(span_hi - span_lo, 0)
+
+    if bins:
+        count = min(bins, MAX_BINS)
+        bin_width = span / count or 1
+        start = span_lo
+    else:
+        bin_width = max(float(bin_width or 1), span / MAX_BINS)
+        start = lo if lo is not None else math.floor(span_lo / bin_width) * bin_width
+
+        if hi is not None:
+            count = max(math.ceil((hi - start) / bin_width), 1)
+        else:
+            count = math.floor((span_hi - start) / bin_width) + 1
+
+    idx = np.floor((arr - start) / bin_width).astype(np.int64)
+    np.clip(idx, 0, count - 1, out=idx)
+
+    return {
+        "start": _plain(start),
+        "bin_width": _plain(bin_width),
+        "counts": np.bincount(idx, weights=weights, minlength=count).astype(np.int64).tolist()
+    }
+
+# ------------------------------------------------------------
+# Streaming summary
+# ------------------------------------------------------------
+
+class StreamingStats:
+    """One-pass summary of a numeric stream.
+
+    Tracks Welford mean/variance, total, min/max with the item that produced
+    them, named band counts (predicate per band) and, optionally, quantiles:
+    "exact" keeps the values, "binned" keeps counts of bin_width-wide bins
+    from lo (exact for integer data with bin_width=1). Accumulators merge,
+    so combined stats are built from per-playlist ones without a rescan.
+    """
+
+    def __init__(self, bands=None, quantiles=None, bin_width=1, lo=0, hi=None):
+        self.bands = bands or {}
+        self.band_counts = {name: 0 for name in self.bands}
+        self.quantiles = quantiles
+        self.bin_width = bin_width
+        self.lo = lo
+        self.hi = hi
+
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.min_ref = None
+        self.max_ref = None
+
+        self.values = [] if quantiles == "exact" else None
+        self.bins = Counter() if quantiles == "binned" else None
+        self._sorted = None
+
+    def add(self, x, ref=None):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.total += x
+
+        # Strict comparisons keep the first item on ties, like min()/max()
+        if self.min is None or x < self.min:
+            self.min, self.min_ref = x, ref
+        if self.max is None or x > self.max:
+            self.max, self.max_ref = x, ref
+
+        for name, test in self.bands.items():
+            if test(x):
+                self.band_counts[name] += 1
+
+        if self.values is not None:
+            self.values.append(x)
+            self._sorted = None
+        elif self.bins is not None:
+            self.bins[self._bin(x)] += 1
+
+    def merge(self, other):
+        if not other.n:
+            return self
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+        self.total += other.total
+
+        if self.min is None or other.min < self.min:
+            self.min, self.min_ref = other.min, other.min_ref
+        if self.max is None or other.max > self.max:
+            self.max, self.max_ref = other.max, other.max_ref
+
+        for name, count in other.band_counts.items():
+            self.band_counts[name] = self.band_counts.get(name, 0) + count
+
+        if self.values is not None:
+            self.values.extend(other.values)
+            self._sorted = None
+        elif self.bins is not None:
+            self.bins.update(other.bins)
+
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / self.n if self.n else 0.0
+
+    @property
+    def std_dev(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+    def pct(self, count):
+        return count / self.n * 100 if self.n else 0.0
+
+    # ---------------------------------
+    # Quantiles
+    # ---------------------------------
+
+    def _bin(self, x):
+        idx = math.floor((x - self.lo) / self.bin_width)
+        if self.hi is not None:
+            idx = min(idx, math.ceil((self.hi - self.lo) / self.bin_width))
+        return max(idx, 0)
+
+    def _sorted_values(self):
+        if self._sorted is None:
+            self._sorted = sorted(self.values)
+        return self._sorted
+
+    def _nth(self, k):
+        if self.values is not None:
+            return self._sorted_values()[k]
+
+        seen = 0
+        for idx in sorted(self.bins):
+            seen += self.bins[idx]
+            if seen > k:
+                return self.lo + idx * self.bin_width
+
+    def quantile(self, q):
+
+        # Linear interpolation between order statistics, so the median of
+        # an even count is the mean of the middle two
+        if not self.n:
+            return None
+
+        pos = q * (self.n - 1)
+        k = math.floor(pos)
+        frac = pos - k
+
+        low = self._nth(k)
+        if not frac:
+            return low
+
+        return low + (self._nth(k + 1) - low) * frac
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
+
+    def count_between(self, lo, hi):
+
+        # Values in [lo, hi]; bins count when they start inside the range
+        if self.values is not None:
+            values = self._sorted_values()
+            return bisect.bisect_right(values, hi) - bisect.bisect_left(values, lo)
+
+        return sum(
+            count for idx, count in self.bins.items()
+            if lo <= self.lo + idx * self.bin_width <= hi
+        )
+
+    def histogram(self, bin_width=None, bins=None, lo=None, hi=None):
+
+        if self.values is not None:
+            return histogram(self.values, bin_width=bin_width, bins=bins, lo=lo, hi=hi)
+
+        edges = sorted(self.bins)
+        return histogram(
+            [self.lo + idx * self.bin_width for idx in edges],
+            bin_width=bin_width,
+            bins=bins,
+            lo=lo,
+            hi=hi,
+            weights=[self.bins[idx] for idx in edges]
+        )
@@ -0,0 +1,197 @@
+import re
+import secrets
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from web.cache import encode_value, decode_value
+
+# ------------------------------------------------------------
+# Server-side sessions
+# ------------------------------------------------------------
+
+# Drop-in replacement for Starlette's SessionMiddleware: the cookie only
+# carries an opaque random id, and the session dict lives in the cache
+# backend (so sqlite/redis sessions are shared between workers), or in a
+# SQLite file when the cache is memory-only, so restarts keep sessions.
+# The cookie is only (re)sent when the session is created or cleared.
+#
+# Ids are only ever issued here: a cookie naming no stored session gets a
+# fresh id, and a session with rotate set (login) moves to a new id, so a
+# planted cookie can't be carried into a logged-in session.
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+
+class SessionData(dict):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.modified = False
+        self.rotate = False
+
+    def __setitem__(self, key, value):
+        if key not in self or self[key] != value:
+            self.modified = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.modified = True
+        super().__delitem__(key)
+
+    def clear(self):
+        if self:
+            self.modified = True
+        super().clear()
+
+    def pop(self, key, *default):
+        if key in self:
+            self.modified = True
+        return super().pop(key, *default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.modified = True
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.modified = True
+        super().update(*args, **kwargs)
+
+
+class SessionStore:
+
+    PURGE_INTERVAL = 60 * 60
+
+    def __init__(self, backend, max_age, name="sessions"):
+        self.backend = backend
+        self.max_age = max_age
+        self.name = name
+        self._last_purge = time.time()
+
+    def load(self, session_id):
+        blob = self.backend.hget(self.name, session_id)
+        if blob is None:
+            return None
+
+        record = decode_value(blob) if self.backend.shared else blob
+
+        if record["expires_at"] < time.time():
+            self.backend.hdel(self.name, session_id)
+            return None
+
+        return record
+
+    def save(self, session_id, data):
+        record = {"data": dict(data), "expires_at": time.time() + self.max_age}
+        self.backend.hset(
+            self.name,
+            session_id,
+            encode_value(record) if self.backend.shared else record
+        )
+        self._maybe_purge()
+
+    def delete(self, session_id):
+        self.backend.hdel(self.name, session_id)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+
+        self._last_purge = now
+
+        for session_id in self.backend.hkeys(self.name):
+            self.load(session_id)
+
+
+class ServerSessionMiddleware:
+
+    def __init__(
+        self,
+        app,
+        store,
+        session_cookie="session",
+        path="/",
+        same_site="lax",
+        https_only=False,
+        skip_prefixes=("/static",),
+    ):
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.path = path
+        self.skip_prefixes = skip_prefixes
+
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        # Static files never touch the session; skip the store lookup
+        if scope["path"].startswith(self.skip_prefixes):
+            scope["session"] = SessionData()
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        session_id = connection.cookies.get(self.session_cookie)
+
+        record = None
+        if session_id and SESSION_ID_RE.match(session_id):
+            record = await self._call(self.store.load, session_id)
+
+        if record is None:
+            session_id = None
+
+        session = SessionData(record["data"] if record else {})
+        scope["session"] = session
+
+        # Stored sessions are renewed when written; refresh idle ones daily
+        renew = bool(record) and record["expires_at"] - time.time() < self.store.max_age - 24 * 60 * 60
+
+        async def send_wrapper(message):
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+
+                if session and (session.modified or renew or not record):
+                    new_id = session_id
+
+                    if session.rotate or not new_id:
+                        new_id = secrets.token_urlsafe(32)
+
+                    await self._call(self.store.save, new_id, session)
+
+                    if session_id and new_id != session_id:
+                        await self._call(self.store.delete, session_id)
+
+                    if new_id != session_id or renew:
+                        headers.append("Set-Cookie", self._cookie(new_id, self.store.max_age))
+
+                elif not session and record:
+                    await self._call(self.store.delete, session_id)
+                    headers.append("Set-Cookie", self._cookie("null", 0, expired=True))
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _call(self, fn, *args):
+        # sqlite/redis round trips stay off the event loop
+        if self.store.backend.shared:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    def _cookie(self, value, max_age, expired=False):
+        cookie = f"{self.session_cookie}={value}; path={self.path}; Max-Age={max_age}; {self.security_flags}"
+        if expired:
+            cookie += "; expires=Thu, 01 Jan 1970 00:00:00 GMT"
+        return cookie
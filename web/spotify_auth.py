@@ -1,9 +1,18 @@
 import os
+import threading
 import time
+import requests
+from urllib3.util.retry import Retry
+from spotipy.cache_handler import MemoryCacheHandler
 from spotipy.oauth2 import SpotifyOAuth
 import spotipy
 from fastapi import Request
 
+from web import config
+from web.utils.singleflight import SingleFlight
+from web.utils.timing import timed
+from web.utils.metrics import SPOTIFY_REQUESTS, SPOTIFY_RETRIES, SPOTIFY_BACKOFF_SECONDS, spotify_endpoint
+
 SCOPES = [
     "user-read-private",
     "user-read-email",
@@ -15,21 +24,41 @@ SCOPES = [
     "user-library-modify",
 ]
 
+def make_spotify(access_token, requests_session=True):
+    # Our own session rather than spotipy's, so every call is counted
+    if requests_session is True:
+        requests_session = build_http_session()
+
+    sp = spotipy.Spotify(auth=access_token, requests_session=requests_session)
+    if config.SPOTIFY_API_PREFIX:
+        sp.prefix = config.SPOTIFY_API_PREFIX
+    return sp
+
+def point_oauth(oauth: SpotifyOAuth):
+    if config.SPOTIFY_ACCOUNTS_URL:
+        base = config.SPOTIFY_ACCOUNTS_URL.rstrip("/")
+        oauth.OAUTH_AUTHORIZE_URL = base + "/authorize"
+        oauth.OAUTH_TOKEN_URL = base + "/api/token"
+    return oauth
+
 def build_oauth(request: Request):
     redirect_uri = os.getenv("SPOTIFY_REDIRECT_URI") or str(request.url_for("callback")).replace("http://", "https://")
 
-    return SpotifyOAuth(
+    return point_oauth(SpotifyOAuth(
         client_id=os.getenv("SPOTIFY_CLIENT_ID"),
         client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
         redirect_uri=redirect_uri,
         scope=" ".join(SCOPES),
         show_dialog=True,
-        cache_handler=None
-    )
+        cache_handler=MemoryCacheHandler()
+    ))
 
 def is_token_expired(token_info: dict) -> bool:
     return token_info.get("expires_at", 0) - int(time.time()) < 60
 
+def is_token_expiring(token_info: dict) -> bool:
+    return token_info.get("expires_at", 0) - int(time.time()) < REFRESH_AHEAD_SECONDS
+
 def refresh_if_needed(oauth: SpotifyOAuth, token_info: dict) -> dict:
     if not token_info:
         return None
@@ -39,22 +68,171 @@ def refresh_if_needed(oauth: SpotifyOAuth, token_info: dict) -> dict:
 
     return token_info
 
+# =====================================================================================
+# CLIENT REGISTRY
+# =====================================================================================
+
+# One Spotify client per user, reused across requests and build threads so
+# the HTTP connection pool survives between calls. Tokens are refreshed
+# ahead of expiry in the background, and concurrent refreshes for the same
+# user collapse into one call.
+
+REFRESH_AHEAD_SECONDS = 300
+
+CLIENTS = {}
+_clients_lock = threading.Lock()
+REFRESH_FLIGHTS = SingleFlight()
+
+class UserClient:
+
+    def __init__(self, token_info):
+        self.token_info = token_info
+        self.session = build_http_session()
+        self.sp = make_spotify(
+            token_info["access_token"],
+            requests_session=self.session
+        )
+
+    def set_token(self, token_info):
+        self.token_info = token_info
+        self.sp.set_auth(token_info["access_token"])
+
+class CountingRetry(Retry):
+
+    # urllib3 retries 429/5xx before spotipy (or safe_spotify_call) ever
+    # sees them; count those retries and the time spent backing off
+
+    def increment(self, method=None, url=None, response=None, *args, **kwargs):
+        if response is not None and url:
+            SPOTIFY_RETRIES.inc(spotify_endpoint(url), str(response.status))
+        return super().increment(method, url, response, *args, **kwargs)
+
+    def sleep(self, response=None):
+        start = time.perf_counter()
+        try:
+            super().sleep(response)
+        finally:
+            SPOTIFY_BACKOFF_SECONDS.inc("http_retry", amount=time.perf_counter() - start)
+
+def count_response(response, *args, **kwargs):
+    SPOTIFY_REQUESTS.inc(spotify_endpoint(response.url), str(response.status_code))
+
+def build_http_session():
+
+    # Same retry policy spotipy applies to the sessions it builds itself
+    retry = CountingRetry(
+        total=spotipy.Spotify.max_retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        status=spotipy.Spotify.max_retries,
+        backoff_factor=0.3,
+        status_forcelist=spotipy.Spotify.default_retry_codes
+    )
+
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=8,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.hooks["response"].append(count_response)
+    return session
+
+def build_refresh_oauth():
+    return point_oauth(SpotifyOAuth(
+        client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("SPOTIFY_REDIRECT_URI") or "http://localhost/callback",
+        scope=" ".join(SCOPES),
+        cache_handler=MemoryCacheHandler()
+    ))
+
+def register_client(user_id, token_info):
+    with _clients_lock:
+        client = CLIENTS.get(user_id)
+        if client is None:
+            client = UserClient(token_info)
+            CLIENTS[user_id] = client
+        elif token_info.get("expires_at", 0) > client.token_info.get("expires_at", 0):
+            client.set_token(token_info)
+    return client
+
+def drop_client(user_id):
+    with _clients_lock:
+        CLIENTS.pop(user_id, None)
+
+def refresh_client(user_id, client):
+
+    def do_refresh():
+        token_info = build_refresh_oauth().refresh_access_token(
+            client.token_info["refresh_token"]
+        )
+        client.set_token(token_info)
+        return token_info
+
+    token_info, _shared = REFRESH_FLIGHTS.do(user_id, do_refresh)
+    return token_info
+
+def refresh_in_background(user_id, client):
+
+    if REFRESH_FLIGHTS.in_flight(user_id):
+        return
+
+    def run():
+        try:
+            refresh_client(user_id, client)
+        except Exception as e:
+            print("Background token refresh failed:", e)
+
+    threading.Thread(target=run, daemon=True).start()
+
+def ensure_fresh(user_id, client):
+
+    if is_token_expired(client.token_info):
+        refresh_client(user_id, client)
+    elif is_token_expiring(client.token_info):
+        refresh_in_background(user_id, client)
+
+    return client
+
+def client_for_user(user_id):
+
+    # Used by build threads, which have no request/session of their own
+    client = CLIENTS.get(user_id)
+    if not client:
+        return None
+
+    return ensure_fresh(user_id, client).sp
+
+@timed("auth")
 def get_spotify_client(request: Request):
     token_info = request.session.get("token_info")
 
     if not token_info:
         return None
 
-    oauth = build_oauth(request)
-    token_info = refresh_if_needed(oauth, token_info)
+    user_id = request.session.get("user_id")
 
-    if not token_info:
-        return None
+    if not user_id:
+        oauth = build_oauth(request)
+        token_info = refresh_if_needed(oauth, token_info)
+
+        if not token_info:
+            return None
+
+        request.session["token_info"] = token_info
+        return make_spotify(token_info["access_token"])
+
+    client = ensure_fresh(user_id, register_client(user_id, token_info))
 
-    request.session["token_info"] = token_info
-    oauth.token_info = token_info
+    if client.token_info != token_info:
+        request.session["token_info"] = client.token_info
 
-    return spotipy.Spotify(auth_manager=oauth)
+    return client.sp
 
 def get_user_id(request: Request):
     user_id = request.session.get("user_id")
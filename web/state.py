@@ -1,5 +1,122 @@
-PLAYLIST_CACHE = {}
-PLAYLIST_DATA_CACHE = {}
+from web import config
+from web.spotify_auth import drop_client
+from web.cache import CacheNamespace, LRUCache, PlaylistDataCache, SQLiteBackend, SnapshotBackend, get_backend
+from web.utils.sizing import SizedDict
+
+CACHE_BACKEND = get_backend()
+
+# Shared between workers when CACHE_BACKEND is sqlite/redis
+PLAYLIST_CACHE = CacheNamespace(CACHE_BACKEND, "playlists", sized=True)
+PLAYLIST_DATA_CACHE = PlaylistDataCache(
+    CACHE_BACKEND,
+    "playlist_data",
+    budget_bytes=config.CACHE_MEMORY_BUDGET_MB * 1024 * 1024,
+    user_budget_bytes=config.CACHE_USER_BUDGET_MB * 1024 * 1024,
+    idle_ttl=config.CACHE_USER_IDLE_TTL,
+    spill=SQLiteBackend(config.CACHE_SPILL_PATH) if config.CACHE_SPILL_PATH else None,
+    snapshots=SnapshotBackend(config.SNAPSHOT_DIR) if config.SNAPSHOT_DIR and not CACHE_BACKEND.shared else None,
+    snapshot_ttl=config.SNAPSHOT_TTL
+)
+BUILD_PROGRESS = CacheNamespace(CACHE_BACKEND, "build_progress")
+
+# Selections posted to a worker that doesn't own the user's running build,
+# for the owner to apply (shared backends only)
+BUILD_REQUESTS = CacheNamespace(CACHE_BACKEND, "build_requests")
+
+# Sessions outlive the process even when the cache doesn't
+if CACHE_BACKEND.shared or not config.SESSION_SQLITE_PATH:
+    SESSION_BACKEND = CACHE_BACKEND
+else:
+    SESSION_BACKEND = SQLiteBackend(config.SESSION_SQLITE_PATH)
+
+# album_id -> image/release metadata, shared by every user. Kept per
+# process: it refills for free while builds page through playlists, and a
+# shared hash could only be bounded by scanning it.
+ALBUM_CACHE = LRUCache(config.ALBUM_CACHE_MB * 1024 * 1024)
+
+# Owned by the worker running the build
 BUILD_STATE = {}
 USER_BUILD_STATE = {}
-ARTIST_CACHE = {}
\ No newline at end of file
+ARTIST_CACHE = {}
+
+
+def artist_cache_for(user_id):
+    # Sized as artists are added, for user_footprints()
+    cache = ARTIST_CACHE.get(user_id)
+    if cache is None:
+        cache = ARTIST_CACHE.setdefault(user_id, SizedDict())
+    return cache
+
+
+def expire_user(user_id):
+
+    state = USER_BUILD_STATE.get(user_id)
+    if state and state.get("status") == "building":
+        return
+
+    USER_BUILD_STATE.pop(user_id, None)
+    BUILD_STATE.pop(user_id, None)
+    ARTIST_CACHE.pop(user_id, None)
+    drop_client(user_id)
+
+    if not PLAYLIST_CACHE.shared:
+        PLAYLIST_CACHE.pop(user_id, None)
+
+PLAYLIST_DATA_CACHE.on_user_expired.append(expire_user)
+
+
+def forget_playlist(user_id, pid):
+
+    # The cached copy is gone; untrack it so the next selection (or the
+    # dashboard's /api/build) fetches it again
+    state = USER_BUILD_STATE.get(user_id)
+    if not state:
+        return
+
+    state.get("pending_counts", set()).discard(pid)
+
+    tracks = state.get("playlist_track_map", {}).pop(pid, None)
+    if tracks is None:
+        return
+
+    state["total_tracks"] = max(state.get("total_tracks", 0) - tracks, 0)
+    state["tracks_processed"] = max(state.get("tracks_processed", 0) - tracks, 0)
+
+PLAYLIST_DATA_CACHE.on_discarded.append(forget_playlist)
+
+
+# ------------------------------------------------------------
+# Per-user footprint
+# ------------------------------------------------------------
+
+# Every figure here is accounted when the data is inserted (deep size at
+# put time), so this is a sum over users, not a walk over their data.
+# Objects shared between users (a playlist both follow, artists fetched
+# by concurrent builds) are charged to each of them.
+
+def user_footprints():
+
+    playlist_data = PLAYLIST_DATA_CACHE.user_footprints()
+    listings = dict(PLAYLIST_CACHE.sizes)
+    artist_caches = dict(ARTIST_CACHE)
+
+    out = []
+
+    for user_id in set(playlist_data) | set(listings) | set(artist_caches):
+
+        data = playlist_data.get(user_id) or {"bytes": 0, "entries": 0}
+        artists = artist_caches.get(user_id) or SizedDict()
+        listing_bytes = listings.get(user_id, 0)
+
+        out.append({
+            "user_id": user_id,
+            "total_bytes": data["bytes"] + artists.footprint() + listing_bytes,
+            "playlist_data_bytes": data["bytes"],
+            "playlist_data_entries": data["entries"],
+            "artist_bytes": artists.footprint(),
+            "artist_entries": len(artists),
+            "listing_bytes": listing_bytes,
+        })
+
+    out.sort(key=lambda u: u["total_bytes"], reverse=True)
+    return out
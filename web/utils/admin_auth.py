@@ -0,0 +1,23 @@
+import hmac
+
+from web import config
+
+# Every admin-gated surface (/api/admin/*, /metrics, request profiling)
+# accepts the same credentials: X-Admin-Token, or "Authorization: Bearer
+# <token>" as Prometheus sends it.
+
+def admin_token(headers):
+
+    token = headers.get("x-admin-token")
+    if token:
+        return token
+
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    return credentials.strip() if scheme.lower() == "bearer" else ""
+
+def is_admin(headers):
+
+    if not config.ADMIN_TOKEN:
+        return False
+
+    return hmac.compare_digest(admin_token(headers).encode(), config.ADMIN_TOKEN.encode())
@@ -1,5 +0,0 @@
-from web.config import DEBUG_BUILD
-
-def build_debug(msg):
-    if DEBUG_BUILD:
-        print("[BUILD DEBUG]", msg)
\ No newline at end of file
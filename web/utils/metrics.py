@@ -0,0 +1,372 @@
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from web.utils.timing import route_name
+
+# ------------------------------------------------------------
+# Metric types
+# ------------------------------------------------------------
+
+# Counters and histograms are written to per-thread shards, so the hot
+# path is a dict update with no lock; shards are summed when /metrics is
+# scraped. Shards of finished threads (one build thread per build) are
+# folded into a retired total so the shard list stays short.
+#
+# Everything is exported with a worker label. Values are cumulative per
+# worker, so sum() across workers is meaningful in PromQL; the exception
+# is shared_* families, which read shared state and report the same value
+# from every worker (aggregate those with max()).
+
+PREFIX = "spotifymatcher_"
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+class _Sharded:
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _merge(self, into, values):
+
+        # Counter values are numbers, histogram values are lists of
+        # per-bucket counts + sum; either way shards add up elementwise
+        for key, value in values.items():
+            total = into.get(key)
+
+            if total is None:
+                into[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                into[key] = [a + b for a, b in zip(total, value)]
+            else:
+                into[key] = total + value
+
+    def values(self):
+
+        totals = {}
+
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, dict(shard))
+            self._shards = live
+
+            self._merge(totals, self._retired)
+
+        for _thread, shard in live:
+            # dict() copies under the GIL, so a concurrent inc() can't
+            # change the dict mid-iteration
+            self._merge(totals, dict(shard))
+
+        return totals
+
+
+class Counter(_Sharded):
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__()
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        REGISTRY.register(self)
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self):
+        return {
+            self.name: {
+                "type": self.type,
+                "help": self.help,
+                "samples": [
+                    ("", dict(zip(self.labels, key)), value)
+                    for key, value in sorted(self.values().items())
+                ]
+            }
+        }
+
+
+class Histogram(_Sharded):
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=()):
+        super().__init__()
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        REGISTRY.register(self)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        slot = shard.get(labels)
+        if slot is None:
+            # Per-bucket counts, then the +Inf bucket, then the sum
+            slot = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        slot[bisect_left(self.buckets, value)] += 1
+        slot[-1] += value
+
+    def collect(self):
+
+        samples = []
+
+        for key, slot in sorted(self.values().items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + ("+Inf",), slot):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": str(bound)}, cumulative))
+
+            samples.append(("_sum", labels, slot[-1]))
+            samples.append(("_count", labels, cumulative))
+
+        return {self.name: {"type": self.type, "help": self.help, "samples": samples}}
+
+
+# ------------------------------------------------------------
+# Registry
+# ------------------------------------------------------------
+
+def gauge_family(name, help, samples):
+    return {PREFIX + name: {"type": "gauge", "help": help, "samples": samples}}
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def collector(self, fn):
+        # fn() -> families computed at scrape time (cache sizes, queues).
+        # Families with the same name as a metric are merged into it.
+        self.collectors.append(fn)
+        return fn
+
+    def collect(self):
+
+        families = {}
+
+        for source in [m.collect for m in self.metrics] + self.collectors:
+            for name, family in source().items():
+                merged = families.setdefault(name, {**family, "samples": []})
+                merged["samples"].extend(family["samples"])
+
+        return families
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+def render(snapshots):
+    """Text exposition format for {worker: families} snapshots."""
+
+    merged = {}
+
+    for worker, families in snapshots.items():
+        for name, family in families.items():
+            target = merged.setdefault(name, {**family, "samples": []})
+            target["samples"].extend(
+                (suffix, {"worker": worker, **labels}, value)
+                for suffix, labels, value in family["samples"]
+            )
+
+    lines = []
+
+    for name, family in sorted(merged.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+
+        for suffix, labels, value in family["samples"]:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------
+# Cross-worker publishing
+# ------------------------------------------------------------
+
+# With a shared cache backend each worker periodically writes its own
+# snapshot to one hash, so a scrape served by any worker reports all of
+# them. Workers that stop publishing drop out after METRICS_STALE_AFTER.
+
+METRICS_STALE_AFTER = 120
+
+
+class MetricsPublisher:
+
+    def __init__(self, namespace, registry=REGISTRY, interval=15):
+        self.namespace = namespace
+        self.registry = registry
+        self.interval = interval
+        self._started = False
+
+    def publish(self):
+        self.namespace[WORKER_ID] = {"ts": time.time(), "families": self.registry.collect()}
+
+    def start(self):
+
+        if self._started:
+            return
+        self._started = True
+
+        def run():
+            while True:
+                try:
+                    self.publish()
+                except Exception as e:
+                    print("Metrics publish error:", e)
+                time.sleep(self.interval)
+
+        threading.Thread(target=run, daemon=True, name="metrics-publisher").start()
+
+    def snapshots(self):
+
+        snapshots = {WORKER_ID: self.registry.collect()}
+
+        if not self.namespace.shared:
+            return snapshots
+
+        workers = self.namespace.backend.hkeys(self.namespace.name)
+        now = time.time()
+
+        for worker, entry in self.namespace.get_many(workers).items():
+            if worker == WORKER_ID:
+                continue
+
+            if now - entry["ts"] > METRICS_STALE_AFTER:
+                self.namespace.pop(worker, None)
+                continue
+
+            snapshots[worker] = entry["families"]
+
+        return snapshots
+
+
+# ------------------------------------------------------------
+# Middleware
+# ------------------------------------------------------------
+
+# Seconds, as Prometheus expects
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUESTS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    labels=("route", "method", "status"),
+    buckets=REQUEST_BUCKETS
+)
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app, histogram=HTTP_REQUESTS):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.histogram.observe(
+                time.perf_counter() - start,
+                route_name(scope),
+                scope["method"],
+                # Status class keeps the series count bounded
+                f"{status[0] // 100}xx" if status else "5xx"
+            )
+
+
+# ------------------------------------------------------------
+# Spotify + build counters
+# ------------------------------------------------------------
+
+SPOTIFY_REQUESTS = Counter(
+    "spotify_requests_total",
+    "Spotify Web API responses returned to the app, by endpoint template and status",
+    labels=("endpoint", "status")
+)
+
+SPOTIFY_RETRIES = Counter(
+    "spotify_retries_total",
+    "Spotify responses retried inside the HTTP session (429 / 5xx)",
+    labels=("endpoint", "status")
+)
+
+SPOTIFY_BACKOFF_SECONDS = Counter(
+    "spotify_backoff_seconds_total",
+    "Seconds spent sleeping before retrying Spotify calls",
+    labels=("source",)
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and result",
+    labels=("cache", "result")
+)
+
+BUILD_EVENTS = Counter(
+    "build_events_total",
+    "Structured build events by kind (see web/services/build_telemetry.py)",
+    labels=("kind",)
+)
+
+# Path segments that are part of the API shape; anything else is an id
+SPOTIFY_PATH_WORDS = {
+    "v1", "me", "playlists", "tracks", "items", "artists", "albums",
+    "users", "following", "top", "search", "browse", "player", "episodes", "shows"
+}
+
+def spotify_endpoint(url):
+    path = url.split("?", 1)[0].split("://", 1)[-1].split("/", 1)[-1]
+    parts = [p if p in SPOTIFY_PATH_WORDS else "{id}" for p in path.strip("/").split("/")]
+    if parts and parts[0] == "v1":
+        parts = parts[1:]
+    return "/" + "/".join(parts)
@@ -0,0 +1,225 @@
+import itertools
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from web import config
+from web.utils.admin_auth import is_admin
+
+# ------------------------------------------------------------
+# Request profiling
+# ------------------------------------------------------------
+
+# An admin can profile one request by sending X-Profile: 1 (or
+# ?__profile=1) together with the admin token. A sampler thread then reads
+# the handler's stack every PROFILE_INTERVAL_MS until the response starts,
+# and the result is kept as collapsed stacks ("a;b;c <count>"), the input
+# format of flamegraph.pl and speedscope. The response carries
+# X-Profile-Id; fetch the profile from /api/admin/profiles/<id>.
+#
+# Without the flag a request costs one scan of its header list.
+
+BASE_DIR = str(Path(__file__).resolve().parent.parent.parent)
+STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+PROFILES = OrderedDict()
+_ids = itertools.count(1)
+_profiles_lock = threading.Lock()
+
+
+def frame_label(code):
+
+    path = code.co_filename
+
+    if path.startswith(BASE_DIR):
+        path = path[len(BASE_DIR) + 1:]
+    elif "site-packages/" in path:
+        path = path.split("site-packages/", 1)[1]
+    elif path.startswith(STDLIB_DIR):
+        path = path[len(STDLIB_DIR) + 1:]
+
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+def endpoint_codes(endpoint):
+
+    codes = set()
+
+    while endpoint is not None:
+        code = getattr(endpoint, "__code__", None)
+        if code is not None:
+            codes.add(code)
+        endpoint = getattr(endpoint, "__wrapped__", None)
+
+    return codes
+
+
+class RequestProfile:
+
+    def __init__(self, scope, interval):
+        self.id = str(next(_ids))
+        self.scope = scope
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.missed = 0
+        self.thread_id = None
+        self.codes = None
+        self.started_at = time.time()
+        self.duration_ms = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"profile-{self.id}")
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _owns(self, frame):
+
+        # Endpoints wrapped by the same decorator share a code object, so a
+        # match must also hold this request (when the frame has one)
+        f_locals = frame.f_locals
+        request = f_locals.get("request") or (f_locals.get("kwargs") or {}).get("request")
+        return request is None or getattr(request, "scope", None) is self.scope
+
+    def _sample(self):
+
+        if self.codes is None:
+            endpoint = self.scope.get("endpoint")
+            if endpoint is None:
+                return  # not routed yet
+            self.codes = endpoint_codes(endpoint)
+
+        frames = sys._current_frames()
+
+        if self.thread_id is None:
+            for tid, frame in frames.items():
+                f = frame
+                while f is not None:
+                    if f.f_code in self.codes and self._owns(f):
+                        self.thread_id = tid
+                        break
+                    f = f.f_back
+                if self.thread_id is not None:
+                    break
+
+        frame = frames.get(self.thread_id)
+        if frame is None:
+            self.missed += 1
+            return
+
+        # Leaf to root, cut at the outermost endpoint frame so server and
+        # threadpool frames above the handler are left out
+        stack = []
+        root = None
+        f = frame
+
+        while f is not None:
+            stack.append(f.f_code)
+            if f.f_code in self.codes:
+                root = len(stack)
+            f = f.f_back
+
+        if root is None:
+            self.missed += 1
+            return
+
+        self.stacks[";".join(frame_label(c) for c in reversed(stack[:root]))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        return "".join(
+            f"{stack} {count}\n"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def summary(self):
+        route = self.scope.get("route")
+        return {
+            "id": self.id,
+            "method": self.scope.get("method"),
+            "path": self.scope.get("path"),
+            "route": getattr(route, "path", None),
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "missed_samples": self.missed,
+            "stacks": len(self.stacks)
+        }
+
+def store_profile(profile):
+    with _profiles_lock:
+        PROFILES[profile.id] = profile
+        while len(PROFILES) > config.PROFILE_KEEP:
+            PROFILES.popitem(last=False)
+
+def get_profile(profile_id):
+    return PROFILES.get(profile_id)
+
+def list_profiles():
+    return [p.summary() for p in reversed(list(PROFILES.values()))]
+
+
+# ------------------------------------------------------------
+# Middleware
+# ------------------------------------------------------------
+
+def profile_requested(scope):
+
+    requested = b"__profile=1" in scope["query_string"]
+
+    for name, value in scope["headers"]:
+        if name == b"x-profile" and value == b"1":
+            requested = True
+
+    return requested and is_admin(Headers(scope=scope))
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, app, interval_ms=1):
+        self.app = app
+        self.interval = interval_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope, self.interval)
+
+        # Lets cached endpoints skip the result cache for this request
+        scope["profile"] = profile
+
+        async def send_wrapper(message):
+
+            if message["type"] == "http.response.start":
+                profile.stop()
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Profile-Id", profile.id)
+
+            await send(message)
+
+        profile.start()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop()
+            store_profile(profile)
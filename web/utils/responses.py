@@ -0,0 +1,162 @@
+import gzip
+import json
+
+from starlette.responses import JSONResponse, Response
+
+from web.utils.timing import timed
+
+# orjson and brotli are optional; without them we fall back to the
+# stdlib encoder and gzip
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+def _default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    # numpy scalars
+    if hasattr(obj, "item"):
+        return obj.item()
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+@timed("encode")
+def dumps(content):
+
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+# ------------------------------------------------------------
+# Conditional requests
+# ------------------------------------------------------------
+
+def etag_matches(request, etag):
+
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    # Weak comparison: compressed and plain bodies share one tag
+    bare = etag.removeprefix("W/")
+
+    return any(
+        tag.strip().removeprefix("W/") == bare
+        for tag in header.split(",")
+    )
+
+def not_modified(etag):
+    return Response(status_code=304, headers={
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding, Cookie"
+    })
+
+
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content):
+        return dumps(content)
+
+# ------------------------------------------------------------
+# Compression
+# ------------------------------------------------------------
+
+def accepted_encoding(request):
+
+    accepted = set()
+
+    for part in request.headers.get("accept-encoding", "").split(","):
+        token, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+
+        if name.strip() == "q":
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+
+        accepted.add(token.strip().lower())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+
+    if "gzip" in accepted:
+        return "gzip"
+
+    return None
+
+@timed("compress")
+def compress(body, encoding):
+
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+
+    return body
+
+
+class EncodedBody:
+    """JSON body encoded once, with compressed variants made on demand."""
+
+    __slots__ = ("body", "variants")
+
+    def __init__(self, body):
+        self.body = body
+        self.variants = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+    def variant(self, encoding):
+
+        if encoding is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return self.body, None
+
+        data = self.variants.get(encoding)
+        if data is None:
+            data = compress(self.body, encoding)
+            self.variants[encoding] = data
+
+        return data, encoding
+
+    def response(self, request, headers=None):
+
+        data, encoding = self.variant(accepted_encoding(request))
+
+        headers = dict(headers or {})
+        headers.setdefault("Vary", "Accept-Encoding")
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        return Response(data, media_type="application/json", headers=headers)
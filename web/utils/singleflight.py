@@ -0,0 +1,109 @@
+import threading
+
+class _Call:
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while
+    it is in flight wait and receive the same result (or exception).
+    Nothing is cached once the call finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        return key in self._calls
+
+    def do(self, key, fn, cancel_check=None, poll=0.25):
+
+        # Returns (result, shared). A waiting caller whose cancel_check
+        # fires stops waiting and gets (None, True).
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            while not call.event.wait(poll):
+                if cancel_check and cancel_check():
+                    return None, True
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+        return call.result, False
+
+    def do_many(self, keys, fn):
+
+        # Batched variant: fn(owned_keys) -> {key: value} runs only for keys
+        # nobody else is fetching; keys already in flight are awaited.
+
+        owned = []
+        waiting = {}
+
+        with self._lock:
+            call = _Call()
+
+            for key in keys:
+                other = self._calls.get(key)
+                if other is not None:
+                    waiting[key] = other
+                else:
+                    owned.append(key)
+                    self._calls[key] = call
+
+        results = {}
+
+        try:
+            if owned:
+                call.result = fn(owned) or {}
+                results.update(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                for key in owned:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+            call.event.set()
+
+        retry = []
+
+        for key, other in waiting.items():
+            other.event.wait()
+
+            if other.error is not None:
+                retry.append(key)
+            elif other.result and key in other.result:
+                results[key] = other.result[key]
+
+        # The other caller failed; fetch its share ourselves
+        if retry:
+            results.update(fn(retry) or {})
+
+        return results
@@ -0,0 +1,68 @@
+import sys
+
+def deep_sizeof(obj):
+
+    # Approximate resident size of a plain dict/list/str tree.
+    # Shared objects (interned strings, small ints) are only counted once.
+
+    seen = set()
+    total = 0
+    stack = [obj]
+
+    while stack:
+        o = stack.pop()
+
+        oid = id(o)
+        if oid in seen:
+            continue
+        seen.add(oid)
+
+        total += sys.getsizeof(o)
+
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+
+    return total
+
+
+class SizedDict(dict):
+    """dict keeping a running deep size of its items, updated as they are set."""
+
+    def __init__(self):
+        super().__init__()
+        self.item_bytes = 0
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.item_bytes -= deep_sizeof(self[key])
+        else:
+            self.item_bytes += deep_sizeof(key)
+
+        self.item_bytes += deep_sizeof(value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.item_bytes -= deep_sizeof(key) + deep_sizeof(self[key])
+        super().__delitem__(key)
+
+    def update(self, other=(), **kwargs):
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *default)
+
+    def footprint(self):
+        return sys.getsizeof(self) + self.item_bytes
@@ -0,0 +1,257 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+
+from starlette.datastructures import MutableHeaders
+
+# ------------------------------------------------------------
+# Request spans
+# ------------------------------------------------------------
+
+# ServerTimingMiddleware gives each /api request a span list; span() and
+# @timed record named phases (auth, dataset, compute, encode) into it.
+# Outside an instrumented request both are a ContextVar lookup and
+# nothing else. Repeated or nested spans of one name are summed.
+
+_SPANS = ContextVar("server_timing_spans", default=None)
+
+
+class _Span:
+
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans, name):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans.append((self.name, (time.perf_counter() - self.start) * 1000))
+        return False
+
+
+class _NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+def span(name):
+    spans = _SPANS.get()
+    if spans is None:
+        return NULL_SPAN
+    return _Span(spans, name)
+
+def timed(name):
+
+    def decorate(fn):
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            spans = _SPANS.get()
+            if spans is None:
+                return fn(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                spans.append((name, (time.perf_counter() - start) * 1000))
+
+        return wrapper
+
+    return decorate
+
+def merge_spans(spans):
+    phases = {}
+    for name, ms in spans:
+        phases[name] = phases.get(name, 0.0) + ms
+    return phases
+
+def format_server_timing(phases, total_ms):
+    parts = [f"{name};dur={ms:.2f}" for name, ms in phases.items()]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+# ------------------------------------------------------------
+# Rolling histograms
+# ------------------------------------------------------------
+
+# Upper bounds in ms; the last bucket is everything above
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class RollingHistogram:
+    """Latency histogram over the last `windows` x `window` seconds."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS, window=60, windows=10):
+        self.buckets = buckets
+        self.window = window
+        self.windows = windows
+        self.lock = threading.Lock()
+        self.slots = [self._empty(None) for _ in range(windows)]
+
+    def _empty(self, epoch):
+        return {
+            "epoch": epoch,
+            "counts": [0] * (len(self.buckets) + 1),
+            "n": 0,
+            "sum": 0.0,
+            "max": 0.0,
+            "phases": {}
+        }
+
+    def observe(self, ms, phases=None, now=None):
+
+        epoch = int((now or time.time()) // self.window)
+        i = bisect_left(self.buckets, ms)
+
+        with self.lock:
+            slot = self.slots[epoch % self.windows]
+            if slot["epoch"] != epoch:
+                slot = self._empty(epoch)
+                self.slots[epoch % self.windows] = slot
+
+            slot["counts"][i] += 1
+            slot["n"] += 1
+            slot["sum"] += ms
+            slot["max"] = max(slot["max"], ms)
+
+            for name, value in (phases or {}).items():
+                slot["phases"][name] = slot["phases"].get(name, 0.0) + value
+
+    def snapshot(self, now=None):
+
+        current = int((now or time.time()) // self.window)
+        merged = self._empty(current)
+
+        with self.lock:
+            for slot in self.slots:
+                if slot["epoch"] is None or slot["epoch"] <= current - self.windows:
+                    continue
+
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], slot["counts"])]
+                merged["n"] += slot["n"]
+                merged["sum"] += slot["sum"]
+                merged["max"] = max(merged["max"], slot["max"])
+
+                for name, value in slot["phases"].items():
+                    merged["phases"][name] = merged["phases"].get(name, 0.0) + value
+
+        n = merged["n"]
+        if not n:
+            return {"count": 0}
+
+        return {
+            "count": n,
+            "mean_ms": round(merged["sum"] / n, 2),
+            "p50_ms": self._quantile(merged, 0.50),
+            "p95_ms": self._quantile(merged, 0.95),
+            "p99_ms": self._quantile(merged, 0.99),
+            "max_ms": round(merged["max"], 2),
+            # Average time per request spent in each phase
+            "phases_mean_ms": {
+                name: round(value / n, 2)
+                for name, value in merged["phases"].items()
+            },
+            "buckets": {
+                ("+Inf" if i == len(self.buckets) else str(self.buckets[i])): c
+                for i, c in enumerate(merged["counts"])
+                if c
+            }
+        }
+
+    def _quantile(self, merged, q):
+
+        # Reported as the upper bound of the bucket holding the quantile
+        target = q * merged["n"]
+        seen = 0
+
+        for i, c in enumerate(merged["counts"]):
+            seen += c
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else round(merged["max"], 2)
+
+        return round(merged["max"], 2)
+
+
+class RouteTimings:
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, ms, phases=None):
+        histogram = self.routes.get(route)
+        if histogram is None:
+            with self.lock:
+                histogram = self.routes.setdefault(route, RollingHistogram(**self.kwargs))
+        histogram.observe(ms, phases)
+
+    def snapshot(self):
+        routes = {route: h.snapshot() for route, h in list(self.routes.items())}
+        return dict(sorted(
+            ((r, s) for r, s in routes.items() if s["count"]),
+            key=lambda item: item[1]["p95_ms"],
+            reverse=True
+        ))
+
+ROUTE_TIMINGS = RouteTimings()
+
+
+# ------------------------------------------------------------
+# Middleware
+# ------------------------------------------------------------
+
+def route_name(scope):
+    # The route template, so /api/x/{id} is one series; unmatched paths
+    # share a bucket rather than growing the table
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, app, prefixes=("/api",), timings=ROUTE_TIMINGS):
+        self.app = app
+        self.prefixes = prefixes
+        self.timings = timings
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        spans = []
+        token = _SPANS.set(spans)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - start) * 1000
+                phases = merge_spans(spans)
+
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", format_server_timing(phases, total))
+
+                self.timings.observe(route_name(scope), total, phases)
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _SPANS.reset(token)